@@ -1,16 +1,20 @@
 # API 라우터: 고급 AI 서비스 및 Warren Buffett 분석
 # - /chat: 메시지 타입별 AI 처리 (추천, 분석, 일반 채팅)
 # - /warren-buffett-analysis: 8단계 강화된 워런 버핏 분석
+# - /warren-buffett-analysis/stream: 위 분석의 진행 상황(도구 호출, LLM 토큰)과 최종 결과를 SSE로 전송
 # - /stock-analysis: 일반 종목 분석
 # - /me/chat-history: 사용자 채팅 기록 조회
 
 from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import StreamingResponse
+import json
 from schemas.user import UserRead
 from api import deps
 from services import azure_openai_service
-from services.agent import process_query, get_agent
+from services.agent import process_query, get_agent, get_buffett_agent
+from services.agent_runtime import AdmissionRejected, analysis_admission
 from api.routers.crud import crud_token_usage_log, crud_query_history
-from db.session import get_db
+from db.session import get_db, AsyncSessionLocal
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import BackgroundTasks
 from core.config import settings
@@ -120,29 +124,9 @@ async def process_chat(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/warren-buffett-analysis", response_model=BuffettAnalysisResponse)
-async def enhanced_warren_buffett_analysis(
-    request: BuffettAnalysisRequest,
-    background_tasks: BackgroundTasks,
-    current_user: UserRead = Depends(deps.get_current_active_user),
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Enhanced Warren Buffett 8-step stock analysis with ESG and risk assessment
-    
-    This endpoint provides comprehensive stock analysis using:
-    - Traditional 6-step Buffett criteria
-    - ESG (Environmental, Social, Governance) evaluation
-    - Advanced risk analysis (Beta, VaR, volatility)
-    - Portfolio optimization recommendations
-    - Real-time data integration (KRX, OpenDART APIs)
-    """
-    try:
-        # Get the enhanced Warren Buffett agent
-        agent = await get_agent()
-        
-        # Enhance the query with specific parameters
-        enhanced_query = f"""
+def _build_buffett_query(request: BuffettAnalysisRequest) -> str:
+    """분석 조건을 포함한 에이전트 질의문을 만듭니다."""
+    return f"""
         워런 버핏의 8단계 투자 기준으로 종목을 분석해주세요.
         
         요청사항: {request.question}
@@ -164,9 +148,52 @@ async def enhanced_warren_buffett_analysis(
         4. 포트폴리오 최적화 제안
         5. 투자 추천 등급과 근거
         """
+
+def _analysis_metadata(request: BuffettAnalysisRequest) -> Dict[str, Any]:
+    return {
+        "market_segment": request.market_segment,
+        "min_score": request.min_score,
+        "max_results": request.max_results,
+        "include_esg": request.include_esg,
+        "include_risk_analysis": request.include_risk_analysis,
+        "sectors": request.sectors,
+        "use_real_data": request.use_real_data,
+        "criteria_used": "8-step Enhanced Buffett Filter" if request.include_esg and request.include_risk_analysis 
+                      else "7-step Buffett Filter (ESG)" if request.include_esg
+                      else "7-step Buffett Filter (Risk)" if request.include_risk_analysis
+                      else "6-step Traditional Buffett Filter"
+    }
+
+def _sse(event: str, data: Any) -> str:
+    """Server-Sent Events 메시지 한 건을 직렬화합니다."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/warren-buffett-analysis", response_model=BuffettAnalysisResponse)
+async def enhanced_warren_buffett_analysis(
+    request: BuffettAnalysisRequest,
+    background_tasks: BackgroundTasks,
+    current_user: UserRead = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Enhanced Warren Buffett 8-step stock analysis with ESG and risk assessment
+    
+    This endpoint provides comprehensive stock analysis using:
+    - Traditional 6-step Buffett criteria
+    - ESG (Environmental, Social, Governance) evaluation
+    - Advanced risk analysis (Beta, VaR, volatility)
+    - Portfolio optimization recommendations
+    - Real-time data integration (KRX, OpenDART APIs)
+    """
+    try:
+        # Get the enhanced Warren Buffett agent
+        agent = await get_buffett_agent()
+        
+        # Enhance the query with specific parameters
+        enhanced_query = _build_buffett_query(request)
         
         # Perform the analysis
-        result = await agent.analyze_stock(enhanced_query)
+        result = await agent.analyze_stock(enhanced_query, user_question=request.question)
         
         # Log the query and response
         background_tasks.add_task(
@@ -184,24 +211,15 @@ async def enhanced_warren_buffett_analysis(
             analysis_type="Enhanced Warren Buffett 8-Step Analysis",
             recommendations=result["recommendations"],
             tools_used=result["tools_used"],
-            analysis_metadata={
-                "market_segment": request.market_segment,
-                "min_score": request.min_score,
-                "max_results": request.max_results,
-                "include_esg": request.include_esg,
-                "include_risk_analysis": request.include_risk_analysis,
-                "sectors": request.sectors,
-                "use_real_data": request.use_real_data,
-                "criteria_used": "8-step Enhanced Buffett Filter" if request.include_esg and request.include_risk_analysis 
-                              else "7-step Buffett Filter (ESG)" if request.include_esg
-                              else "7-step Buffett Filter (Risk)" if request.include_risk_analysis
-                              else "6-step Traditional Buffett Filter"
-            },
+            analysis_metadata=_analysis_metadata(request),
             raw_output=result["raw_output"]
         )
         
         return response
         
+    except AdmissionRejected as e:
+        # 대기열이 가득 차면 다른 요청을 굶기지 않도록 즉시 거절
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after))})
     except Exception as e:
         # Return error response
         return BuffettAnalysisResponse(
@@ -222,6 +240,78 @@ async def enhanced_warren_buffett_analysis(
             raw_output=str(e)
         )
 
+@router.post("/warren-buffett-analysis/stream")
+async def stream_warren_buffett_analysis(
+    request: BuffettAnalysisRequest,
+    current_user: UserRead = Depends(deps.get_current_active_user)
+):
+    """
+    Enhanced Warren Buffett analysis as Server-Sent Events
+    
+    Events (in order):
+    - tool_start / tool_end: tool calls such as enhanced_buffett_stock_screener
+    - token: partial LLM output
+    - error: analysis failed or no run slot became available (followed by a failed result)
+    - result: final payload in the BuffettAnalysisResponse format
+    """
+    agent = await get_buffett_agent()
+    
+    # 대기열이 이미 가득 찼으면 스트림을 열기 전에 503
+    if analysis_admission.is_full():
+        raise HTTPException(
+            status_code=503,
+            detail="분석 요청이 많아 대기열이 가득 찼습니다.",
+            headers={"Retry-After": str(int(analysis_admission.queue_timeout))}
+        )
+    
+    async def event_stream():
+        # 실행 슬롯은 본문을 실제로 보낼 때 확보하고 제너레이터 안에서 반환
+        # (응답 본문이 전송되지 않으면 슬롯도 잡지 않음)
+        try:
+            async with analysis_admission.slot():
+                async for event in agent.stream_analysis(_build_buffett_query(request), user_question=request.question):
+                    if event["event"] != "result":
+                        yield _sse(event["event"], {k: v for k, v in event.items() if k != "event"})
+                        continue
+                    
+                    result = event["data"]
+                    response = BuffettAnalysisResponse(
+                        success=result["success"],
+                        analysis_type="Enhanced Warren Buffett 8-Step Analysis",
+                        recommendations=result["recommendations"],
+                        tools_used=result["tools_used"],
+                        analysis_metadata=_analysis_metadata(request),
+                        raw_output=result["raw_output"]
+                    )
+                    yield _sse("result", response.model_dump())
+                    
+                    # 응답 세션과 별도로 쿼리 로그 기록
+                    async with AsyncSessionLocal() as db:
+                        await crud_query_history.create_query_log(
+                            db=db,
+                            user_id=current_user.id,
+                            query_text=request.question,
+                            response_text=str(result["recommendations"]),
+                            ai_model_name="Enhanced Warren Buffett AI Agent"
+                        )
+        except AdmissionRejected as e:
+            # 스트림이 이미 열렸으므로 상태 코드 대신 error/result 이벤트로 전달
+            yield _sse("error", {"message": str(e), "retry_after": e.retry_after})
+            yield _sse("result", BuffettAnalysisResponse(
+                success=False,
+                analysis_type="Enhanced Warren Buffett 8-Step Analysis",
+                recommendations=[f"❌ {str(e)}", "💡 잠시 후 다시 시도해주세요."],
+                tools_used=[],
+                analysis_metadata={**_analysis_metadata(request), "error": str(e)},
+                raw_output=str(e)
+            ).model_dump())
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/stock-analysis")
 async def stock_analysis(
     question: str,
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from typing import Dict, Any, List, Optional
+import logging
 from services.stock_analysis import StockAnalysisService
+from services.cache import cache_service
+from services.price_history import price_history
+from services.technical_indicators import technical_indicators
+from services.buffett_score_table import buffett_scores
 from pydantic import BaseModel
 from api.deps import get_current_active_user
 from schemas.analysis import (
@@ -9,22 +14,81 @@ from schemas.analysis import (
     StockRecommendationRequest,
     StockAnalysisRequest
 )
-from core.agent import StockAnalysisAgent
+from core.agent import StockAnalysisAgent, inflight as agent_inflight
 
 router = APIRouter()
 stock_analysis = StockAnalysisService()
+logger = logging.getLogger(__name__)
 
 class RecommendationRequest(BaseModel):
     market_segment: str = "KOSPI"
     min_score: int = 60
     max_results: int = 5
 
+async def refresh_buffett_prices() -> None:
+    """새 스냅샷으로 버핏 기준 가격 기반 점수를 갱신합니다. (실패해도 저장된 스냅샷에는 영향 없음)"""
+    try:
+        await buffett_scores.refresh_prices(await stock_analysis.get_latest_market_data())
+    except Exception as e:
+        logger.error(f"버핏 기준 점수 갱신 중 오류 발생: {str(e)}")
+
 @router.post("/collect-market-data")
-async def collect_market_data():
-    """시장 데이터를 수집하고 저장합니다."""
+async def collect_market_data(background_tasks: BackgroundTasks):
+    """시장 데이터를 수집하고 저장합니다. 버핏 기준 점수는 응답 후 백그라운드에서 갱신합니다."""
     try:
         result = await stock_analysis.collect_market_data()
-        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    background_tasks.add_task(refresh_buffett_prices)
+    return result
+
+@router.post("/buffett-scores/refresh")
+async def refresh_buffett_scores(fundamentals: bool = True):
+    """
+    최신 스냅샷 종목의 버핏 기준 점수 테이블을 갱신합니다.
+    fundamentals=True이면 먼저 공시가 바뀐 종목의 재무 기반 점수를 다시 계산합니다.
+    """
+    try:
+        market_data = await stock_analysis.get_latest_market_data()
+        recomputed = await buffett_scores.refresh_fundamentals(market_data) if fundamentals else 0
+        scored = await buffett_scores.refresh_prices(market_data)
+        return {
+            "success": True,
+            "message": "버핏 기준 점수 갱신 완료",
+            "trade_date": market_data.attrs["trade_date"],
+            "fundamentals_recomputed": recomputed,
+            "scored": scored
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/collect-price-history")
+async def collect_price_history(date: Optional[str] = None):
+    """하루치 전체 종목 일별 시세를 종목별 이력에 추가합니다. (date 미지정 시 최근 영업일)"""
+    try:
+        appended = await price_history.append_trading_day(date)
+        if appended:
+            await technical_indicators.refresh()
+        return {
+            "success": True,
+            "message": "일별 시세 이력 추가 완료",
+            "appended": appended
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/price-history/{stock_code}/backfill")
+async def backfill_price_history(stock_code: str, days: Optional[int] = None):
+    """종목의 최근 영업일 일별 시세 중 저장되지 않은 기간을 백필합니다."""
+    try:
+        appended = await price_history.backfill(stock_code, days)
+        if appended:
+            await technical_indicators.refresh([stock_code])
+        return {
+            "success": True,
+            "message": "일별 시세 이력 백필 완료",
+            "appended": appended
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -58,6 +122,18 @@ async def get_stock_analysis(stock_code: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """캐시 적중/미스/제거 통계와 요청 병합 통계를 반환합니다."""
+    return {
+        "success": True,
+        "stats": cache_service.get_stats(),
+        "singleflight": {
+            "agent": agent_inflight.get_stats(),
+            "detailed_analysis": stock_analysis.inflight.get_stats()
+        }
+    }
+
 # 사용자 종목 추천 (직접 지정된 파라미터)
 @router.post("/stock/recommendations", response_model=AnalysisResponse)
 async def post_stock_recommendations(
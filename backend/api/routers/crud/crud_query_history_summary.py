@@ -0,0 +1,111 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+from db.models.query_history import QueryHistory
+from db.models.query_history_summary import QueryHistorySummary, QueryHistorySummaryFailure
+from typing import Optional, List, Tuple
+
+async def get_summary(db: AsyncSession, history_id: int, ai_model_name: str) -> Optional[QueryHistorySummary]:
+    """저장된 대화 요약 조회"""
+    query = select(QueryHistorySummary).where(
+        QueryHistorySummary.history_id == history_id,
+        QueryHistorySummary.ai_model_name == ai_model_name
+    )
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+async def create_summary(
+    db: AsyncSession,
+    history_id: int,
+    ai_model_name: str,
+    summary_text: str,
+    input_tokens: int,
+    output_tokens: int
+) -> Tuple[QueryHistorySummary, bool]:
+    """
+    대화 요약 저장 후 (요약, 새로 저장했는지)를 반환합니다.
+    다른 워커가 먼저 저장했으면 (저장된 요약, False)를 반환합니다.
+    """
+    # 이전 실패 기록은 요약과 같은 트랜잭션에서 삭제
+    await db.execute(delete(QueryHistorySummaryFailure).where(
+        QueryHistorySummaryFailure.history_id == history_id,
+        QueryHistorySummaryFailure.ai_model_name == ai_model_name
+    ))
+    summary = QueryHistorySummary(
+        history_id=history_id,
+        ai_model_name=ai_model_name,
+        summary_text=summary_text,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens
+    )
+    db.add(summary)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return await get_summary(db, history_id=history_id, ai_model_name=ai_model_name), False
+    await db.refresh(summary)
+    return summary, True
+
+async def record_failure(
+    db: AsyncSession,
+    history_id: int,
+    ai_model_name: str,
+    retry_delay: float,
+    max_retry_delay: float
+) -> QueryHistorySummaryFailure:
+    """요약 생성 실패 기록 (실패할 때마다 다음 시도까지의 대기 시간을 두 배로, max_retry_delay까지)"""
+    result = await db.execute(select(QueryHistorySummaryFailure).where(
+        QueryHistorySummaryFailure.history_id == history_id,
+        QueryHistorySummaryFailure.ai_model_name == ai_model_name
+    ))
+    failure = result.scalar_one_or_none()
+    if failure is None:
+        failure = QueryHistorySummaryFailure(history_id=history_id, ai_model_name=ai_model_name, attempts=0)
+        db.add(failure)
+    failure.attempts += 1
+    delay = min(retry_delay * 2 ** (failure.attempts - 1), max_retry_delay)
+    failure.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 다른 워커가 같은 실패를 먼저 기록함
+        await db.rollback()
+        result = await db.execute(select(QueryHistorySummaryFailure).where(
+            QueryHistorySummaryFailure.history_id == history_id,
+            QueryHistorySummaryFailure.ai_model_name == ai_model_name
+        ))
+        return result.scalar_one()
+    await db.refresh(failure)
+    return failure
+
+async def get_unsummarized_histories(
+    db: AsyncSession,
+    ai_model_name: str,
+    limit: int = 50,
+    max_attempts: Optional[int] = None
+) -> List[QueryHistory]:
+    """
+    요약이 없는 채팅 히스토리 조회 (오래된 순)
+    생성에 실패한 히스토리는 next_attempt_at 전이거나 max_attempts번 실패했으면 제외합니다.
+    """
+    summarized = select(QueryHistorySummary.history_id).where(QueryHistorySummary.ai_model_name == ai_model_name)
+    backing_off = select(QueryHistorySummaryFailure.history_id).where(
+        QueryHistorySummaryFailure.ai_model_name == ai_model_name,
+        QueryHistorySummaryFailure.next_attempt_at > datetime.utcnow()
+    )
+    if max_attempts is not None:
+        backing_off = backing_off.union(select(QueryHistorySummaryFailure.history_id).where(
+            QueryHistorySummaryFailure.ai_model_name == ai_model_name,
+            QueryHistorySummaryFailure.attempts >= max_attempts
+        ))
+    query = (
+        select(QueryHistory)
+        .where(QueryHistory.id.not_in(summarized), QueryHistory.id.not_in(backing_off))
+        .order_by(QueryHistory.id)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return result.scalars().all()
@@ -7,7 +7,7 @@
 # - GET /users/{id}/token-usage: 사용자 토큰 사용량 통계
 # - GET /me, PUT /me: 내 정보 조회/수정
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 from datetime import datetime
@@ -17,8 +17,7 @@ from schemas.user import UserRead, UserCreate, UserUpdate, UserList, UserReadWit
 from schemas.query_history import ChatHistoryList, QueryHistoryRead, ChatHistorySummary
 from api.routers.crud import crud_user, crud_query_history, crud_token_usage_log
 from api.deps import get_current_admin_user, get_current_active_user, check_admin_or_self_access
-from services import azure_openai_service
-from core.config import settings
+from services.chat_summary import chat_summaries
 
 router = APIRouter()
 
@@ -299,12 +298,12 @@ async def search_my_chat_history(
 @router.post("/me/chat-history/{history_id}/summarize", response_model=ChatHistorySummary, summary="대화 요약")
 async def summarize_chat_history(
     history_id: int,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     특정 채팅 히스토리의 대화 내용을 AI로 요약
+    요약은 히스토리별로 한 번만 생성해 저장하며, 이후 요청은 저장된 요약을 반환합니다.
     """
     # 해당 히스토리가 현재 사용자 소유인지 확인
     history = await crud_query_history.get_chat_history_by_id(
@@ -320,28 +319,14 @@ async def summarize_chat_history(
         )
     
     try:
-        # AI 요약 생성
-        summary, input_tokens, output_tokens = await azure_openai_service.summarize_conversation(
-            query_text=history.query_text,
-            response_text=history.response_text
-        )
-        
-        # 토큰 사용량 로그 (백그라운드 작업)
-        if input_tokens > 0 and output_tokens > 0:
-            background_tasks.add_task(
-                crud_token_usage_log.create_token_usage_log,
-                db=db,
-                user_id=current_user.id,
-                ai_model_name=settings.AZURE_OPENAI_CHAT_DEPLOYMENT_NAME,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens
-            )
+        # 저장된 요약이 있으면 반환, 없으면 한 번만 생성해 저장 (토큰 사용량은 생성 시 기록)
+        summary = await chat_summaries.get_summary(db, history)
         
         return ChatHistorySummary(
             history_id=history.id,
             original_query=history.query_text,
             original_response=history.response_text,
-            summary=summary,
+            summary=summary.summary_text,
             created_at=history.created_at
         )
         
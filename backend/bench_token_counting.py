@@ -0,0 +1,66 @@
+"""
+토큰 계산 마이크로 벤치마크
+- 호출마다 encoding_for_model을 부르던 기존 방식과 인코더 캐시(get_encoding)를 비교합니다.
+- 대화 1턴(프롬프트 + 응답)의 토큰 계산이 이벤트 루프 스레드에서 쓰는 시간을 비교합니다.
+실행: python bench_token_counting.py
+"""
+import asyncio
+import time
+import timeit
+import tiktoken
+from langchain_core.messages import AIMessage
+from services.azure_openai_service import count_tokens, count_tokens_many, count_usage, get_encoding
+
+MODEL_NAME = "gpt-4o"
+PROMPT = "다음 대화를 간결하고 핵심적인 내용으로 요약해주세요. 워런 버핏 기준으로 삼성전자를 분석해주세요. " * 20
+RESPONSE = "## 종목 개요\n- 삼성전자는 ROE와 부채비율 기준을 충족하며 안정적인 현금흐름을 보입니다.\n" * 30
+
+def count_tokens_uncached(text: str, model_name: str) -> int:
+    """기존 방식: 호출마다 인코더 조회"""
+    try:
+        encoding = tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return len(encoding.encode(text))
+
+def bench(label: str, fn, number: int = 200) -> float:
+    per_call = min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+    print(f"{label:<42} {per_call:10.1f} µs")
+    return per_call
+
+async def loop_blocking_time(fn, number: int = 200) -> float:
+    """이벤트 루프 스레드에서 실제로 소비한 CPU 시간(µs/턴)"""
+    start = time.thread_time()
+    for _ in range(number):
+        await fn()
+    return (time.thread_time() - start) / number * 1e6
+
+def main():
+    get_encoding(MODEL_NAME)  # 첫 로드(BPE 파일) 비용은 제외
+    print("=== 토큰 계산 벤치마크 (대화 1턴: 프롬프트 + 응답) ===")
+    before = bench("기존: encoding_for_model 매 호출", lambda: (
+        count_tokens_uncached(PROMPT, MODEL_NAME), count_tokens_uncached(RESPONSE, MODEL_NAME)
+    ))
+    bench("인코더 캐시: count_tokens x2", lambda: (count_tokens(PROMPT, MODEL_NAME), count_tokens(RESPONSE, MODEL_NAME)))
+    bench("인코더 캐시: count_tokens_many", lambda: count_tokens_many([PROMPT, RESPONSE], MODEL_NAME))
+    bench("인코더 조회만: encoding_for_model", lambda: tiktoken.encoding_for_model(MODEL_NAME), number=2000)
+    bench("인코더 조회만: get_encoding", lambda: get_encoding(MODEL_NAME), number=2000)
+
+    print("=== 이벤트 루프 스레드 CPU 시간 (µs/턴) ===")
+    with_usage = AIMessage(content=RESPONSE, usage_metadata={"input_tokens": 900, "output_tokens": 1200, "total_tokens": 2100})
+    without_usage = AIMessage(content=RESPONSE)
+
+    async def inline() -> None:
+        count_tokens_uncached(PROMPT, MODEL_NAME)
+        count_tokens_uncached(RESPONSE, MODEL_NAME)
+
+    async def run() -> None:
+        print(f"{'기존: 루프에서 직접 계산':<42} {await loop_blocking_time(inline):10.1f} µs")
+        print(f"{'Azure 사용량 메타데이터 사용':<42} {await loop_blocking_time(lambda: count_usage(PROMPT, with_usage)):10.1f} µs")
+        print(f"{'메타데이터 없음: 스레드에서 계산':<42} {await loop_blocking_time(lambda: count_usage(PROMPT, without_usage)):10.1f} µs")
+
+    asyncio.run(run())
+    print(f"(기존 방식 턴당 {before:.1f} µs)")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
 from abc import ABC, abstractmethod
+import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from schemas.analysis import AnalysisRequest, AnalysisResponse, StockRecommendation, StockAnalysis, StockRecommendationRequest, StockAnalysisRequest
 from schemas.user import User
 from services.stock_analysis import StockAnalysisService
-from services.cache import CacheService
+from core.config import settings
+from services.cache import cache_service
+from services.singleflight import SingleFlight
 from services.logger import LoggerService
-from services.data_providers import OpenDARTProvider, FinancialServicesStockProvider
+from services.data_providers import opendart_provider, fss_provider
 from schemas.chat import MessageType  # 채팅 메시지 타입 상수
 
+# 에이전트는 요청마다 생성되므로 진행 중인 계산은 모듈 단위로 공유
+inflight = SingleFlight()
+
 class StockAnalysisAgent(ABC):
     @abstractmethod
     async def analyze_stocks(self, request: AnalysisRequest) -> AnalysisResponse:
@@ -46,10 +52,11 @@ class StockAnalysisAgent(ABC):
         pass
 
     def __init__(self):
-        self.cache_service = CacheService()
+        self.cache_service = cache_service
         self.logger = LoggerService()
-        self.opendart = OpenDARTProvider()
-        self.fss = FinancialServicesStockProvider()
+        # 커넥션 풀을 공유하는 전역 제공자 사용 (main.shutdown_event에서 종료)
+        self.opendart = opendart_provider
+        self.fss = fss_provider
         self.analysis_service = StockAnalysisService(self)
 
     async def process_chat_message(self, request: AnalysisRequest, user: User) -> AnalysisResponse:
@@ -85,87 +92,124 @@ class StockAnalysisAgent(ABC):
         종목 추천을 수행하고 결과를 반환합니다.
         """
         try:
-            # 캐시 확인
+            # soft TTL이 지난 결과는 즉시 반환하고 백그라운드에서 갱신,
+            # 캐시가 없으면 같은 키의 동시 요청이 하나의 계산 결과를 공유
             cache_key = f"recommendations:{request.market_segment}:{request.min_score}"
-            cached_result = await self.cache_service.get(cache_key)
-            if cached_result:
-                return cached_result
+            return await self.cache_service.get_or_refresh(
+                cache_key,
+                lambda: self._build_stock_recommendations(request),
+                soft_ttl=settings.RECOMMENDATION_SOFT_TTL,
+                hard_ttl=settings.RECOMMENDATION_HARD_TTL
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error getting stock recommendations: {str(e)}")
+            raise
 
+    async def _build_stock_recommendations(self, request: StockRecommendationRequest) -> AnalysisResponse:
+        """
+        종목 추천을 계산합니다. 캐시 저장은 get_or_refresh가 담당합니다.
+        """
+        try:
             # 시장 데이터 수집
             market_data = await self.analysis_service.get_market_data(request.market_segment)
             
-            # 종목 분석
-            recommendations = []
-            for stock_data in market_data:
-                try:
-                    # 재무 데이터 조회
-                    financial_data = await self.analysis_service.get_financial_data(stock_data['srtnCd'])
-                    
-                    # 버핏 기준 평가
-                    criteria_scores = self.analysis_service.evaluate_buffett_criteria({
-                        "market_data": stock_data,
-                        "financial_data": financial_data
-                    })
-                    
-                    # ESG 분석
-                    esg_scores = await self.analysis_service.get_esg_scores(stock_data['srtnCd']) if request.include_esg else None
-                    
-                    # 리스크 분석
-                    risk_scores = await self.analysis_service.get_risk_scores(stock_data['srtnCd']) if request.include_risk_analysis else None
-                    
-                    # 종합 점수 계산
-                    total_score = self.analysis_service.calculate_total_score(
-                        criteria_scores,
-                        esg_scores,
-                        risk_scores
-                    )
-                    
-                    if total_score >= request.min_score:
-                        # 추천 이유 생성
-                        reason = self._generate_recommendation_reason(
-                            stock_data,
-                            financial_data,
-                            criteria_scores,
-                            esg_scores,
-                            risk_scores,
-                            total_score
-                        )
-                        
-                        recommendations.append(StockRecommendation(
-                            name=stock_data['itmsNm'],
-                            market=stock_data.get('mrktCtg', 'KOSPI'),  # 시장 구분
-                            currentPrice=float(stock_data['clpr']),
-                            changeRate=float(stock_data.get('fltRt', 0)),
-                            volume=float(stock_data.get('trqu', 0)),
-                            marketCap=float(stock_data['mrktTotAmt']),
-                            reason=reason,
-                            criteria_scores=criteria_scores,
-                            esg_scores=esg_scores,
-                            risk_scores=risk_scores,
-                            total_score=total_score
-                        ))
-                except Exception as e:
-                    self.logger.error(f"Error analyzing stock {stock_data['srtnCd']}: {str(e)}")
-                    continue
+            # 종목 분석 (동시 실행 수 제한, 종목별 제한 시간 및 오류 격리)
+            semaphore = asyncio.Semaphore(settings.AGENT_ANALYSIS_CONCURRENCY)
+            results = await asyncio.gather(*[
+                self._analyze_stock_bounded(semaphore, stock_data, request)
+                for stock_data in market_data
+            ])
+            recommendations = [recommendation for recommendation in results if recommendation is not None]
             
             # 점수 기준으로 정렬하고 결과 제한
             recommendations.sort(key=lambda x: x.total_score, reverse=True)
             recommendations = recommendations[:request.max_results]
             
-            # 결과 캐싱
-            response = AnalysisResponse(
+            return AnalysisResponse(
                 message_type=MessageType.STOCK_RECOMMENDATION,
                 content="종목 추천 결과입니다.",
                 analysis_result=recommendations
             )
-            await self.cache_service.set(cache_key, response, ttl=3600)  # 1시간 캐시
-            
-            return response
             
         except Exception as e:
-            self.logger.error(f"Error getting stock recommendations: {str(e)}")
+            self.logger.error(f"Error building stock recommendations: {str(e)}")
             raise
 
+    async def _analyze_stock_bounded(self, semaphore: asyncio.Semaphore, stock_data: Dict[str, Any],
+                                     request: StockRecommendationRequest) -> Optional[StockRecommendation]:
+        """
+        동시 실행 수와 제한 시간 안에서 한 종목을 분석합니다. 실패한 종목은 None으로 건너뜁니다.
+        """
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self._analyze_stock(stock_data, request),
+                    timeout=settings.AGENT_STOCK_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                self.logger.error(f"Timeout analyzing stock {stock_data.get('srtnCd')}")
+            except Exception as e:
+                self.logger.error(f"Error analyzing stock {stock_data.get('srtnCd')}: {str(e)}")
+            return None
+
+    async def _analyze_stock(self, stock_data: Dict[str, Any],
+                             request: StockRecommendationRequest) -> Optional[StockRecommendation]:
+        """
+        한 종목을 분석하여 최소 점수 이상이면 추천 항목을 반환합니다.
+        """
+        stock_code = stock_data['srtnCd']
+
+        async def skip() -> None:
+            return None
+
+        # 재무 데이터 / ESG / 리스크 조회는 서로 독립적이므로 동시에 수행
+        financial_data, esg_scores, risk_scores = await asyncio.gather(
+            self.analysis_service.get_financial_data(stock_code),
+            self.analysis_service.get_esg_scores(stock_code) if request.include_esg else skip(),
+            self.analysis_service.get_risk_scores(stock_code) if request.include_risk_analysis else skip()
+        )
+        
+        # 버핏 기준 평가
+        criteria_scores = self.analysis_service.evaluate_buffett_criteria({
+            "market_data": stock_data,
+            "financial_data": financial_data
+        })
+        
+        # 종합 점수 계산
+        total_score = self.analysis_service.calculate_total_score(
+            criteria_scores,
+            esg_scores,
+            risk_scores
+        )
+        
+        if total_score < request.min_score:
+            return None
+        
+        # 추천 이유 생성
+        reason = self._generate_recommendation_reason(
+            stock_data,
+            financial_data,
+            criteria_scores,
+            esg_scores,
+            risk_scores,
+            total_score
+        )
+        
+        return StockRecommendation(
+            name=stock_data['itmsNm'],
+            market=stock_data.get('mrktCtg', 'KOSPI'),  # 시장 구분
+            currentPrice=float(stock_data['clpr']),
+            changeRate=float(stock_data.get('fltRt', 0)),
+            volume=float(stock_data.get('trqu', 0)),
+            marketCap=float(stock_data['mrktTotAmt']),
+            reason=reason,
+            criteria_scores=criteria_scores,
+            esg_scores=esg_scores,
+            risk_scores=risk_scores,
+            total_score=total_score
+        )
+
     def _generate_recommendation_reason(self, stock_data: Dict[str, Any], 
                                       financial_data: Dict[str, Any],
                                       criteria_scores: Dict[str, float],
@@ -214,6 +258,18 @@ class StockAnalysisAgent(ABC):
             if cached_result:
                 return cached_result
 
+            # 같은 종목의 동시 요청은 하나의 분석 결과를 공유
+            return await inflight.do(cache_key, lambda: self._build_detailed_analysis(stock_code, cache_key))
+            
+        except Exception as e:
+            self.logger.error(f"Error getting detailed analysis for {stock_code}: {str(e)}")
+            raise
+
+    async def _build_detailed_analysis(self, stock_code: str, cache_key: str) -> StockAnalysis:
+        """
+        특정 종목의 상세 분석을 계산하고 결과를 캐시에 저장합니다.
+        """
+        try:
             # 시장 데이터 수집
             market_data = await self.analysis_service.get_market_data(stock_code=stock_code)
             
@@ -260,7 +316,7 @@ class StockAnalysisAgent(ABC):
             return analysis
             
         except Exception as e:
-            self.logger.error(f"Error getting detailed analysis for {stock_code}: {str(e)}")
+            self.logger.error(f"Error building detailed analysis for {stock_code}: {str(e)}")
             raise
 
     async def _process_general_chat(self, request: AnalysisRequest, user: User) -> AnalysisResponse:
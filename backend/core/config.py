@@ -32,10 +32,86 @@ class Settings(BaseSettings):
     
     # 금융위원회 API 설정
     FSS_API_KEY: str
+    FSS_PAGE_SIZE: int = 1000
+    FSS_MAX_CONCURRENCY: int = 8
+    FSS_PROBE_BATCH_SIZE: int = 3  # 동시에 조회해 볼 영업일 수
+    FSS_MAX_LOOKBACK_DAYS: int = 7  # 최대 조회 영업일 수
+    FSS_TRADING_DATE_TTL: int = 1800  # 확인된 최신 영업일 재사용 시간(초)
     
     # OpenDART API 설정
     OPEN_DART_API_KEY: str
     
+    # OpenDART HTTP 클라이언트 설정 (커넥션 풀)
+    OPENDART_HTTP2: bool = True
+    OPENDART_MAX_CONNECTIONS: int = 20
+    OPENDART_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    OPENDART_KEEPALIVE_EXPIRY: float = 30.0
+    OPENDART_TIMEOUT: float = 10.0
+    
+    # OpenDART 동시 호출 설정 (연도/분기별 팬아웃)
+    OPENDART_MAX_CONCURRENCY: int = 8
+    OPENDART_REQUEST_TIMEOUT: float = 5.0
+    
+    # OpenDART 고유번호 인덱스 설정 (corpCode.xml)
+    OPENDART_CORP_CODE_ARCHIVE: Optional[str] = None  # 로컬 corpCode.zip 경로 (지정 시 다운로드 생략)
+    OPENDART_CORP_CODE_REFRESH_HOURS: int = 24
+    
+    # 시장 데이터 스냅샷 저장소 (Arrow IPC)
+    MARKET_DATA_STORE_DIR: Optional[str] = None  # 미지정 시 backend/data/market_store
+    MARKET_DATA_WATCH_INTERVAL: float = 5.0  # 최신 스냅샷 변경 확인 주기(초)
+    MARKET_DATA_KEEP_INTRADAY: int = 3  # 최신 거래일의 장중 스냅샷 보존 개수
+    MARKET_DATA_KEEP_DAYS: int = 30  # 거래일별 마지막 스냅샷 보존 거래일 수
+    
+    # 종목별 일별 시세 이력 저장소
+    PRICE_HISTORY_DIR: Optional[str] = None  # 미지정 시 backend/data/price_history
+    PRICE_HISTORY_BACKFILL_DAYS: int = 250  # 백필 기본 기간(영업일)
+    PRICE_HISTORY_MAX_CHUNKS: int = 16  # 종목별 청크 수가 이보다 많으면 병합
+    PRICE_HISTORY_RETRY_COOLDOWN: float = 3600.0  # 이력이 부족하거나 백필에 실패한 종목의 재시도 대기(초)
+    
+    # 워런 버핏 기준 점수 테이블
+    BUFFETT_SCORE_DB_PATH: Optional[str] = None  # 미지정 시 backend/data/buffett/scores.db
+    BUFFETT_SCORE_KEEP_DAYS: int = 30  # 거래일별 점수 행 보존 기간(일)
+    
+    # 캐시 설정
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    CACHE_DEFAULT_TTL: int = 3600
+    CACHE_SWEEP_INTERVAL: float = 60.0
+    CACHE_BACKEND: str = "memory"  # memory, sqlite, redis
+    CACHE_SQLITE_PATH: Optional[str] = None  # 미지정 시 backend/data/cache/cache.db
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_KEY_PREFIX: str = "stock_analysis:"
+    CACHE_L1_TTL: int = 60  # L2 사용 시 워커별 L1 보관 시간 상한(초)
+    CACHE_MAX_CONCURRENT_REFRESHES: int = 4  # stale-while-revalidate 백그라운드 갱신 동시 실행 상한
+    
+    # 종목 추천 캐시 (soft TTL 경과 후에는 이전 결과를 반환하면서 백그라운드 갱신, hard TTL 경과 시 만료)
+    RECOMMENDATION_SOFT_TTL: int = 3600
+    RECOMMENDATION_HARD_TTL: int = 4 * 3600
+    
+    # 종목 추천 분석 파이프라인 (종목별 동시 분석 상한 / 종목당 제한 시간)
+    AGENT_ANALYSIS_CONCURRENCY: int = 16
+    AGENT_STOCK_TIMEOUT: float = 10.0
+    
+    # LLM 에이전트 실행 (동기 도구 전용 스레드 수 / 동시 실행 상한 / 대기열 길이 / 대기 시간 상한(초))
+    AGENT_TOOL_MAX_WORKERS: int = 4
+    AGENT_MAX_CONCURRENT_RUNS: int = 4
+    AGENT_MAX_QUEUED_RUNS: int = 16
+    AGENT_QUEUE_TIMEOUT: float = 30.0
+    
+    # LLM 응답 영구 캐시 (최신 시장 스냅샷 거래일이 바뀌면 만료)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_DB_PATH: Optional[str] = None  # 미지정 시 backend/data/llm_cache/responses.db
+    LLM_CACHE_SIMILARITY_THRESHOLD: Optional[float] = None  # 지정 시 조건이 같고 질문만 유사한 응답 재사용 (예: 0.95)
+    LLM_CACHE_SIMILARITY_MAX_CANDIDATES: int = 256  # 유사도 비교 대상 최근 항목 수 상한
+    
+    # 대화 요약 일괄 생성 워커 (요약이 없는 히스토리를 주기적으로 미리 요약)
+    CHAT_SUMMARY_BATCH_ENABLED: bool = False
+    CHAT_SUMMARY_BATCH_SIZE: int = 20
+    CHAT_SUMMARY_BATCH_INTERVAL: float = 300.0
+    CHAT_SUMMARY_RETRY_DELAY: float = 600.0  # 요약 실패 시 첫 재시도까지 대기(초), 실패할 때마다 두 배
+    CHAT_SUMMARY_MAX_RETRY_DELAY: float = 24 * 3600.0
+    CHAT_SUMMARY_MAX_ATTEMPTS: int = 5  # 이 횟수만큼 실패한 히스토리는 일괄 생성에서 제외 (요청 시에는 다시 시도)
+    
     class Config:
         env_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
         case_sensitive = True
@@ -4,6 +4,7 @@ from db.session import async_engine
 import db.models.user  # noqa: F401
 import db.models.token_usage_log  # noqa: F401
 import db.models.query_history  # noqa: F401
+import db.models.query_history_summary  # noqa: F401
 
 async def init_models():
     async with async_engine.begin() as conn:
@@ -2,6 +2,7 @@
 from .user import User, UserRole
 from .chat_message import ChatSession, ChatMessage
 from .query_history import QueryHistory
+from .query_history_summary import QueryHistorySummary, QueryHistorySummaryFailure
 from .token_usage_log import TokenUsageLog
 
 __all__ = [
@@ -10,5 +11,7 @@ __all__ = [
     "ChatSession",
     "ChatMessage",
     "QueryHistory",
+    "QueryHistorySummary",
+    "QueryHistorySummaryFailure",
     "TokenUsageLog"
 ]
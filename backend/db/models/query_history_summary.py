@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from db.base_class import Base
+
+class QueryHistorySummary(Base):
+    """대화 요약 (QueryHistory는 변경되지 않으므로 히스토리/모델별로 한 번만 생성)"""
+    __tablename__ = "query_history_summaries"
+    __table_args__ = (UniqueConstraint("history_id", "ai_model_name", name="uq_query_history_summary"),)
+    id = Column(Integer, primary_key=True, index=True)
+    history_id = Column(Integer, ForeignKey("query_histories.id", ondelete="CASCADE"), nullable=False, index=True)
+    ai_model_name = Column(String, nullable=False)
+    summary_text = Column(String, nullable=False)
+    input_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class QueryHistorySummaryFailure(Base):
+    """대화 요약 생성 실패 기록 (일괄 생성 워커는 next_attempt_at 전까지 다시 시도하지 않음)"""
+    __tablename__ = "query_history_summary_failures"
+    __table_args__ = (UniqueConstraint("history_id", "ai_model_name", name="uq_query_history_summary_failure"),)
+    id = Column(Integer, primary_key=True, index=True)
+    history_id = Column(Integer, ForeignKey("query_histories.id", ondelete="CASCADE"), nullable=False, index=True)
+    ai_model_name = Column(String, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)  # UTC
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -7,6 +7,12 @@ from api.routers.auth import router as auth_router  # JWT 발행이 구현된 
 from api.routers.user_management import router as user_router
 from core.config import settings
 from db.init_db import init_models
+from services.data_providers import opendart_provider
+from services.cache import cache_service
+from services.stock_analysis import stock_analysis
+from services.technical_indicators import technical_indicators
+from services.agent_runtime import tool_executor
+from services.chat_summary import chat_summaries
 
 app = FastAPI(
     title="AI Stock Analysis API",
@@ -37,6 +43,21 @@ async def root():
 @app.on_event("startup")
 async def startup_event():
     await init_models()
+    await opendart_provider.start()
+    cache_service.start_sweeper()
+    stock_analysis.hot_snapshot.start_watcher()
+    stock_analysis.schedule_market_data_retention()
+    technical_indicators.schedule_refresh()
+    if settings.CHAT_SUMMARY_BATCH_ENABLED:
+        chat_summaries.start_worker()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stock_analysis.hot_snapshot.stop_watcher()
+    await chat_summaries.stop_worker()
+    await cache_service.close()
+    await opendart_provider.close()
+    tool_executor.shutdown(wait=False)
 
 # Swagger UI에서 JWT 인증 헤더 입력 지원
 # (FastAPI 공식 문서 참고)
@@ -4,13 +4,18 @@
 - 펀더멘털 분석
 - 시장 심리 분석
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Type
 from dataclasses import dataclass
+from langchain.tools import BaseTool
+from pydantic import BaseModel, Field
+import json
 import logging
 from datetime import datetime, timedelta
 import random
 from .data_providers.opendart_api import opendart_provider
 from .data_providers.financial_services_stock import fss_provider
+from .price_history import price_history
+from .technical_indicators import technical_indicators, TECHNICAL_LOOKBACK_DAYS
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +28,8 @@ class TechnicalAnalysis:
     momentum_score: float
     volatility_score: float
     volume_score: float
+    rsi: Optional[float] = None
+    atr: Optional[float] = None
 
 @dataclass
 class FundamentalAnalysis:
@@ -47,6 +54,8 @@ class AdvancedAnalysisTool:
     def __init__(self):
         self.opendart = opendart_provider
         self.fss = fss_provider
+        self.price_history = price_history
+        self.indicators = technical_indicators
     
     async def analyze_stock(self, symbol: str) -> Dict[str, Any]:
         """주식 종합 분석"""
@@ -79,13 +88,20 @@ class AdvancedAnalysisTool:
     async def _analyze_technical(self, symbol: str) -> TechnicalAnalysis:
         """기술적 분석"""
         try:
-            # 금융위원회 API에서 시장 데이터 조회
-            market_data = await self.fss.get_market_data(symbol)
-            if not market_data:
+            # 미리 계산된 지표 행렬에서 조회
+            indicators = self.indicators.lookup(symbol)
+            if indicators is None and not self.price_history.is_cooling_down(symbol):
+                # 행렬에 없는 종목은 이력을 확보(부족하면 백필)한 뒤 해당 종목만 계산해 반영
+                # 실패하거나 여전히 계산할 수 없으면 재시도 대기 시간 동안 Mock 데이터로 응답
+                await self.price_history.load_history(symbol, TECHNICAL_LOOKBACK_DAYS)
+                await self.indicators.refresh([symbol])
+                indicators = self.indicators.lookup(symbol)
+                if indicators is None:
+                    self.price_history.cool_down(symbol)
+            if indicators is None:
                 return self._get_mock_technical_analysis(symbol)
             
-            # 실제 데이터 분석 로직 구현 필요
-            return self._get_mock_technical_analysis(symbol)
+            return TechnicalAnalysis(**indicators)
             
         except Exception as e:
             logger.error(f"기술적 분석 오류 ({symbol}): {e}")
@@ -206,4 +222,28 @@ class AdvancedAnalysisTool:
         )
 
 # 싱글톤 인스턴스 생성
-advanced_analyzer = AdvancedAnalysisTool()
\ No newline at end of file
+advanced_analyzer = AdvancedAnalysisTool()
+
+class AdvancedAnalysisInput(BaseModel):
+    """Input for AdvancedStockAnalysis Tool"""
+    symbol: str = Field(..., description="Stock code to analyze (e.g. 005930)")
+
+class AdvancedStockAnalysisTool(BaseTool):
+    """종목 고급 분석(기술적/펀더멘털/시장 심리) 도구"""
+    
+    name: str = "advanced_stock_analysis"
+    description: str = """종목코드로 기술적, 펀더멘털, 시장 심리 분석과 종합 점수를 조회합니다."""
+    args_schema: Type[BaseModel] = AdvancedAnalysisInput
+
+    def _run(self, symbol: str) -> str:
+        """
+        동기 실행은 지원하지 않습니다. (비동기 전용 도구)
+        분석기가 공유하는 HTTP 클라이언트와 싱글플라이트는 서버 이벤트 루프에 묶여 있어
+        asyncio.run으로 만든 새 루프에서 사용할 수 없으므로, 에이전트는 ainvoke/astream으로 실행해야 합니다.
+        """
+        return f"❌ 고급 분석 도구는 비동기 실행만 지원합니다. (종목코드: {symbol})"
+
+    async def _arun(self, symbol: str) -> str:
+        """비동기 실행: 분석기의 비동기 조회를 그대로 사용"""
+        result = await advanced_analyzer.analyze_stock(symbol)
+        return json.dumps(result, ensure_ascii=False)
@@ -1,14 +1,16 @@
 import asyncio
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Optional
 from langchain_openai import AzureChatOpenAI
 from langchain.agents import create_openai_functions_agent, AgentExecutor
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.schema import BaseMessage, HumanMessage, SystemMessage
 from langchain.tools import BaseTool
 from core.config import settings
-from services.buffett_filter_tool_simple import BuffettFilter
-from services.advanced_analysis_tool import AdvancedAnalysisTool
+from services.buffett_filter_tool_simple import BuffettFilterTool
+from services.advanced_analysis_tool import AdvancedStockAnalysisTool
+from services.agent_runtime import AdmissionRejected, analysis_admission
+from services.llm_cache import llm_response_cache
 from services.logger import LoggerService
 from services.data_providers.financial_services_stock import fss_provider
 from services.data_providers.opendart_api import opendart_provider
@@ -55,12 +57,15 @@ class WarrenBuffettAgent:
             api_key=settings.AZURE_OPENAI_API_KEY,
             azure_deployment=settings.AZURE_OPENAI_CHAT_DEPLOYMENT_NAME,
             openai_api_version=settings.OPENAI_API_VERSION,
+            cache=llm_response_cache,  # 도구 결과가 포함된 프롬프트 단위로 응답 재사용
         )
+        # 분석 결과 전체 캐시 네임스페이스 (배포별)
+        self.result_namespace = f"buffett-agent:{settings.AZURE_OPENAI_CHAT_DEPLOYMENT_NAME}"
         
-        # 도구 초기화
+        # 도구 초기화 (비동기 실행 시 _arun 사용)
         self.tools = [
-            BuffettFilter(),
-            AdvancedAnalysisTool()
+            BuffettFilterTool(),
+            AdvancedStockAnalysisTool()
         ]
         
         # 시스템 프롬프트 설정
@@ -94,64 +99,132 @@ class WarrenBuffettAgent:
         self.agent_executor = AgentExecutor(
             agent=self.agent,
             tools=self.tools,
+            return_intermediate_steps=True,
             verbose=True
         )
     
-    async def analyze_stock(self, question: str) -> Dict[str, Any]:
+    async def analyze_stock(self, question: str, user_question: Optional[str] = None) -> Dict[str, Any]:
         """
         주식 분석을 수행하고 결과를 반환합니다.
+        user_question은 question에 포함된 사용자 입력 부분으로, 지정하면 나머지 조건이 같고
+        사용자 입력만 유사한 이전 분석 결과도 재사용합니다. (LLM_CACHE_SIMILARITY_THRESHOLD 지정 시)
         """
         try:
             logger.info(f"Starting stock analysis for question: {question}")
-            # 에이전트 실행
-            result = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.agent_executor.invoke({"input": question})
-            )
-            analysis_output = result.get("output", "")
-            # 구조화된 JSON 파싱 시도
-            try:
-                parsed = json.loads(analysis_output) if isinstance(analysis_output, str) else analysis_output
-                # content_type, structured_data, text 필드가 있으면 그대로 반환
-                if isinstance(parsed, dict) and "content_type" in parsed:
-                    logger.info("Structured JSON result detected from agent.")
-                    return {
-                        "recommendations": [parsed.get("text", "")],
-                        "raw_output": analysis_output,
-                        "tools_used": self._extract_tools_used(result),
-                        "success": True,
-                        "content_type": parsed.get("content_type"),
-                        "structured_data": parsed.get("structured_data"),
-                        "text": parsed.get("text", "")
-                    }
-            except Exception as e:
-                logger.warning(f"Agent output is not valid JSON: {e}")
-            # fallback: 기존 텍스트 파싱
-            recommendations = self._parse_analysis_output(analysis_output)
-            logger.info(f"Analysis completed with {len(recommendations)} recommendations")
-            return {
-                "recommendations": recommendations,
-                "raw_output": analysis_output,
-                "tools_used": self._extract_tools_used(result),
-                "success": True,
-                "content_type": "text",
-                "structured_data": None,
-                "text": analysis_output
-            }
+            cached = await self._get_cached_result(question, user_question)
+            if cached is not None:
+                logger.info("Returning cached stock analysis result")
+                return cached
+            # 에이전트 실행 (동시 실행 상한을 넘으면 대기열에서 대기, 대기열이 가득 차면 거절)
+            async with analysis_admission.slot():
+                result = await self.agent_executor.ainvoke({"input": question, "chat_history": []})
+            analysis = self._build_result(result)
+            await self._put_cached_result(question, analysis, user_question)
+            return analysis
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"Error in stock analysis: {str(e)}")
-            return {
-                "recommendations": [
-                    f"❌ 분석 중 오류가 발생했습니다: {str(e)}",
-                    "💡 다시 시도하시거나 다른 종목으로 질문해주세요."
-                ],
-                "raw_output": str(e),
-                "tools_used": [],
-                "success": False,
-                "content_type": "text",
-                "structured_data": None,
-                "text": str(e)
-            }
+            return self._build_error_result(e)
+    
+    async def stream_analysis(self, question: str, user_question: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        주식 분석을 수행하면서 진행 이벤트를 순서대로 내보냅니다.
+        - tool_start / tool_end: 도구 호출 시작/종료
+        - token: LLM 응답 토큰
+        - result: analyze_stock과 같은 형식의 최종 결과 (오류 시 error 후 실패 결과)
+        실행 슬롯(analysis_admission)은 호출자가 확보하며, user_question은 analyze_stock과 같습니다.
+        """
+        try:
+            logger.info(f"Starting streaming stock analysis for question: {question}")
+            cached = await self._get_cached_result(question, user_question)
+            if cached is not None:
+                yield {"event": "result", "data": cached}
+                return
+            result = None
+            async for event in self.agent_executor.astream_events(
+                {"input": question, "chat_history": []}, version="v2"
+            ):
+                kind = event["event"]
+                if kind == "on_chat_model_stream":
+                    content = event["data"]["chunk"].content
+                    if content:
+                        yield {"event": "token", "text": content}
+                elif kind == "on_tool_start":
+                    yield {"event": "tool_start", "tool": event["name"], "input": event["data"].get("input")}
+                elif kind == "on_tool_end":
+                    yield {"event": "tool_end", "tool": event["name"], "output": str(event["data"].get("output", ""))}
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    # 최상위 AgentExecutor 종료 이벤트에 최종 출력과 중간 단계가 포함됨
+                    result = event["data"]["output"]
+            if result is None:
+                raise RuntimeError("에이전트 실행 결과가 없습니다.")
+            analysis = self._build_result(result)
+            await self._put_cached_result(question, analysis, user_question)
+            yield {"event": "result", "data": analysis}
+        except Exception as e:
+            logger.error(f"Error in streaming stock analysis: {str(e)}")
+            yield {"event": "error", "message": str(e)}
+            yield {"event": "result", "data": self._build_error_result(e)}
+    
+    async def _get_cached_result(self, question: str, user_question: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """같은 데이터 버전에서 같은 질문으로 성공한 분석 결과가 있으면 반환합니다."""
+        if llm_response_cache is None:
+            return None
+        return await asyncio.to_thread(llm_response_cache.get_result, self.result_namespace, question, user_question)
+    
+    async def _put_cached_result(self, question: str, analysis: Dict[str, Any], user_question: Optional[str] = None) -> None:
+        if llm_response_cache is not None and analysis.get("success"):
+            await asyncio.to_thread(
+                llm_response_cache.put_result, self.result_namespace, question, analysis, user_question
+            )
+    
+    def _build_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """에이전트 실행 결과를 응답 형식으로 변환합니다."""
+        analysis_output = result.get("output", "")
+        # 구조화된 JSON 파싱 시도
+        try:
+            parsed = json.loads(analysis_output) if isinstance(analysis_output, str) else analysis_output
+            # content_type, structured_data, text 필드가 있으면 그대로 반환
+            if isinstance(parsed, dict) and "content_type" in parsed:
+                logger.info("Structured JSON result detected from agent.")
+                return {
+                    "recommendations": [parsed.get("text", "")],
+                    "raw_output": analysis_output,
+                    "tools_used": self._extract_tools_used(result),
+                    "success": True,
+                    "content_type": parsed.get("content_type"),
+                    "structured_data": parsed.get("structured_data"),
+                    "text": parsed.get("text", "")
+                }
+        except Exception as e:
+            logger.warning(f"Agent output is not valid JSON: {e}")
+        # fallback: 기존 텍스트 파싱
+        recommendations = self._parse_analysis_output(analysis_output)
+        logger.info(f"Analysis completed with {len(recommendations)} recommendations")
+        return {
+            "recommendations": recommendations,
+            "raw_output": analysis_output,
+            "tools_used": self._extract_tools_used(result),
+            "success": True,
+            "content_type": "text",
+            "structured_data": None,
+            "text": analysis_output
+        }
+    
+    def _build_error_result(self, error: Exception) -> Dict[str, Any]:
+        return {
+            "recommendations": [
+                f"❌ 분석 중 오류가 발생했습니다: {str(error)}",
+                "💡 다시 시도하시거나 다른 종목으로 질문해주세요."
+            ],
+            "raw_output": str(error),
+            "tools_used": [],
+            "success": False,
+            "content_type": "text",
+            "structured_data": None,
+            "text": str(error)
+        }
     
     def _parse_analysis_output(self, output: str) -> List[str]:
         """
@@ -203,6 +276,7 @@ class WarrenBuffettAgent:
 
 # 전역 에이전트 인스턴스
 _agent_instance = None
+_buffett_agent_instance = None
 
 async def get_agent() -> StockAnalysisAgent:
     """
@@ -213,6 +287,15 @@ async def get_agent() -> StockAnalysisAgent:
         _agent_instance = StockAnalysisAgent()
     return _agent_instance
 
+async def get_buffett_agent() -> WarrenBuffettAgent:
+    """
+    싱글톤 패턴으로 워런 버핏 LLM 에이전트 인스턴스 반환
+    """
+    global _buffett_agent_instance
+    if _buffett_agent_instance is None:
+        _buffett_agent_instance = WarrenBuffettAgent()
+    return _buffett_agent_instance
+
 async def process_query(question: str) -> List[str]:
     """
     주식 분석 질문 처리 (기존 API 호환성을 위한 래퍼 함수)
@@ -0,0 +1,80 @@
+"""
+LLM 에이전트 실행 자원
+- tool_executor: 동기 도구(_run)를 실행하는 에이전트 전용 스레드 풀
+  (기본 스레드 풀을 점유하지 않아 다른 run_in_executor/to_thread 사용자에 영향을 주지 않습니다.)
+- AdmissionLimiter: 동시 실행 수와 대기열 길이를 제한하고, 대기열이 가득 차거나
+  대기 시간이 초과되면 AdmissionRejected를 발생시킵니다.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """에이전트 실행 대기열이 가득 찼거나 대기 시간이 초과됨"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """동시 실행 상한 + 대기열 길이/대기 시간 상한"""
+
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._running = 0
+        self._waiting = 0
+        self._stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "timed_out": 0
+        }
+
+    def is_full(self) -> bool:
+        """실행 중 + 대기 중인 요청이 상한에 도달했는지 (새 요청은 즉시 거절됨)"""
+        return self._running + self._waiting >= self.max_concurrent + self.max_queued
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """실행 슬롯을 얻을 때까지 대기합니다."""
+        if self.is_full():
+            self._stats["rejected"] += 1
+            raise AdmissionRejected("분석 요청이 많아 대기열이 가득 찼습니다.", self.queue_timeout)
+        
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["timed_out"] += 1
+            raise AdmissionRejected("분석 요청 대기 시간이 초과되었습니다.", self.queue_timeout)
+        finally:
+            self._waiting -= 1
+        
+        self._running += 1
+        self._stats["admitted"] += 1
+        try:
+            yield
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "running": self._running, "waiting": self._waiting}
+
+
+tool_executor = ThreadPoolExecutor(max_workers=settings.AGENT_TOOL_MAX_WORKERS, thread_name_prefix="agent-tool")
+analysis_admission = AdmissionLimiter(
+    settings.AGENT_MAX_CONCURRENT_RUNS,
+    settings.AGENT_MAX_QUEUED_RUNS,
+    settings.AGENT_QUEUE_TIMEOUT
+)
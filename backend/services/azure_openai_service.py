@@ -1,5 +1,10 @@
+from functools import lru_cache
+from typing import List, Sequence
+from langchain_core.messages import BaseMessage
 from langchain_openai import AzureChatOpenAI
 from core.config import settings
+from services.llm_cache import CACHE_HIT_METADATA_KEY, llm_response_cache
+import asyncio
 import tiktoken
 
 chat_llm = AzureChatOpenAI(
@@ -7,24 +12,49 @@ chat_llm = AzureChatOpenAI(
     api_key=settings.AZURE_OPENAI_API_KEY,
     azure_deployment=settings.AZURE_OPENAI_CHAT_DEPLOYMENT_NAME,
     openai_api_version=settings.OPENAI_API_VERSION,
+    cache=llm_response_cache,  # 같은 프롬프트는 최신 시장 스냅샷 거래일 동안 Azure 호출 없이 응답
 )
 
-def count_tokens(text: str, model_name: str = "gpt-3.5-turbo") -> int:
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str) -> tiktoken.Encoding:
+    """모델명별 tiktoken 인코더 (모델을 모르면 cl100k_base, 프로세스 내 1회 생성)"""
     try:
-        encoding = tiktoken.encoding_for_model(model_name)
+        return tiktoken.encoding_for_model(model_name)
     except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model_name: str = "gpt-3.5-turbo") -> int:
+    return len(get_encoding(model_name).encode(text))
+
+def count_tokens_many(texts: Sequence[str], model_name: str = "gpt-3.5-turbo") -> List[int]:
+    """여러 텍스트의 토큰 수를 같은 인코더의 일괄 인코딩(encode_batch)으로 한 번에 계산합니다."""
+    encoding = get_encoding(model_name)
+    return [len(tokens) for tokens in encoding.encode_batch(list(texts))]
+
+async def count_usage(prompt: str, response: BaseMessage) -> tuple[int, int]:
+    """
+    (입력 토큰, 출력 토큰)을 반환합니다.
+    LLM 응답 캐시에서 꺼낸 응답은 Azure를 호출하지 않았으므로 (0, 0)입니다.
+    Azure 응답의 사용량(usage_metadata)이 있으면 그대로 쓰고, 없으면 이벤트 루프 밖에서 직접 계산합니다.
+    """
+    if getattr(response, "response_metadata", {}).get(CACHE_HIT_METADATA_KEY):
+        return 0, 0
+    usage = getattr(response, "usage_metadata", None)
+    if usage and usage.get("input_tokens") and usage.get("output_tokens"):
+        return usage["input_tokens"], usage["output_tokens"]
+    input_tokens, output_tokens = await asyncio.to_thread(
+        count_tokens_many, [prompt, response.content], settings.AZURE_OPENAI_CHAT_DEPLOYMENT_NAME
+    )
+    return input_tokens, output_tokens
 
 async def get_ai_response(user_query: str) -> tuple[str, int, int]:
     response_content = await chat_llm.ainvoke(user_query)
     ai_message = response_content.content
-    input_tokens = count_tokens(user_query, model_name=settings.AZURE_OPENAI_CHAT_DEPLOYMENT_NAME)
-    output_tokens = count_tokens(ai_message, model_name=settings.AZURE_OPENAI_CHAT_DEPLOYMENT_NAME)
+    input_tokens, output_tokens = await count_usage(user_query, response_content)
     return ai_message, input_tokens, output_tokens
 
-async def summarize_conversation(query_text: str, response_text: str) -> tuple[str, int, int]:
-    """대화 내용을 요약하는 함수"""
+async def generate_summary(query_text: str, response_text: str) -> tuple[str, int, int]:
+    """대화 내용을 요약합니다. 실패하면 예외가 발생합니다."""
     
     # 요약 프롬프트 구성
     summarize_prompt = f"""
@@ -37,16 +67,19 @@ AI 응답: {response_text}
 요약:
 """
     
+    # AI 요약 생성
+    response_content = await chat_llm.ainvoke(summarize_prompt)
+    summary = response_content.content
+    
+    # 토큰 계산 (Azure 응답 사용량 우선, 캐시 응답은 0)
+    input_tokens, output_tokens = await count_usage(summarize_prompt, response_content)
+    
+    return summary, input_tokens, output_tokens
+
+async def summarize_conversation(query_text: str, response_text: str) -> tuple[str, int, int]:
+    """대화 내용을 요약하는 함수"""
     try:
-        # AI 요약 생성
-        response_content = await chat_llm.ainvoke(summarize_prompt)
-        summary = response_content.content
-        
-        # 토큰 계산
-        input_tokens = count_tokens(summarize_prompt, model_name=settings.AZURE_OPENAI_CHAT_DEPLOYMENT_NAME)
-        output_tokens = count_tokens(summary, model_name=settings.AZURE_OPENAI_CHAT_DEPLOYMENT_NAME)
-        
-        return summary, input_tokens, output_tokens
+        return await generate_summary(query_text, response_text)
         
     except Exception as e:
         # 요약 실패 시 기본 요약 반환
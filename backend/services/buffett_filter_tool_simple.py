@@ -1,16 +1,21 @@
 """
 워런 버핏 투자 기준 종목 스크리닝 도구 (Simplified Enhanced Buffett Filter Tool)
 """
-from typing import Type, Dict, Any, List, Optional
+from typing import Type, Dict, Any, List, Optional, Tuple
+from dataclasses import dataclass
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 import json
 import asyncio
+import functools
 import logging
 import random
+import numpy as np
+import pandas as pd
 
 from .data_providers.opendart_api import opendart_provider
 from .advanced_analysis_tool import advanced_analyzer
+from .agent_runtime import tool_executor
 
 class BuffettFilterInput(BaseModel):
     """Input for Enhanced BuffettFilter Tool"""
@@ -43,6 +48,45 @@ class BuffettFilterInput(BaseModel):
         description="Use real-time data from APIs (if False, use mock data)"
     )
 
+def _valid_market_cap(value: Any) -> float:
+    """정렬용 시가총액 (0 이하, 결측, 무한대는 -inf)"""
+    value = float(value) if value is not None else np.nan
+    return value if np.isfinite(value) and value > 0 else -np.inf
+
+def _positive_finite(values: np.ndarray) -> np.ndarray:
+    """0보다 크고 유한한 값의 마스크"""
+    with np.errstate(invalid="ignore"):
+        return np.isfinite(values) & (values > 0)
+
+@dataclass
+class ScreenContext:
+    """스크리닝 대상 전체에 대한 횡단면 정보 (스크리닝마다 한 번 계산해 모든 기준 점수에서 공유)"""
+    universe_size: int
+    market_cap_rank: Dict[str, int]       # 종목코드 → 시가총액 내림차순 순위 (0부터)
+    sector_avg_margin: Dict[str, float]   # 섹터 → 평균 순이익률
+
+    @classmethod
+    def build(cls, stocks: List[Dict[str, Any]]) -> "ScreenContext":
+        # 시가총액 순위: 동일 시가총액은 입력 순서 유지, 중복 종목코드는 첫 순위 사용
+        # 시가총액이 0 이하이거나 결측인 종목은 정렬 순서를 흐트러뜨리지 않도록 맨 뒤로
+        order = sorted(range(len(stocks)), key=lambda i: _valid_market_cap(stocks[i]["market_cap"]), reverse=True)
+        market_cap_rank: Dict[str, int] = {}
+        for rank, i in enumerate(order):
+            market_cap_rank.setdefault(stocks[i]["symbol"], rank)
+        
+        # 섹터별 순이익률 합계/종목 수를 한 번의 순회로 집계
+        sector_totals: Dict[str, List[float]] = {}
+        for stock in stocks:
+            totals = sector_totals.setdefault(stock["sector"], [0, 0])
+            totals[0] += stock["net_profit_margin"]
+            totals[1] += 1
+        sector_avg_margin = {sector: total / count for sector, (total, count) in sector_totals.items()}
+        
+        return cls(len(stocks), market_cap_rank, sector_avg_margin)
+
+    def market_cap_percentile(self, symbol: str) -> float:
+        return (self.market_cap_rank[symbol] / self.universe_size) * 100
+
 class BuffettFilterTool(BaseTool):
     """워런 버핏의 8단계 투자 기준 스크리닝 도구"""
     
@@ -60,6 +104,21 @@ class BuffettFilterTool(BaseTool):
         try:
             logger = logging.getLogger(__name__)
             
+            # 0. 점수 테이블이 있으면 인덱스 조회로 스크리닝
+            if use_real_data:
+                screened = self._screen_from_table(
+                    market_segment, min_score, include_esg, include_risk_analysis, sectors
+                )
+                if screened is not None:
+                    total_analyzed, qualified_stocks = screened
+                    logger.info(f"점수 테이블 조회: {total_analyzed}개 종목 중 {len(qualified_stocks)}개 통과")
+                    result = self._format_enhanced_results(
+                        market_segment, min_score, total_analyzed,
+                        len(qualified_stocks), qualified_stocks[:max_results], None,
+                        include_esg, include_risk_analysis
+                    )
+                    return json.dumps(result, ensure_ascii=False, indent=2)
+            
             # 1. 시장 데이터 가져오기 (Mock 데이터 사용)
             market_data = self._get_mock_market_data(market_segment)
             if sectors:
@@ -67,17 +126,8 @@ class BuffettFilterTool(BaseTool):
             
             logger.info(f"총 {len(market_data)}개 종목 분석 시작")
             
-            # 2. 각 종목별 종합 점수 계산
-            scored_stocks = []
-            for stock in market_data:
-                try:
-                    scored_stock = self._calculate_enhanced_total_score(
-                        stock, market_data, include_esg, include_risk_analysis
-                    )
-                    scored_stocks.append(scored_stock)
-                except Exception as e:
-                    logger.warning(f"종목 {stock['symbol']} 분석 실패: {e}")
-                    continue
+            # 2. 컬럼 단위로 전 종목 종합 점수 일괄 계산
+            scored_stocks = self._score_batch(market_data, include_esg, include_risk_analysis)
             
             # 3. 필터링 및 정렬
             qualified_stocks = [s for s in scored_stocks if s["total_score"] >= min_score]
@@ -95,6 +145,53 @@ class BuffettFilterTool(BaseTool):
         except Exception as e:
             return f"❌ Enhanced Warren Buffett 필터 분석 중 오류 발생: {str(e)}"
 
+    async def _arun(self, market_segment: str = "KOSPI", min_score: int = 60, max_results: int = 10,
+                    include_esg: bool = True, include_risk_analysis: bool = True,
+                    sectors: Optional[List[str]] = None, use_real_data: bool = True) -> str:
+        """비동기 실행: 채점은 CPU 작업이므로 에이전트 도구 전용 스레드 풀에서 실행"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(tool_executor, functools.partial(
+            self._run, market_segment, min_score, max_results,
+            include_esg, include_risk_analysis, sectors, use_real_data
+        ))
+
+    def _screen_from_table(self, market_segment: str, min_score: int, include_esg: bool,
+                           include_risk_analysis: bool, sectors: Optional[List[str]]
+                           ) -> Optional[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        미리 계산된 점수 테이블에서 (대상 종목 수, 종합 점수 내림차순 통과 종목)을 조회합니다.
+        테이블이 비어 있으면 None.
+        """
+        # 점수 테이블 모듈이 이 모듈의 채점 함수를 사용하므로 실행 시점에 가져옴
+        from .buffett_score_table import buffett_score_table
+        
+        # 종합 점수 = 기본 6단계 가중합 × 정규화 비율 + 리스크 점수 × 리스크 가중치
+        weights = self._calculate_dynamic_weights(include_esg, include_risk_analysis)
+        scale = weights["roe_score"] / self._calculate_dynamic_weights(False, False)["roe_score"]
+        risk_weight = weights.get("risk_score", 0.0)
+        # 리스크 점수 최대값(90)을 받아도 통과할 수 없는 종목은 인덱스 범위에서 제외
+        min_base_score = (min_score - 90 * risk_weight) / scale
+        
+        total, frame = buffett_score_table.screen(market_segment, min_base_score, sectors)
+        if not total:
+            return None
+        # 순이익/자본이 0 이하인 종목은 PER/PBR이 NULL로 저장되므로 0으로 표시
+        frame[["per", "pbr"]] = frame[["per", "pbr"]].astype(float).fillna(0.0)
+        
+        qualified_stocks = []
+        for stock in frame.to_dict("records"):
+            risk_score = random.randint(50, 90) if include_risk_analysis else 0
+            total_score = stock["base_score"] * scale + risk_score * risk_weight
+            if total_score < min_score:
+                continue
+            if include_risk_analysis:
+                stock["risk_score"] = risk_score
+            stock["total_score"] = round(total_score, 1)
+            stock["recommendation"] = self._get_recommendation(total_score)
+            qualified_stocks.append(stock)
+        qualified_stocks.sort(key=lambda x: x["total_score"], reverse=True)
+        return total, qualified_stocks
+
     def _get_mock_market_data(self, market_segment: str) -> List[Dict[str, Any]]:
         """모의 시장 데이터 생성"""
         stock_pool = [
@@ -148,98 +245,112 @@ class BuffettFilterTool(BaseTool):
         
         return market_data
 
-    def _calculate_enhanced_total_score(self, stock: Dict[str, Any], all_stocks: List[Dict[str, Any]], 
+    def _calculate_enhanced_total_score(self, stock: Dict[str, Any], context: ScreenContext, 
                                       include_esg: bool, include_risk_analysis: bool) -> Dict[str, Any]:
-        """강화된 종합 점수 계산"""
-        
+        """강화된 종합 점수 계산 (단일 종목)"""
+        frame = pd.DataFrame([stock])
+        total_scores, score_matrix = self._score_frame(frame, context, include_esg, include_risk_analysis)
+        return self._scored_view(stock, score_matrix, total_scores, 0)
+
+    def _score_batch(self, stocks: List[Dict[str, Any]], include_esg: bool,
+                     include_risk_analysis: bool) -> List[Dict[str, Any]]:
+        """전 종목을 컬럼 단위로 한 번에 채점하고 종목별 결과 딕셔너리로 반환합니다."""
+        if not stocks:
+            return []
+        frame = pd.DataFrame(stocks)
+        context = ScreenContext.build(stocks)
+        total_scores, score_matrix = self._score_frame(frame, context, include_esg, include_risk_analysis)
+        return [self._scored_view(stock, score_matrix, total_scores, i) for i, stock in enumerate(stocks)]
+
+    def _score_frame(self, frame: pd.DataFrame, context: ScreenContext, include_esg: bool,
+                     include_risk_analysis: bool) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """기준별 점수 행렬(기준 → 종목별 점수 배열)과 가중 종합 점수 배열을 계산합니다."""
         # 기본 6단계 점수
-        basic_scores = {
-            "market_cap_score": self._score_market_cap_criteria(stock, all_stocks),
-            "roe_score": self._score_roe_criteria(stock),
-            "profitability_score": self._score_profitability_criteria(stock, all_stocks),
-            "growth_score": self._score_growth_criteria(stock),
-            "fcf_projection_score": self._score_fcf_projection_criteria(stock),
-            "valuation_score": self._score_valuation_criteria(stock)
+        score_matrix = {
+            "market_cap_score": self._score_market_cap_criteria(frame, context),
+            "roe_score": self._score_roe_criteria(frame),
+            "profitability_score": self._score_profitability_criteria(frame, context),
+            "growth_score": self._score_growth_criteria(frame),
+            "fcf_projection_score": self._score_fcf_projection_criteria(frame),
+            "valuation_score": self._score_valuation_criteria(frame)
         }
         
-        # 리스크 점수 (모의)
-        risk_score = 0
+        # 리스크 점수 (모의, 종목 순서대로 추첨)
         if include_risk_analysis:
-            risk_score = random.randint(50, 90)
-        
-        # 가중 평균 계산
-        all_scores = {**basic_scores}
-        if include_risk_analysis:
-            all_scores["risk_score"] = risk_score
+            score_matrix["risk_score"] = np.array([random.randint(50, 90) for _ in range(len(frame))])
         
+        # 가중 합계 (기준 순서대로 누적)
         weights = self._calculate_dynamic_weights(include_esg, include_risk_analysis)
-        total_score = sum(all_scores[key] * weights[key] for key in all_scores.keys())
-        
+        total_scores = np.zeros(len(frame))
+        for key, scores in score_matrix.items():
+            total_scores = total_scores + scores * weights[key]
+        return total_scores, score_matrix
+
+    def _scored_view(self, stock: Dict[str, Any], score_matrix: Dict[str, np.ndarray],
+                     total_scores: np.ndarray, i: int) -> Dict[str, Any]:
+        """점수 행렬의 i번째 종목을 기존 종목별 결과 형식으로 변환합니다."""
+        total_score = float(total_scores[i])
         return {
             **stock,
-            **all_scores,
+            **{key: int(scores[i]) for key, scores in score_matrix.items()},
             "total_score": round(total_score, 1),
             "recommendation": self._get_recommendation(total_score)
         }
 
-    def _score_market_cap_criteria(self, stock: Dict[str, Any], all_stocks: List[Dict[str, Any]]) -> int:
+    def _score_market_cap_criteria(self, frame: pd.DataFrame, context: ScreenContext) -> np.ndarray:
         """시가총액 기준 점수"""
-        sorted_stocks = sorted(all_stocks, key=lambda x: x["market_cap"], reverse=True)
-        rank = next(i for i, s in enumerate(sorted_stocks) if s["symbol"] == stock["symbol"])
-        percentile = (rank / len(sorted_stocks)) * 100
-        
-        if percentile <= 10: return 100
-        elif percentile <= 20: return 90
-        elif percentile <= 30: return 80
-        elif percentile <= 50: return 60
-        else: return max(0, 40 - int(percentile - 50))
+        percentile = frame["symbol"].map(context.market_cap_percentile).to_numpy(dtype=float)
+        valid = _positive_finite(frame["market_cap"].to_numpy(dtype=float))
+        return np.select(
+            [~valid, percentile <= 10, percentile <= 20, percentile <= 30, percentile <= 50],
+            [0, 100, 90, 80, 60],
+            default=np.maximum(0, 40 - np.trunc(np.where(valid, percentile, 50) - 50).astype(int))
+        )
 
-    def _score_roe_criteria(self, stock: Dict[str, Any]) -> int:
+    def _score_roe_criteria(self, frame: pd.DataFrame) -> np.ndarray:
         """ROE 기준 점수"""
-        roe_avg = stock["roe_3y_avg"]
-        if roe_avg >= 25: return 100
-        elif roe_avg >= 20: return 90
-        elif roe_avg >= 15: return 80
-        elif roe_avg >= 10: return 60
-        elif roe_avg >= 5: return 40
-        else: return 20
+        roe_avg = frame["roe_3y_avg"].to_numpy(dtype=float)
+        return np.select(
+            [roe_avg >= 25, roe_avg >= 20, roe_avg >= 15, roe_avg >= 10, roe_avg >= 5],
+            [100, 90, 80, 60, 40],
+            default=20
+        )
 
-    def _score_profitability_criteria(self, stock: Dict[str, Any], all_stocks: List[Dict[str, Any]]) -> int:
+    def _score_profitability_criteria(self, frame: pd.DataFrame, context: ScreenContext) -> np.ndarray:
         """수익성 기준 점수"""
-        sector_stocks = [s for s in all_stocks if s["sector"] == stock["sector"]]
-        avg_margin = sum(s["net_profit_margin"] for s in sector_stocks) / len(sector_stocks)
-        margin_score = 50 if stock["net_profit_margin"] >= avg_margin else 20
+        avg_margin = frame["sector"].map(context.sector_avg_margin).to_numpy(dtype=float)
+        margin_score = np.where(frame["net_profit_margin"].to_numpy(dtype=float) >= avg_margin, 50, 20)
         return margin_score + 30  # 기본점수
 
-    def _score_growth_criteria(self, stock: Dict[str, Any]) -> int:
+    def _score_growth_criteria(self, frame: pd.DataFrame) -> np.ndarray:
         """성장성 기준 점수"""
-        market_growth = stock["market_cap_growth_3y"]
-        equity_growth = stock["equity_growth_3y"]
-        growth_diff = market_growth - equity_growth
-        
-        if growth_diff >= 10: return 100
-        elif growth_diff >= 5: return 80
-        elif growth_diff >= 0: return 60
-        elif growth_diff >= -5: return 40
-        else: return 20
+        growth_diff = frame["market_cap_growth_3y"].to_numpy(dtype=float) - frame["equity_growth_3y"].to_numpy(dtype=float)
+        return np.select(
+            [growth_diff >= 10, growth_diff >= 5, growth_diff >= 0, growth_diff >= -5],
+            [100, 80, 60, 40],
+            default=20
+        )
 
-    def _score_fcf_projection_criteria(self, stock: Dict[str, Any]) -> int:
+    def _score_fcf_projection_criteria(self, frame: pd.DataFrame) -> np.ndarray:
         """FCF 예측 기준 점수"""
-        ratio = stock["fcf_projection_5y_sum"] / stock["market_cap"]
-        if ratio >= 1.5: return 100
-        elif ratio >= 1.2: return 90
-        elif ratio >= 1.0: return 80
-        elif ratio >= 0.8: return 60
-        elif ratio >= 0.6: return 40
-        else: return 20
+        projection = frame["fcf_projection_5y_sum"].to_numpy(dtype=float)
+        market_cap = frame["market_cap"].to_numpy(dtype=float)
+        # 시가총액이 0이거나 결측이면 비율이 inf/NaN이 되어 최고 구간으로 채점되므로 0점 처리
+        valid = _positive_finite(market_cap) & np.isfinite(projection)
+        ratio = np.divide(projection, market_cap, out=np.zeros_like(projection), where=valid)
+        return np.select(
+            [~valid, ratio >= 1.5, ratio >= 1.2, ratio >= 1.0, ratio >= 0.8, ratio >= 0.6],
+            [0, 100, 90, 80, 60, 40],
+            default=20
+        )
 
-    def _score_valuation_criteria(self, stock: Dict[str, Any]) -> int:
+    def _score_valuation_criteria(self, frame: pd.DataFrame) -> np.ndarray:
         """가치평가 기준 점수"""
-        per = stock["per"]
-        pbr = stock["pbr"]
+        per = frame["per"].to_numpy(dtype=float)
+        pbr = frame["pbr"].to_numpy(dtype=float)
         
-        per_score = 50 if per <= 15 else 30 if per <= 25 else 10
-        pbr_score = 50 if pbr <= 1.5 else 30 if pbr <= 2.5 else 10
+        per_score = np.select([per <= 15, per <= 25], [50, 30], default=10)
+        pbr_score = np.select([pbr <= 1.5, pbr <= 2.5], [50, 30], default=10)
         
         return per_score + pbr_score
 
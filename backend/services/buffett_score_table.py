@@ -0,0 +1,337 @@
+"""
+워런 버핏 기준 점수 테이블 (SQLite)
+- 종목별 재무 지표와 재무 기반 점수(ROE, 수익성, 성장성)는 fundamentals 테이블에 보관하며,
+  OpenDART 공시(최근 재무제표 연도/분기)가 바뀐 종목만 다시 계산합니다.
+- (거래일, 종목)별 점수는 buffett_scores 테이블에 보관하며, 시장 데이터 스냅샷이 수집될 때마다
+  가격 기반 점수(시가총액 순위, FCF 예측 비율, 밸류에이션)만 다시 계산합니다.
+- 스크리닝은 (거래일, 시장, 기본 점수) 인덱스 범위 조회입니다.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.config import settings
+from services.data_providers.opendart_api import FinancialStatement, OpenDARTProvider, opendart_provider
+from services.price_history import PriceHistoryStore, price_history_store
+from .buffett_filter_tool_simple import BuffettFilterTool, BuffettFilter, ScreenContext
+
+logger = logging.getLogger(__name__)
+
+FUNDAMENTAL_SCORES = ("roe_score", "profitability_score", "growth_score")
+PRICE_SCORES = ("market_cap_score", "fcf_projection_score", "valuation_score")
+FCF_PROJECTION_YEARS = 5
+FCF_GROWTH_RANGE = (0.0, 12.0)  # FCF 예측 성장률(%) 범위
+MARKET_CAP_GROWTH_YEARS = 3
+MARKET_CAP_GROWTH_MIN_DAYS = 180  # 시가총액 성장률을 계산할 최소 이력 기간(일)
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS fundamentals ("
+    "symbol TEXT PRIMARY KEY, name TEXT, sector TEXT, filing_key TEXT NOT NULL, "
+    "net_income REAL, total_equity REAL, fcf REAL, fcf_growth REAL, "
+    "roe_3y_avg REAL, net_profit_margin REAL, equity_growth_3y REAL, market_cap_growth_3y REAL, "
+    "roe_score INTEGER, profitability_score INTEGER, growth_score INTEGER"
+    ") WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS buffett_scores ("
+    "as_of TEXT NOT NULL, symbol TEXT NOT NULL, name TEXT, sector TEXT, market TEXT, snapshot_id TEXT, "
+    "market_cap REAL, per REAL, pbr REAL, roe_3y_avg REAL, net_profit_margin REAL, "
+    "market_cap_score INTEGER, roe_score INTEGER, profitability_score INTEGER, growth_score INTEGER, "
+    "fcf_projection_score INTEGER, valuation_score INTEGER, base_score REAL NOT NULL, "
+    "PRIMARY KEY (as_of, symbol)"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_buffett_scores_screen ON buffett_scores (as_of, market, base_score)",
+]
+
+SCORE_COLUMNS = [
+    "as_of", "symbol", "name", "sector", "market", "snapshot_id",
+    "market_cap", "per", "pbr", "roe_3y_avg", "net_profit_margin",
+    "market_cap_score", "roe_score", "profitability_score", "growth_score",
+    "fcf_projection_score", "valuation_score", "base_score"
+]
+
+
+def fundamentals_from_statements(statements: List[FinancialStatement]) -> Optional[Dict[str, Any]]:
+    """연간 재무제표(최근 N년)로 재무 지표를 계산합니다. 재무제표가 없으면 None."""
+    statements = sorted(statements, key=lambda s: (s.year, s.quarter))
+    if not statements:
+        return None
+    first, last = statements[0], statements[-1]
+    years = len(statements) - 1
+
+    roes = [s.net_income / s.total_equity * 100 for s in statements if s.total_equity > 0]
+    equity_growth = (
+        ((last.total_equity / first.total_equity) ** (1 / years) - 1) * 100
+        if years and first.total_equity > 0 and last.total_equity > 0 else 0.0
+    )
+    revenue_growth = (
+        ((last.revenue / first.revenue) ** (1 / years) - 1) * 100
+        if years and first.revenue > 0 and last.revenue > 0 else 0.0
+    )
+    return {
+        "filing_key": f"{last.year}Q{last.quarter}",
+        "net_income": last.net_income,
+        "total_equity": last.total_equity,
+        "fcf": last.free_cash_flow,
+        "fcf_growth": float(np.clip(revenue_growth, *FCF_GROWTH_RANGE)),
+        "roe_3y_avg": sum(roes) / len(roes) if roes else 0.0,
+        "net_profit_margin": last.net_income / last.revenue * 100 if last.revenue else 0.0,
+        "equity_growth_3y": equity_growth,
+    }
+
+
+class BuffettScoreTable:
+    """버핏 기준 재무 지표/점수를 보관하는 SQLite 테이블"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """SQLite 연결 (첫 사용 시 생성, 잠금 안에서 사용)"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+        return self._conn
+
+    def _execute(self, sql: str, params: Iterable[Any] = ()) -> list:
+        with self._lock:
+            return self.conn.execute(sql, tuple(params)).fetchall()
+
+    def _transaction(self, statements: List[Tuple[str, List[tuple]]]) -> None:
+        """(SQL, 파라미터 목록) 묶음을 하나의 트랜잭션으로 실행합니다."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, rows in statements:
+                    self.conn.executemany(sql, rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def fundamentals(self) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query("SELECT * FROM fundamentals", self.conn)
+
+    def upsert_fundamentals(self, frame: pd.DataFrame) -> None:
+        columns = list(frame.columns)
+        sql = (
+            f"INSERT OR REPLACE INTO fundamentals ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        self._transaction([(sql, list(frame.itertuples(index=False, name=None)))])
+
+    def latest_as_of(self) -> Optional[str]:
+        rows = self._execute("SELECT MAX(as_of) FROM buffett_scores")
+        return rows[0][0] if rows else None
+
+    def replace_scores(self, as_of: str, frame: pd.DataFrame, keep_days: int) -> None:
+        """거래일의 점수 행을 교체하고 보존 기간이 지난 거래일 행을 삭제합니다."""
+        cutoff = (pd.Timestamp(as_of) - pd.Timedelta(days=keep_days)).strftime("%Y%m%d")
+        sql = f"INSERT INTO buffett_scores ({', '.join(SCORE_COLUMNS)}) VALUES ({', '.join('?' for _ in SCORE_COLUMNS)})"
+        self._transaction([
+            ("DELETE FROM buffett_scores WHERE as_of = ? OR as_of < ?", [(as_of, cutoff)]),
+            (sql, list(frame[SCORE_COLUMNS].itertuples(index=False, name=None))),
+        ])
+
+    def update_fundamental_scores(self, as_of: str, frame: pd.DataFrame, weights: Dict[str, float]) -> None:
+        """거래일 점수 행의 재무 기반 점수를 갱신하고 기본 점수를 다시 계산합니다."""
+        assignments = ", ".join(f"{name} = ?" for name in FUNDAMENTAL_SCORES)
+        base = " + ".join(f"{name} * {weights[name]!r}" for name in FUNDAMENTAL_SCORES + PRICE_SCORES)
+        columns = ["roe_3y_avg", "net_profit_margin", *FUNDAMENTAL_SCORES]
+        rows = [
+            (*values, as_of, symbol)
+            for symbol, *values in frame[["symbol", *columns]].itertuples(index=False, name=None)
+        ]
+        self._transaction([
+            (f"UPDATE buffett_scores SET roe_3y_avg = ?, net_profit_margin = ?, {assignments} "
+             f"WHERE as_of = ? AND symbol = ?", rows),
+            (f"UPDATE buffett_scores SET base_score = {base} WHERE as_of = ? AND symbol = ?",
+             [(as_of, symbol) for symbol in frame["symbol"]]),
+        ])
+
+    def screen(self, market_segment: str, min_base_score: float,
+               sectors: Optional[List[str]] = None, as_of: Optional[str] = None) -> Tuple[int, pd.DataFrame]:
+        """
+        (대상 종목 수, 기본 점수가 min_base_score 이상인 종목 점수 행)을 반환합니다.
+        as_of 미지정 시 가장 최근 거래일 기준입니다.
+        """
+        if self._conn is None and not os.path.exists(self.path):
+            # 아직 점수를 계산한 적이 없으면 조회만으로 DB 파일을 만들지 않음
+            return 0, pd.DataFrame(columns=SCORE_COLUMNS)
+        as_of = as_of or self.latest_as_of()
+        if as_of is None:
+            return 0, pd.DataFrame(columns=SCORE_COLUMNS)
+        where, params = ["as_of = ?"], [as_of]
+        if market_segment and market_segment.upper() != "ALL":
+            where.append("market = ?")
+            params.append(market_segment.upper())
+        if sectors:
+            where.append(f"sector IN ({', '.join('?' for _ in sectors)})")
+            params.extend(sectors)
+        condition = " AND ".join(where)
+        with self._lock:
+            total = self.conn.execute(f"SELECT COUNT(*) FROM buffett_scores WHERE {condition}", params).fetchone()[0]
+            frame = pd.read_sql_query(
+                f"SELECT * FROM buffett_scores WHERE {condition} AND base_score >= ? ORDER BY base_score DESC",
+                self.conn, params=[*params, min_base_score]
+            )
+        return total, frame
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class BuffettScoreService:
+    """공시/시장 데이터 변경분만 반영해 버핏 기준 점수 테이블을 갱신합니다."""
+
+    def __init__(self, table: BuffettScoreTable, scorer: BuffettFilterTool,
+                 provider: OpenDARTProvider, history_store: PriceHistoryStore):
+        self.table = table
+        self.scorer = scorer
+        self.provider = provider
+        self.history_store = history_store
+        # 기본 6단계 가중치 (ESG/리스크 제외, 합계 1)
+        self.weights = scorer._calculate_dynamic_weights(False, False)
+        self._lock = asyncio.Lock()
+
+    def _market_cap_growth(self, symbol: str) -> Optional[float]:
+        """저장된 일별 종가로 최근 3년 연환산 성장률(%)을 계산합니다. 이력이 짧으면 None."""
+        start = date.today() - timedelta(days=365 * MARKET_CAP_GROWTH_YEARS)
+        history = self.history_store.load(symbol, start=start, columns=["close"])
+        if len(history) < 2:
+            return None
+        span = (history["date"].iloc[-1] - history["date"].iloc[0]).days
+        first, last = history["close"].iloc[0], history["close"].iloc[-1]
+        if span < MARKET_CAP_GROWTH_MIN_DAYS or first <= 0 or last <= 0:
+            return None
+        return ((last / first) ** (365 / span) - 1) * 100
+
+    async def _collect_fundamentals(self, symbol: str, name: str, sector: Optional[str]) -> Optional[Dict[str, Any]]:
+        # Mock 재무제표는 저장하면 공시 키가 바뀌지 않아 다시 계산되지 않으므로 조회 실패 종목은 제외
+        statements = await self.provider.get_financial_statements(symbol, MARKET_CAP_GROWTH_YEARS, mock_fallback=False)
+        metrics = fundamentals_from_statements(statements)
+        if metrics is None:
+            return None
+        if sector is None:
+            corp_code = await self.provider.get_corp_code(symbol)
+            info = await self.provider.get_company_info(corp_code) if corp_code else {}
+            sector = info.get("induty_code") or "기타"
+        return {"symbol": symbol, "name": name, "sector": sector, **metrics}
+
+    async def refresh_fundamentals(self, stocks: pd.DataFrame) -> int:
+        """
+        종목(종목코드, 종목명)의 최근 재무제표를 확인해, 공시가 바뀐 종목의 재무 기반 점수만 다시 계산합니다.
+        재계산한 종목 수를 반환합니다.
+        """
+        async with self._lock:
+            stored = await asyncio.to_thread(self.table.fundamentals)
+            sectors = dict(zip(stored["symbol"], stored["sector"]))
+            filing_keys = dict(zip(stored["symbol"], stored["filing_key"]))
+
+            symbols = list(zip(stocks["종목코드"], stocks["종목명"]))
+            results = await asyncio.gather(
+                *(self._collect_fundamentals(symbol, name, sectors.get(symbol)) for symbol, name in symbols),
+                return_exceptions=True
+            )
+            changed = []
+            for (symbol, _), result in zip(symbols, results):
+                if isinstance(result, BaseException):
+                    logger.warning(f"재무 지표 조회 실패 ({symbol}): {result!r}")
+                elif result and filing_keys.get(symbol) != result["filing_key"]:
+                    changed.append(result)
+            if not changed:
+                logger.info("새 공시가 없어 재무 기반 점수를 유지합니다.")
+                return 0
+
+            changed = pd.DataFrame(changed)
+            growth = await asyncio.to_thread(lambda: [self._market_cap_growth(s) for s in changed["symbol"]])
+            # 시가총액 성장률을 알 수 없으면 자본 성장률과 같다고 보고 중립 점수를 부여
+            changed["market_cap_growth_3y"] = [
+                equity if value is None else value for value, equity in zip(growth, changed["equity_growth_3y"])
+            ]
+
+            # 수익성 점수는 섹터 평균 대비이므로 공시가 바뀐 종목이 속한 섹터 전체를 다시 계산
+            merged = pd.concat([stored[~stored["symbol"].isin(changed["symbol"])], changed], ignore_index=True)
+            affected = merged[merged["sector"].isin(set(changed["sector"])) | merged["symbol"].isin(changed["symbol"])]
+            affected = affected.reset_index(drop=True)
+            context = ScreenContext(
+                len(merged), {}, merged.groupby("sector")["net_profit_margin"].mean().to_dict()
+            )
+            affected["roe_score"] = self.scorer._score_roe_criteria(affected)
+            affected["profitability_score"] = self.scorer._score_profitability_criteria(affected, context)
+            affected["growth_score"] = self.scorer._score_growth_criteria(affected)
+            affected = affected[list(stored.columns)]
+
+            await asyncio.to_thread(self.table.upsert_fundamentals, affected)
+            as_of = await asyncio.to_thread(self.table.latest_as_of)
+            if as_of:
+                await asyncio.to_thread(self.table.update_fundamental_scores, as_of, affected, self.weights)
+            logger.info(f"재무 기반 점수 갱신: 공시 변경 {len(changed)}개, 재계산 {len(affected)}개 종목")
+            return len(affected)
+
+    async def refresh_prices(self, market_data: pd.DataFrame) -> int:
+        """
+        시장 데이터 스냅샷으로 해당 거래일의 가격 기반 점수를 다시 계산해 점수 행을 교체합니다.
+        재무 지표가 있는 종목만 대상이며, 기록한 종목 수를 반환합니다.
+        """
+        async with self._lock:
+            fundamentals = await asyncio.to_thread(self.table.fundamentals)
+            snapshot = market_data[["종목코드", "시장구분", "시가총액"]].rename(
+                columns={"종목코드": "symbol", "시장구분": "market"}
+            )
+            frame = snapshot.merge(fundamentals, on="symbol", how="inner")
+            frame = frame[frame["시가총액"] > 0].reset_index(drop=True)
+            if frame.empty:
+                logger.warning("재무 지표가 있는 종목이 없어 점수 테이블을 갱신하지 않습니다.")
+                return 0
+
+            # 금액은 백만원 단위
+            market_cap = frame["시가총액"].to_numpy(dtype=float) / 1e6
+            net_income = frame["net_income"].to_numpy(dtype=float) / 1e6
+            total_equity = frame["total_equity"].to_numpy(dtype=float) / 1e6
+            growth = 1 + frame["fcf_growth"].to_numpy(dtype=float) / 100
+            years = np.arange(1, FCF_PROJECTION_YEARS + 1)
+            frame["market_cap"] = market_cap
+            frame["per"] = np.where(net_income > 0, market_cap / np.where(net_income > 0, net_income, 1), np.inf)
+            frame["pbr"] = np.where(total_equity > 0, market_cap / np.where(total_equity > 0, total_equity, 1), np.inf)
+            frame["fcf_projection_5y_sum"] = (
+                frame["fcf"].to_numpy(dtype=float)[:, None] / 1e6 * growth[:, None] ** years
+            ).sum(axis=1)
+
+            context = ScreenContext.build(frame.to_dict("records"))
+            frame["market_cap_score"] = self.scorer._score_market_cap_criteria(frame, context)
+            frame["fcf_projection_score"] = self.scorer._score_fcf_projection_criteria(frame)
+            frame["valuation_score"] = self.scorer._score_valuation_criteria(frame)
+            frame["base_score"] = sum(
+                frame[name].to_numpy(dtype=float) * self.weights[name] for name in FUNDAMENTAL_SCORES + PRICE_SCORES
+            )
+
+            as_of = market_data.attrs["trade_date"]
+            frame["as_of"] = as_of
+            frame["snapshot_id"] = market_data.attrs.get("snapshot_id")
+            frame = frame.replace([np.inf, -np.inf], None)
+            await asyncio.to_thread(self.table.replace_scores, as_of, frame, settings.BUFFETT_SCORE_KEEP_DAYS)
+            logger.info(f"가격 기반 점수 갱신: 거래일 {as_of}, {len(frame)}개 종목")
+            return len(frame)
+
+
+buffett_score_table = BuffettScoreTable(
+    settings.BUFFETT_SCORE_DB_PATH or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'buffett', 'scores.db')
+)
+buffett_scores = BuffettScoreService(buffett_score_table, BuffettFilter, opendart_provider, price_history_store)
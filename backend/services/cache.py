@@ -1,28 +1,145 @@
-from typing import Any, Optional, Dict
-from datetime import datetime, timedelta
-import json
+from typing import Any, Awaitable, Callable, Optional, Dict, Set
+from collections import OrderedDict
+import asyncio
+import logging
+import os
+import sys
+import time
+from core.config import settings
+from services.cache_backends import CacheBackend, create_backend, dumps, loads
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+class _CacheEntry:
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value: Any, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+class _RevalidatingValue:
+    """stale-while-revalidate 저장 값. fresh_until은 워커 간 공유되도록 wall-clock 기준"""
+    __slots__ = ("value", "fresh_until")
+
+    def __init__(self, value: Any, fresh_until: float):
+        self.value = value
+        self.fresh_until = fresh_until
+
+    def __getstate__(self):
+        return (self.value, self.fresh_until)
+
+    def __setstate__(self, state):
+        self.value, self.fresh_until = state
 
 class CacheService:
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self.default_ttl = 3600  # 1시간
+    """
+    프로세스 단위 LRU/TTL 캐시 (L1) + 선택적 공유 L2 백엔드
+    - 최대 항목 수 / 최대 바이트 수 초과 시 가장 오래 사용되지 않은 항목부터 제거
+    - TTL은 monotonic 시계 기준
+    - 백그라운드 스위퍼가 만료 항목을 주기적으로 정리
+    - L2(SQLite/Redis)가 설정되면 L1 미스 시 L2를 조회하고, 저장은 양쪽에 기록
+    - get_or_refresh: soft TTL이 지난 값은 그대로 반환하고 백그라운드에서 갱신 (stale-while-revalidate)
+    """
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 default_ttl: Optional[int] = None, sweep_interval: Optional[float] = None,
+                 backend: Optional[CacheBackend] = None):
+        self.backend = backend
+        self._cache: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.max_entries = max_entries or settings.CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or settings.CACHE_MAX_BYTES
+        self.default_ttl = default_ttl or settings.CACHE_DEFAULT_TTL
+        self.sweep_interval = sweep_interval or settings.CACHE_SWEEP_INTERVAL
+        self._total_bytes = 0
+        self._sweeper_task: Optional[asyncio.Task] = None
+        self._refresh_flight = SingleFlight()
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self._refresh_semaphore: Optional[asyncio.Semaphore] = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "l2_hits": 0,
+            "l2_misses": 0,
+            "l2_errors": 0,
+            "stale_hits": 0,
+            "refreshes": 0,
+            "refresh_errors": 0
+        }
+
+    @staticmethod
+    def _serialize(value: Any) -> Optional[bytes]:
+        try:
+            return dumps(value)
+        except Exception:
+            return None
+
+    def _remove(self, key: str) -> None:
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+
+    def _get_live_entry(self, key: str) -> Optional[_CacheEntry]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry.expires_at:
+            self._remove(key)
+            self._stats["expirations"] += 1
+            return None
+        return entry
+
+    def _evict(self) -> None:
+        while self._cache and (len(self._cache) > self.max_entries or self._total_bytes > self.max_bytes):
+            key, entry = self._cache.popitem(last=False)
+            self._total_bytes -= entry.size
+            self._stats["evictions"] += 1
+
+    def _store_local(self, key: str, value: Any, ttl: float, size: int) -> None:
+        self._remove(key)
+        self._cache[key] = _CacheEntry(value, time.monotonic() + ttl, size)
+        self._total_bytes += size
+        self._evict()
+
+    def _local_ttl(self, ttl: float) -> float:
+        # L2 사용 시 다른 워커의 변경이 L1에 오래 남지 않도록 L1 TTL 상한 적용
+        return min(ttl, settings.CACHE_L1_TTL) if self.backend is not None else ttl
 
     async def get(self, key: str) -> Optional[Any]:
         """
         캐시에서 데이터를 조회합니다.
         """
         try:
-            if key not in self._cache:
-                return None
-                
-            cache_data = self._cache[key]
-            if datetime.now() > cache_data['expires_at']:
-                del self._cache[key]
-                return None
-                
-            return cache_data['value']
+            entry = self._get_live_entry(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry.value
+
+            if self.backend is not None:
+                try:
+                    found = await self.backend.get(key)
+                except Exception as e:
+                    self._stats["l2_errors"] += 1
+                    logger.error(f"Cache L2 get error: {str(e)}")
+                    found = None
+                if found is not None:
+                    data, remaining = found
+                    value = loads(data)
+                    self._stats["l2_hits"] += 1
+                    self._stats["hits"] += 1
+                    if len(data) <= self.max_bytes:
+                        self._store_local(key, value, self._local_ttl(remaining), len(data))
+                    return value
+                self._stats["l2_misses"] += 1
+
+            self._stats["misses"] += 1
+            return None
         except Exception as e:
-            print(f"Cache get error: {str(e)}")
+            logger.error(f"Cache get error: {str(e)}")
             return None
 
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
@@ -31,15 +148,26 @@ class CacheService:
         """
         try:
             ttl = ttl or self.default_ttl
-            expires_at = datetime.now() + timedelta(seconds=ttl)
-            
-            self._cache[key] = {
-                'value': value,
-                'expires_at': expires_at
-            }
+            data = self._serialize(value)
+            if data is None and self.backend is not None:
+                logger.warning(f"Cache value not serializable, stored in L1 only: {key}")
+            size = len(data) if data is not None else sys.getsizeof(value)
+            if size > self.max_bytes:
+                logger.warning(f"Cache value too large, skipped: {key} ({size} bytes)")
+                return False
+
+            self._store_local(key, value, self._local_ttl(ttl), size)
+            self._stats["sets"] += 1
+
+            if self.backend is not None and data is not None:
+                try:
+                    await self.backend.set(key, data, ttl)
+                except Exception as e:
+                    self._stats["l2_errors"] += 1
+                    logger.error(f"Cache L2 set error: {str(e)}")
             return True
         except Exception as e:
-            print(f"Cache set error: {str(e)}")
+            logger.error(f"Cache set error: {str(e)}")
             return False
 
     async def delete(self, key: str) -> bool:
@@ -47,11 +175,12 @@ class CacheService:
         캐시에서 데이터를 삭제합니다.
         """
         try:
-            if key in self._cache:
-                del self._cache[key]
+            self._remove(key)
+            if self.backend is not None:
+                await self.backend.delete(key)
             return True
         except Exception as e:
-            print(f"Cache delete error: {str(e)}")
+            logger.error(f"Cache delete error: {str(e)}")
             return False
 
     async def clear(self) -> bool:
@@ -60,9 +189,12 @@ class CacheService:
         """
         try:
             self._cache.clear()
+            self._total_bytes = 0
+            if self.backend is not None:
+                await self.backend.clear()
             return True
         except Exception as e:
-            print(f"Cache clear error: {str(e)}")
+            logger.error(f"Cache clear error: {str(e)}")
             return False
 
     async def exists(self, key: str) -> bool:
@@ -70,17 +202,13 @@ class CacheService:
         키가 캐시에 존재하는지 확인합니다.
         """
         try:
-            if key not in self._cache:
-                return False
-                
-            cache_data = self._cache[key]
-            if datetime.now() > cache_data['expires_at']:
-                del self._cache[key]
-                return False
-                
-            return True
+            if self._get_live_entry(key) is not None:
+                return True
+            if self.backend is not None:
+                return await self.backend.get(key) is not None
+            return False
         except Exception as e:
-            print(f"Cache exists error: {str(e)}")
+            logger.error(f"Cache exists error: {str(e)}")
             return False
 
     async def ttl(self, key: str) -> int:
@@ -88,16 +216,141 @@ class CacheService:
         키의 남은 TTL을 반환합니다.
         """
         try:
-            if key not in self._cache:
+            if self.backend is not None:
+                # L1 TTL은 상한이 적용되므로 실제 TTL은 L2 기준
+                found = await self.backend.get(key)
+                if found is not None:
+                    return int(min(found[1], sys.maxsize))
+            entry = self._get_live_entry(key)
+            if entry is None:
                 return -1
-                
-            cache_data = self._cache[key]
-            if datetime.now() > cache_data['expires_at']:
-                del self._cache[key]
-                return -1
-                
-            remaining = cache_data['expires_at'] - datetime.now()
-            return int(remaining.total_seconds())
+            return int(entry.expires_at - time.monotonic())
         except Exception as e:
-            print(f"Cache ttl error: {str(e)}")
-            return -1 
\ No newline at end of file
+            logger.error(f"Cache ttl error: {str(e)}")
+            return -1
+
+    async def get_or_refresh(self, key: str, loader: Callable[[], Awaitable[Any]],
+                             soft_ttl: int, hard_ttl: Optional[int] = None) -> Any:
+        """
+        stale-while-revalidate 방식으로 값을 조회합니다.
+        - soft TTL 이내: 캐시 값을 반환
+        - soft TTL 경과, hard TTL 이내: 캐시 값을 즉시 반환하고 백그라운드에서 loader로 갱신
+        - 값이 없거나 hard TTL 경과: loader 결과를 기다려 반환 (같은 키의 동시 호출은 병합)
+        """
+        hard_ttl = max(hard_ttl or soft_ttl, soft_ttl)
+        cached = await self.get(key)
+        if isinstance(cached, _RevalidatingValue):
+            if time.time() >= cached.fresh_until:
+                self._stats["stale_hits"] += 1
+                self._schedule_refresh(key, loader, soft_ttl, hard_ttl)
+            return cached.value
+        return await self._refresh_flight.do(key, lambda: self._load(key, loader, soft_ttl, hard_ttl))
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], soft_ttl: int, hard_ttl: int) -> Any:
+        value = await loader()
+        self._stats["refreshes"] += 1
+        await self.set(key, _RevalidatingValue(value, time.time() + soft_ttl), ttl=hard_ttl)
+        return value
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]], soft_ttl: int, hard_ttl: int) -> None:
+        if self._refresh_flight.in_flight(key):
+            return
+        if self._refresh_semaphore is None:
+            self._refresh_semaphore = asyncio.Semaphore(settings.CACHE_MAX_CONCURRENT_REFRESHES)
+
+        async def refresh() -> Any:
+            # 같은 키의 포그라운드 로드가 이 갱신에 합류할 수 있으므로 값을 반환하고 실패는 예외로 전달
+            async with self._refresh_semaphore:
+                return await self._load(key, loader, soft_ttl, hard_ttl)
+
+        async def run() -> None:
+            try:
+                await self._refresh_flight.do(key, refresh)
+            except Exception as e:
+                # 갱신 실패 시 기존 값은 hard TTL까지 유지되고 다음 요청에서 다시 시도
+                self._stats["refresh_errors"] += 1
+                logger.error(f"Cache refresh error ({key}): {str(e)}")
+
+        task = asyncio.ensure_future(run())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    def sweep_expired(self) -> int:
+        """
+        만료된 항목을 모두 제거하고 제거한 개수를 반환합니다.
+        """
+        now = time.monotonic()
+        expired = [key for key, entry in self._cache.items() if now >= entry.expires_at]
+        for key in expired:
+            self._remove(key)
+        self._stats["expirations"] += len(expired)
+        return len(expired)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = self.sweep_expired()
+                if self.backend is not None:
+                    removed += await self.backend.purge_expired()
+                if removed:
+                    logger.debug(f"Cache sweeper removed {removed} expired entries")
+            except Exception as e:
+                logger.error(f"Cache sweep error: {str(e)}")
+
+    def start_sweeper(self) -> None:
+        """
+        만료 항목 정리 백그라운드 작업을 시작합니다.
+        """
+        if self._sweeper_task is None or self._sweeper_task.done():
+            self._sweeper_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop_sweeper(self) -> None:
+        """
+        만료 항목 정리 백그라운드 작업을 중지합니다.
+        """
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+            try:
+                await self._sweeper_task
+            except asyncio.CancelledError:
+                pass
+            self._sweeper_task = None
+
+    async def close(self) -> None:
+        """
+        스위퍼와 진행 중인 백그라운드 갱신을 중지하고 L2 백엔드 연결을 닫습니다.
+        """
+        await self.stop_sweeper()
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        if self._refresh_tasks:
+            await asyncio.gather(*self._refresh_tasks, return_exceptions=True)
+        if self.backend is not None:
+            await self.backend.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        캐시 사용 현황과 적중/미스/제거 카운터를 반환합니다.
+        """
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_ratio": self._stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(self._cache),
+            "bytes": self._total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "refreshing": len(self._refresh_tasks),
+            "backend": type(self.backend).__name__ if self.backend is not None else "memory"
+        }
+
+# 프로세스 전역 캐시 인스턴스
+cache_service = CacheService(backend=create_backend(
+    settings.CACHE_BACKEND,
+    sqlite_path=settings.CACHE_SQLITE_PATH or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), 'data', 'cache', 'cache.db'
+    ),
+    redis_url=settings.CACHE_REDIS_URL,
+    key_prefix=settings.CACHE_KEY_PREFIX
+))
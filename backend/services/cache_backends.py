@@ -0,0 +1,155 @@
+"""
+CacheService L2 백엔드
+- SQLiteCacheBackend: 단일 호스트의 여러 uvicorn 워커가 공유하는 로컬 파일 캐시
+- RedisCacheBackend: Redis 프로토콜 서버를 사용하는 공유 캐시
+값은 pickle 바이너리로 직렬화하며, 만료 시각은 프로세스 간 공유가 가능한 wall-clock 기준입니다.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Optional, Tuple
+import asyncio
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+def dumps(value: Any) -> bytes:
+    """캐시 값을 바이너리로 직렬화합니다."""
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+def loads(data: bytes) -> Any:
+    """직렬화된 캐시 값을 복원합니다."""
+    return pickle.loads(data)
+
+class CacheBackend(ABC):
+    """L2 캐시 백엔드 인터페이스"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """(직렬화된 값, 남은 TTL 초)를 반환합니다. 없거나 만료되었으면 None."""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, data: bytes, ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def clear(self) -> None:
+        pass
+
+    async def purge_expired(self) -> int:
+        """만료 항목을 정리합니다. 자체 만료를 지원하는 백엔드는 아무것도 하지 않습니다."""
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+class SQLiteCacheBackend(CacheBackend):
+    """로컬 SQLite 파일 기반 공유 캐시"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        )
+        if not rows:
+            return None
+        value, expires_at = rows[0]
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+        return value, remaining
+
+    async def set(self, key: str, data: bytes, ttl: float) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, data, time.time() + ttl)
+        )
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._execute, "DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._execute, "DELETE FROM cache_entries")
+
+    async def purge_expired(self) -> int:
+        def purge() -> int:
+            with self._lock:
+                return self._conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),)).rowcount
+        return await asyncio.to_thread(purge)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class RedisCacheBackend(CacheBackend):
+    """Redis 프로토콜 서버 기반 공유 캐시 (redis 패키지 필요)"""
+
+    def __init__(self, url: str, prefix: str = ""):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:
+            raise ImportError("CACHE_BACKEND=redis 사용 시 redis 패키지가 필요합니다.") from e
+        self.prefix = prefix
+        self._client = aioredis.from_url(url)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        async with self._client.pipeline(transaction=False) as pipe:
+            value, pttl = await pipe.get(self._key(key)).pttl(self._key(key)).execute()
+        if value is None or pttl == -2:
+            return None
+        # pttl == -1 이면 만료 시각이 없는 키
+        return value, pttl / 1000 if pttl > 0 else float("inf")
+
+    async def set(self, key: str, data: bytes, ttl: float) -> None:
+        await self._client.set(self._key(key), data, px=max(1, int(ttl * 1000)))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(self._key(key))
+
+    async def clear(self) -> None:
+        # 다른 애플리케이션 키를 지우지 않도록 prefix 범위만 삭제
+        keys = [key async for key in self._client.scan_iter(match=f"{self.prefix}*")]
+        if keys:
+            await self._client.delete(*keys)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+def create_backend(name: str, sqlite_path: str, redis_url: str, key_prefix: str = "") -> Optional[CacheBackend]:
+    """설정값에 따라 L2 백엔드를 생성합니다. memory이면 None을 반환합니다."""
+    name = (name or "memory").lower()
+    if name == "memory":
+        return None
+    if name == "sqlite":
+        return SQLiteCacheBackend(sqlite_path)
+    if name == "redis":
+        return RedisCacheBackend(redis_url, key_prefix)
+    raise ValueError(f"지원하지 않는 캐시 백엔드: {name}")
@@ -0,0 +1,150 @@
+"""
+대화 요약 저장소 서비스
+- QueryHistory는 저장 후 변경되지 않으므로 요약은 (히스토리, 모델)별로 한 번만 생성해 DB에 보관합니다.
+- 같은 히스토리의 요약 요청이 동시에 들어오면 LLM 호출은 한 번만 수행합니다.
+- 백그라운드 워커(선택)는 요약이 없는 히스토리를 주기적으로 일괄 요약해 둡니다.
+  생성에 실패한 히스토리는 실패 횟수에 따라 재시도를 미루므로 다음 히스토리의 요약을 막지 않습니다.
+"""
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import logging
+
+from core.config import settings
+from db.models.query_history import QueryHistory
+from db.models.query_history_summary import QueryHistorySummary
+from db.session import AsyncSessionLocal
+from services import azure_openai_service
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSummaryService:
+    """채팅 히스토리 요약을 한 번만 생성해 저장하고 이후에는 DB에서 반환합니다."""
+
+    def __init__(self, session_factory: Callable[[], Any] = AsyncSessionLocal, ai_model_name: Optional[str] = None):
+        self.session_factory = session_factory
+        self.ai_model_name = ai_model_name or settings.AZURE_OPENAI_CHAT_DEPLOYMENT_NAME
+        self._flight = SingleFlight()
+        self._worker_task: Optional[asyncio.Task] = None
+        self._stats = {"generated": 0, "failed": 0}
+
+    async def get_summary(self, db, history: QueryHistory) -> QueryHistorySummary:
+        """
+        저장된 요약을 반환하고, 없으면 생성해 저장합니다.
+        요약 생성에 실패하면 저장하지 않은 기본 요약을 반환합니다. (다음 요청에서 다시 생성)
+        """
+        # api 패키지가 라우터를 import하므로 순환 import를 피해 지연 import
+        from api.routers.crud import crud_query_history_summary
+
+        summary = await crud_query_history_summary.get_summary(db, history_id=history.id, ai_model_name=self.ai_model_name)
+        if summary is not None:
+            return summary
+        snapshot = (history.id, history.user_id, history.query_text, history.response_text)
+        return await self._flight.do(f"{history.id}:{self.ai_model_name}", lambda: self._generate(*snapshot))
+
+    async def _generate(self, history_id: int, user_id: int, query_text: str, response_text: str) -> QueryHistorySummary:
+        from api.routers.crud import crud_query_history_summary, crud_token_usage_log
+
+        try:
+            # LLM 응답 캐시에서 꺼낸 요약은 토큰 0으로 저장/기록됨
+            summary_text, input_tokens, output_tokens = await azure_openai_service.generate_summary(
+                query_text=query_text,
+                response_text=response_text
+            )
+        except Exception as e:
+            # 실패를 기록해 일괄 생성이 같은 히스토리에서 멈추지 않도록 재시도를 미룸
+            logger.error(f"대화 요약 생성 실패 (history_id={history_id}): {str(e)}")
+            self._stats["failed"] += 1
+            async with self.session_factory() as db:
+                await crud_query_history_summary.record_failure(
+                    db,
+                    history_id=history_id,
+                    ai_model_name=self.ai_model_name,
+                    retry_delay=settings.CHAT_SUMMARY_RETRY_DELAY,
+                    max_retry_delay=settings.CHAT_SUMMARY_MAX_RETRY_DELAY
+                )
+            # 저장하지 않은 기본 요약 반환
+            return QueryHistorySummary(
+                history_id=history_id,
+                ai_model_name=self.ai_model_name,
+                summary_text=f"질문: {query_text[:50]}{'...' if len(query_text) > 50 else ''}",
+                input_tokens=0,
+                output_tokens=0
+            )
+
+        # 요청 세션과 무관하게 저장 (먼저 요청한 호출자가 취소되어도 결과를 보관)
+        async with self.session_factory() as db:
+            summary, created = await crud_query_history_summary.create_summary(
+                db=db,
+                history_id=history_id,
+                ai_model_name=self.ai_model_name,
+                summary_text=summary_text,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens
+            )
+            if not created:
+                # 다른 워커가 먼저 저장함 (토큰 사용량도 그쪽에서 기록)
+                return summary
+            await crud_token_usage_log.create_token_usage_log(
+                db=db,
+                user_id=user_id,
+                ai_model_name=self.ai_model_name,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens
+            )
+        self._stats["generated"] += 1
+        return summary
+
+    async def summarize_pending(self, limit: int = 20) -> int:
+        """요약이 없는 히스토리를 오래된 순으로 최대 limit건 요약하고, 저장한 건수를 반환합니다."""
+        from api.routers.crud import crud_query_history_summary
+
+        async with self.session_factory() as db:
+            histories = await crud_query_history_summary.get_unsummarized_histories(
+                db, ai_model_name=self.ai_model_name, limit=limit, max_attempts=settings.CHAT_SUMMARY_MAX_ATTEMPTS
+            )
+        saved = 0
+        for history in histories:
+            summary = await self._flight.do(
+                f"{history.id}:{self.ai_model_name}",
+                lambda history=history: self._generate(history.id, history.user_id, history.query_text, history.response_text)
+            )
+            if summary.id is not None:
+                saved += 1
+        if histories:
+            logger.info(f"대화 요약 일괄 생성: {saved}/{len(histories)}건 저장")
+        return saved
+
+    @property
+    def worker_running(self) -> bool:
+        return self._worker_task is not None and not self._worker_task.done()
+
+    async def _worker_loop(self) -> None:
+        while True:
+            try:
+                await self.summarize_pending(settings.CHAT_SUMMARY_BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"대화 요약 일괄 생성 중 오류 발생: {str(e)}")
+            await asyncio.sleep(settings.CHAT_SUMMARY_BATCH_INTERVAL)
+
+    def start_worker(self) -> None:
+        """요약 일괄 생성 백그라운드 작업을 시작합니다."""
+        if not self.worker_running:
+            self._worker_task = asyncio.create_task(self._worker_loop())
+
+    async def stop_worker(self) -> None:
+        """요약 일괄 생성 백그라운드 작업을 중지합니다."""
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, **self._flight.get_stats(), "worker_running": self.worker_running}
+
+
+chat_summaries = ChatSummaryService()
@@ -0,0 +1,149 @@
+"""
+OpenDART 고유번호(corpCode.xml) 인덱스
+- corpCode.xml 압축 파일을 한 번만 내려받아 스트리밍 파싱
+- 종목코드 → 고유번호 매핑을 SQLite 테이블로 저장 (stock_code 기준 정렬된 B-tree)
+- 조회는 메모리 dict에서 O(1), 하루 단위로 백그라운드 갱신
+"""
+import asyncio
+import io
+import logging
+import os
+import sqlite3
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ArchiveFetcher = Callable[[], Awaitable[bytes]]
+
+
+def iter_corp_codes(archive: bytes) -> Iterator[Tuple[str, str, str]]:
+    """corpCode.xml 압축 파일에서 상장사의 (종목코드, 고유번호, 회사명)을 순차적으로 추출합니다."""
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        xml_name = next(name for name in zf.namelist() if name.lower().endswith(".xml"))
+        with zf.open(xml_name) as xml_file:
+            # 전체 DOM을 만들지 않고 <list> 단위로 읽은 뒤 바로 해제
+            for _, elem in ET.iterparse(xml_file, events=("end",)):
+                if elem.tag != "list":
+                    continue
+                stock_code = (elem.findtext("stock_code") or "").strip()
+                corp_code = (elem.findtext("corp_code") or "").strip()
+                if stock_code and corp_code:
+                    yield stock_code, corp_code, (elem.findtext("corp_name") or "").strip()
+                elem.clear()
+
+
+class CorpCodeIndex:
+    """종목코드 → OpenDART 고유번호 인덱스"""
+
+    def __init__(self, db_path: str, refresh_interval: float = 86400, archive_path: Optional[str] = None):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self.archive_path = archive_path
+        self._codes: Dict[str, str] = {}
+        self._built_at: float = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() - self._built_at > self.refresh_interval
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    async def lookup(self, stock_code: str, fetch_archive: ArchiveFetcher) -> Optional[str]:
+        """종목코드에 해당하는 고유번호를 반환합니다. 상장사가 아니면 None을 반환합니다."""
+        await self._ensure_loaded(fetch_archive)
+        return self._codes.get(stock_code.strip())
+
+    async def refresh(self, fetch_archive: ArchiveFetcher) -> None:
+        """압축 파일을 다시 받아 인덱스를 재구성합니다."""
+        async with self._lock:
+            await self._rebuild(fetch_archive)
+
+    async def _ensure_loaded(self, fetch_archive: ArchiveFetcher) -> None:
+        if self._codes:
+            # 기존 인덱스로 응답하면서 오래된 경우에만 백그라운드 갱신
+            if self.is_stale and (self._refresh_task is None or self._refresh_task.done()):
+                self._refresh_task = asyncio.create_task(self._background_refresh(fetch_archive))
+            return
+
+        async with self._lock:
+            if self._codes:
+                return
+            codes, built_at = await asyncio.to_thread(self._load_table)
+            if codes and time.time() - built_at <= self.refresh_interval:
+                self._codes, self._built_at = codes, built_at
+                logger.info(f"고유번호 인덱스 로드: {len(codes)}건")
+                return
+            try:
+                await self._rebuild(fetch_archive)
+            except Exception as e:
+                if not codes:
+                    raise
+                # 갱신 실패 시 오래된 인덱스라도 사용
+                logger.error(f"고유번호 인덱스 갱신 실패, 기존 데이터 사용: {e}")
+                self._codes, self._built_at = codes, built_at
+
+    async def _background_refresh(self, fetch_archive: ArchiveFetcher) -> None:
+        try:
+            await self.refresh(fetch_archive)
+        except Exception as e:
+            logger.error(f"고유번호 인덱스 백그라운드 갱신 실패: {e}")
+
+    async def _rebuild(self, fetch_archive: ArchiveFetcher) -> None:
+        if self.archive_path and os.path.exists(self.archive_path):
+            archive = await asyncio.to_thread(self._read_local_archive)
+        else:
+            archive = await fetch_archive()
+        if not zipfile.is_zipfile(io.BytesIO(archive)):
+            raise ValueError("corpCode.xml 응답이 압축 파일이 아닙니다.")
+
+        codes = await asyncio.to_thread(self._build_table, archive)
+        self._codes, self._built_at = codes, time.time()
+        logger.info(f"고유번호 인덱스 구축 완료: {len(codes)}건")
+
+    def _read_local_archive(self) -> bytes:
+        with open(self.archive_path, "rb") as f:
+            return f.read()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA mmap_size = 67108864")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS corp_codes ("
+            "stock_code TEXT PRIMARY KEY, corp_code TEXT NOT NULL, corp_name TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS corp_code_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        return conn
+
+    def _build_table(self, archive: bytes) -> Dict[str, str]:
+        rows = list(iter_corp_codes(archive))
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM corp_codes")
+                conn.executemany("INSERT OR REPLACE INTO corp_codes VALUES (?, ?, ?)", rows)
+                conn.execute(
+                    "INSERT OR REPLACE INTO corp_code_meta VALUES ('built_at', ?)",
+                    (str(time.time()),)
+                )
+        finally:
+            conn.close()
+        return {stock_code: corp_code for stock_code, corp_code, _ in rows}
+
+    def _load_table(self) -> Tuple[Dict[str, str], float]:
+        if not os.path.exists(self.db_path):
+            return {}, 0.0
+        conn = self._connect()
+        try:
+            meta = conn.execute("SELECT value FROM corp_code_meta WHERE key = 'built_at'").fetchone()
+            codes = dict(conn.execute("SELECT stock_code, corp_code FROM corp_codes"))
+        finally:
+            conn.close()
+        return codes, float(meta[0]) if meta else 0.0
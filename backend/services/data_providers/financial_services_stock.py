@@ -1,10 +1,12 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, AsyncIterator, Callable, Sequence, Tuple
 import aiohttp
 import asyncio
 from core.config import settings
 import logging
+import time
 from datetime import datetime, timedelta
 from .base_provider import BaseDataProvider
+from . import krx_calendar
 import xml.etree.ElementTree as ET
 from urllib.parse import unquote
 import json
@@ -12,6 +14,19 @@ import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+# 전체 종목 조회 대상 시장
+UNIVERSE_MARKETS = ("KOSPI", "KOSDAQ", "KONEX")
+
+class UniverseFetchError(Exception):
+    """전체 종목 조회 중 일부 페이지(시장)를 받지 못한 경우 (일부만 받은 결과를 전체로 취급하지 않도록)"""
+
+    def __init__(self, date_str: str, failed_pages: Sequence[Tuple[str, int]]):
+        self.date_str = date_str
+        self.failed_pages = list(failed_pages)
+        failed_markets = sorted({market for market, page_no in self.failed_pages if page_no == 1})
+        detail = f", 시장 전체 누락: {', '.join(failed_markets)}" if failed_markets else ""
+        super().__init__(f"날짜 {date_str} 전체 종목 조회 실패: {len(self.failed_pages)}개 페이지{detail}")
+
 class FinancialServicesStockProvider(BaseDataProvider):
     def __init__(self):
         self.api_key = unquote(unquote(settings.FSS_API_KEY))  # 이중 디코딩
@@ -21,92 +36,319 @@ class FinancialServicesStockProvider(BaseDataProvider):
             "Accept": "application/json, */*",
             "Connection": "keep-alive"
         }
+        # 마지막으로 확인된 최신 영업일 (YYYYMMDD)
+        self._resolved_date: Optional[str] = None
+        self._resolved_at: float = 0.0
         logger.info(f"FinancialServicesStockProvider 초기화: API 키 존재 여부 = {bool(self.api_key)}")
 
-    async def _fetch_data_for_date(self, session: aiohttp.ClientSession, date_str: str, stock_code: str = "") -> List[Dict[str, Any]]:
-        """특정 날짜의 데이터를 조회합니다."""
-        params = {
-            "serviceKey": self.api_key,
-            "numOfRows": "1000",
-            "pageNo": "1",
-            "resultType": "json",
-            "basDt": date_str
-        }
+    def _parse_items(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """응답 body에서 종목 데이터를 추출하고 변환합니다."""
+        items_raw = body.get('items', {})
         
-        if stock_code:
-            params["likeSrtnCd"] = stock_code
-            params["mrktCls"] = "KOSPI"
+        actual_items = []
+        if isinstance(items_raw, dict):
+            if 'item' in items_raw:
+                item_data = items_raw['item']
+                actual_items = [item_data] if isinstance(item_data, dict) else item_data
+            elif any(key in items_raw for key in ['itmsNm', 'srtnCd', 'clpr']):
+                actual_items = [items_raw]
+        elif isinstance(items_raw, list):
+            actual_items = items_raw
+        
+        # 데이터 검증 및 변환
+        valid_items = []
+        for item in actual_items:
+            try:
+                if all(key in item for key in ['itmsNm', 'srtnCd', 'clpr']):
+                    # 숫자형 데이터 변환
+                    converted_item = {
+                        '종목코드': str(item['srtnCd']),
+                        '종목명': str(item['itmsNm']),
+                        '시장구분': str(item.get('mrktCtg', 'KOSPI')),
+                        '현재가': float(item['clpr']),
+                        '등락률': float(item.get('fltRt', 0)),
+                        '거래량': float(item.get('trqu', 0)),
+                        '시가총액': float(item.get('mrktTotAmt', 0))
+                    }
+                    valid_items.append(converted_item)
+            except (ValueError, TypeError) as e:
+                logger.error(f"데이터 변환 오류: {str(e)}")
+                continue
+        return valid_items
+
+    @staticmethod
+    def _parse_ohlcv_items(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """응답 body에서 일별 시세(시가/고가/저가/종가/거래량)를 추출합니다."""
+        items_raw = body.get('items', {})
+        if isinstance(items_raw, dict):
+            item_data = items_raw.get('item', [])
+            actual_items = [item_data] if isinstance(item_data, dict) else item_data
         else:
-            params["mrktCls"] = "KOSPI"
-            params["likeSrtnCd"] = ""
+            actual_items = items_raw or []
         
+        rows = []
+        for item in actual_items:
+            try:
+                rows.append({
+                    'date': datetime.strptime(str(item['basDt']), "%Y%m%d").date(),
+                    'symbol': str(item['srtnCd']),
+                    'open': float(item['mkp']),
+                    'high': float(item['hipr']),
+                    'low': float(item['lopr']),
+                    'close': float(item['clpr']),
+                    'volume': float(item.get('trqu', 0))
+                })
+            except (KeyError, ValueError, TypeError) as e:
+                logger.error(f"일별 시세 변환 오류: {str(e)}")
+        return rows
+
+    @staticmethod
+    def _deduplicate(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """종목코드 기준으로 중복을 제거합니다."""
+        unique_items = {}
+        for item in items:
+            code = item['종목코드']
+            if code not in unique_items:
+                unique_items[code] = item
+        return list(unique_items.values())
+
+    async def _fetch_page(self, session: aiohttp.ClientSession, params: Dict[str, Any],
+                          parser: Optional[Callable[[Dict[str, Any]], List[Dict[str, Any]]]] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """한 페이지를 조회하여 (전체 건수, 변환된 종목 목록)을 반환합니다. parser 미지정 시 현재가 스냅샷 형식으로 변환합니다."""
         url = f"{self.base_url}/getStockPriceInfo"
-        logger.info(f"날짜 {date_str} 데이터 조회 시도")
+        async with session.get(url, params=params, headers=self.headers, ssl=False) as response:
+            if response.status != 200:
+                raise Exception(f"API 호출 실패: {response.status}")
+            data = await response.json(content_type=None)
+            if not isinstance(data, dict) or 'response' not in data:
+                raise Exception("응답 구조 오류")
+            
+            body = data['response'].get('body', {})
+            total_count = int(body.get('totalCount', 0))
+            parser = parser or self._parse_items
+            return total_count, parser(body) if total_count > 0 else []
+
+    async def iter_universe(self, session: aiohttp.ClientSession, date_str: str,
+                            markets: Sequence[str] = UNIVERSE_MARKETS,
+                            parser: Optional[Callable[[Dict[str, Any]], List[Dict[str, Any]]]] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        특정 날짜의 전체 상장 종목을 페이지 단위로 스트리밍합니다.
+        시장별 첫 페이지로 totalCount를 확인한 뒤 나머지 페이지를 제한된 동시성으로 조회하고,
+        도착한 순서대로 페이지를 반환합니다.
+        조회에 실패한 페이지가 있으면 받은 페이지를 모두 반환한 뒤 UniverseFetchError를 발생시킵니다.
+        (첫 페이지 실패 시 해당 시장 전체가 빠지므로 빈 시장으로 취급하지 않음)
+        """
+        page_size = settings.FSS_PAGE_SIZE
+        semaphore = asyncio.Semaphore(settings.FSS_MAX_CONCURRENCY)
+        
+        def page_params(market: str, page_no: int) -> Dict[str, Any]:
+            return {
+                "serviceKey": self.api_key,
+                "numOfRows": str(page_size),
+                "pageNo": str(page_no),
+                "resultType": "json",
+                "basDt": date_str,
+                "mrktCls": market
+            }
+        
+        async def fetch(market: str, page_no: int) -> Tuple[str, int, int, List[Dict[str, Any]]]:
+            async with semaphore:
+                total_count, items = await self._fetch_page(session, page_params(market, page_no), parser)
+                return market, page_no, total_count, items
+        
+        task_pages: Dict[asyncio.Future, Tuple[str, int]] = {}
+        failed_pages: List[Tuple[str, int]] = []
+        
+        def schedule(market: str, page_no: int) -> asyncio.Future:
+            task = asyncio.ensure_future(fetch(market, page_no))
+            task_pages[task] = (market, page_no)
+            return task
         
+        pending = {schedule(market, 1) for market in markets}
         try:
-            async with session.get(url, params=params, headers=self.headers, ssl=False) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if not isinstance(data, dict) or 'response' not in data:
-                        logger.error("응답 구조 오류")
-                        return []
-                    
-                    body = data['response'].get('body', {})
-                    items_raw = body.get('items', {})
-                    total_count = int(body.get('totalCount', 0))
-                    
-                    if total_count > 0:
-                        logger.info(f"날짜 {date_str}에서 {total_count}건의 데이터 발견")
-                        
-                        actual_items = []
-                        if isinstance(items_raw, dict):
-                            if 'item' in items_raw:
-                                item_data = items_raw['item']
-                                actual_items = [item_data] if isinstance(item_data, dict) else item_data
-                            elif any(key in items_raw for key in ['itmsNm', 'srtnCd', 'clpr']):
-                                actual_items = [items_raw]
-                        elif isinstance(items_raw, list):
-                            actual_items = items_raw
-                        
-                        if actual_items:
-                            # 데이터 검증 및 변환
-                            valid_items = []
-                            for item in actual_items:
-                                try:
-                                    if all(key in item for key in ['itmsNm', 'srtnCd', 'clpr']):
-                                        # 숫자형 데이터 변환
-                                        converted_item = {
-                                            '종목코드': str(item['srtnCd']),
-                                            '종목명': str(item['itmsNm']),
-                                            '시장구분': str(item.get('mrktCtg', 'KOSPI')),
-                                            '현재가': float(item['clpr']),
-                                            '등락률': float(item.get('fltRt', 0)),
-                                            '거래량': float(item.get('trqu', 0)),
-                                            '시가총액': float(item.get('mrktTotAmt', 0))
-                                        }
-                                        valid_items.append(converted_item)
-                                except (ValueError, TypeError) as e:
-                                    logger.error(f"데이터 변환 오류: {str(e)}")
-                                    continue
-                            
-                            if valid_items:
-                                # 중복 제거
-                                unique_items = {}
-                                for item in valid_items:
-                                    code = item['종목코드']
-                                    if code not in unique_items:
-                                        unique_items[code] = item
-                                
-                                result = list(unique_items.values())
-                                logger.info(f"유효한 데이터 {len(result)}건 추출 완료")
-                                return result
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        market, page_no, total_count, items = task.result()
+                    except Exception as e:
+                        market, page_no = task_pages[task]
+                        logger.error(f"날짜 {date_str} {market} {page_no}페이지 조회 실패: {str(e)}")
+                        failed_pages.append((market, page_no))
+                        continue
                     
-                    logger.warning(f"날짜 {date_str}에서 유효한 데이터를 찾을 수 없음")
-                    return []
+                    if page_no == 1 and total_count > page_size:
+                        # 첫 페이지에서 전체 건수를 확인한 뒤 나머지 페이지를 예약
+                        last_page = (total_count + page_size - 1) // page_size
+                        logger.info(f"날짜 {date_str} {market}: {total_count}건, {last_page}페이지")
+                        pending |= {schedule(market, n) for n in range(2, last_page + 1)}
                     
-        except Exception as e:
-            logger.error(f"데이터 조회 중 오류 발생: {str(e)}")
-            return []
+                    if items:
+                        yield items
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        if failed_pages:
+            raise UniverseFetchError(date_str, failed_pages)
+
+    async def _iter_data_for_date(self, session: aiohttp.ClientSession, date_str: str,
+                                  stock_code: str = "") -> AsyncIterator[List[Dict[str, Any]]]:
+        """특정 날짜의 데이터를 페이지가 도착하는 대로 반환합니다. 앞선 페이지에 있던 종목코드는 제외합니다."""
+        logger.info(f"날짜 {date_str} 데이터 조회 시도")
+        
+        async def pages() -> AsyncIterator[List[Dict[str, Any]]]:
+            if not stock_code:
+                async for page in self.iter_universe(session, date_str):
+                    yield page
+                return
+            params = {
+                "serviceKey": self.api_key,
+                "numOfRows": str(settings.FSS_PAGE_SIZE),
+                "pageNo": "1",
+                "resultType": "json",
+                "basDt": date_str,
+                "likeSrtnCd": stock_code
+            }
+            _, items = await self._fetch_page(session, params)
+            yield items
+        
+        seen = set()
+        async for page in pages():
+            unique = [item for item in self._deduplicate(page) if item['종목코드'] not in seen]
+            seen.update(item['종목코드'] for item in unique)
+            if unique:
+                yield unique
+        logger.info(f"날짜 {date_str} 유효한 데이터 {len(seen)}건 추출 완료")
+
+    async def iter_market_data(self, stock_code: str = "") -> AsyncIterator[pd.DataFrame]:
+        """
+        최신 영업일의 시장 데이터를 페이지 단위 DataFrame으로 스트리밍합니다. (attrs["trade_date"]에 거래일)
+        API 키가 없거나 최근 영업일의 데이터가 없으면 아무것도 반환하지 않고,
+        일부 페이지 조회에 실패하면 UniverseFetchError를 발생시킵니다.
+        """
+        if not self.api_key:
+            logger.error("API 키가 설정되지 않았습니다.")
+            return
+        
+        async with aiohttp.ClientSession() as session:
+            date_str = await self.resolve_trading_date(session)
+            if date_str is None:
+                logger.warning(f"최근 {settings.FSS_MAX_LOOKBACK_DAYS}영업일 이내의 데이터를 찾을 수 없음")
+                return
+            
+            async for page in self._iter_data_for_date(session, date_str, stock_code):
+                frame = pd.DataFrame(page)
+                frame.attrs["trade_date"] = date_str
+                yield frame
+
+    async def get_universe(self, date_str: str, markets: Sequence[str] = UNIVERSE_MARKETS) -> pd.DataFrame:
+        """특정 날짜의 전체 상장 종목(KOSPI/KOSDAQ/KONEX) 시세를 한 번에 내려받습니다."""
+        async with aiohttp.ClientSession() as session:
+            rows = []
+            async for page in self.iter_universe(session, date_str, markets):
+                rows.extend(page)
+            return pd.DataFrame(self._deduplicate(rows))
+
+    async def get_price_history(self, stock_code: str, begin_date: str, end_date: str) -> pd.DataFrame:
+        """
+        종목의 일별 시세(OHLCV)를 기간(begin_date 이상, end_date 이하, YYYYMMDD)으로 조회합니다.
+        첫 페이지로 전체 건수를 확인한 뒤 나머지 페이지를 제한된 동시성으로 조회합니다.
+        """
+        if not self.api_key:
+            logger.error("API 키가 설정되지 않았습니다.")
+            return pd.DataFrame()
+        
+        page_size = settings.FSS_PAGE_SIZE
+        # endBasDt는 해당 날짜 미만을 조회하므로 하루 뒤로 지정
+        end_exclusive = (datetime.strptime(end_date, "%Y%m%d") + timedelta(days=1)).strftime("%Y%m%d")
+        
+        def page_params(page_no: int) -> Dict[str, Any]:
+            return {
+                "serviceKey": self.api_key,
+                "numOfRows": str(page_size),
+                "pageNo": str(page_no),
+                "resultType": "json",
+                "likeSrtnCd": stock_code,
+                "beginBasDt": begin_date,
+                "endBasDt": end_exclusive
+            }
+        
+        async with aiohttp.ClientSession() as session:
+            semaphore = asyncio.Semaphore(settings.FSS_MAX_CONCURRENCY)
+            
+            async def fetch(page_no: int) -> List[Dict[str, Any]]:
+                async with semaphore:
+                    _, items = await self._fetch_page(session, page_params(page_no), self._parse_ohlcv_items)
+                    return items
+            
+            total_count, rows = await self._fetch_page(session, page_params(1), self._parse_ohlcv_items)
+            last_page = (total_count + page_size - 1) // page_size
+            for page in await asyncio.gather(*(fetch(n) for n in range(2, last_page + 1))):
+                rows.extend(page)
+        
+        # likeSrtnCd는 부분 일치이므로 요청한 종목만 남김
+        frame = pd.DataFrame([row for row in rows if row['symbol'] == stock_code])
+        logger.info(f"종목 {stock_code} 일별 시세 {len(frame)}건 조회 ({begin_date}~{end_date})")
+        return frame
+
+    async def get_daily_ohlcv(self, date_str: str, markets: Sequence[str] = UNIVERSE_MARKETS) -> pd.DataFrame:
+        """특정 날짜의 전체 상장 종목 일별 시세(OHLCV)를 내려받습니다."""
+        if not self.api_key:
+            logger.error("API 키가 설정되지 않았습니다.")
+            return pd.DataFrame()
+        async with aiohttp.ClientSession() as session:
+            rows = []
+            async for page in self.iter_universe(session, date_str, markets, self._parse_ohlcv_items):
+                rows.extend(page)
+        return pd.DataFrame(rows).drop_duplicates(subset=['symbol'], keep='first') if rows else pd.DataFrame()
+
+    async def _has_data_for_date(self, session: aiohttp.ClientSession, date_str: str) -> bool:
+        """해당 날짜의 시세가 공개되었는지 1건만 조회하여 확인합니다."""
+        params = {
+            "serviceKey": self.api_key,
+            "numOfRows": "1",
+            "pageNo": "1",
+            "resultType": "json",
+            "basDt": date_str
+        }
+        total_count, _ = await self._fetch_page(session, params)
+        return total_count > 0
+
+    async def resolve_trading_date(self, session: aiohttp.ClientSession, refresh: bool = False) -> Optional[str]:
+        """
+        시세가 존재하는 가장 최근 영업일(YYYYMMDD)을 찾습니다.
+        KRX 휴장일 달력으로 후보 영업일을 고른 뒤 여러 날짜를 동시에 조회하여 가장 최근 날짜를 선택하고,
+        결과는 FSS_TRADING_DATE_TTL 동안 재사용합니다.
+        더 최근 후보의 조회가 실패했다면 그 날짜에 시세가 있을 수 있으므로 결과를 재사용하지 않습니다.
+        """
+        if (not refresh and self._resolved_date is not None
+                and time.monotonic() - self._resolved_at < settings.FSS_TRADING_DATE_TTL):
+            return self._resolved_date
+        
+        candidates = [d.strftime("%Y%m%d") for d in krx_calendar.recent_trading_days(settings.FSS_MAX_LOOKBACK_DAYS)]
+        batch_size = max(1, settings.FSS_PROBE_BATCH_SIZE)
+        uncertain = False
+        for i in range(0, len(candidates), batch_size):
+            batch = candidates[i:i + batch_size]
+            results = await asyncio.gather(
+                *(self._has_data_for_date(session, date_str) for date_str in batch),
+                return_exceptions=True
+            )
+            for date_str, found in zip(batch, results):
+                if isinstance(found, BaseException):
+                    logger.error(f"날짜 {date_str} 확인 중 오류 발생: {str(found)}")
+                    uncertain = True
+                elif found:
+                    if uncertain:
+                        logger.warning(f"최신 영업일 확인: {date_str} (더 최근 날짜 확인 실패로 재사용하지 않음)")
+                        return date_str
+                    logger.info(f"최신 영업일 확인: {date_str}")
+                    self._resolved_date = date_str
+                    self._resolved_at = time.monotonic()
+                    return date_str
+        
+        return None
 
     async def get_market_data(self, stock_code: str = "") -> pd.DataFrame:
         """주식 시장 데이터를 수집합니다."""
@@ -114,27 +356,15 @@ class FinancialServicesStockProvider(BaseDataProvider):
             logger.info("=== 시장 데이터 수집 시작 ===")
             logger.info(f"요청된 종목코드: {stock_code}")
             
-            if not self.api_key:
-                logger.error("API 키가 설정되지 않았습니다.")
+            pages = [page async for page in self.iter_market_data(stock_code)]
+            if not pages:
                 return pd.DataFrame()
             
-            async with aiohttp.ClientSession() as session:
-                # 오늘부터 최대 10일 전까지 순차적으로 조회
-                today = datetime.now()
-                for days_ago in range(10):  # 최대 10일 전까지 조회
-                    target_date = today - timedelta(days=days_ago)
-                    date_str = target_date.strftime("%Y%m%d")
-                    
-                    data = await self._fetch_data_for_date(session, date_str, stock_code)
-                    if data:
-                        logger.info(f"데이터 발견: {date_str}")
-                        return pd.DataFrame(data)
-                    
-                    # API 호출 간 딜레이
-                    await asyncio.sleep(0.3)  # 0.3초로 증가
-                
-                logger.warning("10일 이내의 데이터를 찾을 수 없음")
-                return pd.DataFrame()
+            trade_date = pages[0].attrs["trade_date"]
+            logger.info(f"데이터 발견: {trade_date}")
+            frame = pd.concat(pages, ignore_index=True)
+            frame.attrs["trade_date"] = trade_date
+            return frame
                 
         except Exception as e:
             logger.error(f"시장 데이터 수집 중 오류 발생: {str(e)}")
@@ -0,0 +1,53 @@
+"""
+한국거래소(KRX) 휴장일 달력
+- 주말과 KRX 휴장일(공휴일, 대체공휴일, 선거일, 연말 휴장일)을 제외한 영업일 계산
+- 휴장일 표는 로컬에 포함되어 있으며, 매년 KRX 공지에 맞춰 갱신합니다.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+KST = timezone(timedelta(hours=9))
+
+KRX_HOLIDAYS = frozenset(date.fromisoformat(d) for d in [
+    # 2024
+    "2024-01-01", "2024-02-09", "2024-02-12", "2024-03-01", "2024-04-10",
+    "2024-05-01", "2024-05-06", "2024-05-15", "2024-06-06", "2024-08-15",
+    "2024-09-16", "2024-09-17", "2024-09-18", "2024-10-01", "2024-10-03",
+    "2024-10-09", "2024-12-25", "2024-12-31",
+    # 2025
+    "2025-01-01", "2025-01-27", "2025-01-28", "2025-01-29", "2025-01-30",
+    "2025-03-03", "2025-05-01", "2025-05-05", "2025-05-06", "2025-06-03",
+    "2025-06-06", "2025-08-15", "2025-10-03", "2025-10-06", "2025-10-07",
+    "2025-10-08", "2025-10-09", "2025-12-25", "2025-12-31",
+    # 2026
+    "2026-01-01", "2026-02-16", "2026-02-17", "2026-02-18", "2026-03-02",
+    "2026-05-01", "2026-05-05", "2026-05-25", "2026-06-03", "2026-08-17",
+    "2026-09-24", "2026-09-25", "2026-10-05", "2026-10-09", "2026-12-25",
+    "2026-12-31",
+])
+
+
+def now_kst() -> datetime:
+    """현재 한국 시간을 반환합니다."""
+    return datetime.now(KST)
+
+
+def is_trading_day(day: date) -> bool:
+    """KRX 영업일 여부를 반환합니다."""
+    return day.weekday() < 5 and day not in KRX_HOLIDAYS
+
+
+def recent_trading_days(count: int, until: Optional[date] = None) -> List[date]:
+    """기준일(포함)부터 과거로 거슬러 올라가며 최근 영업일 count개를 최신순으로 반환합니다."""
+    day = until or now_kst().date()
+    days = []
+    while len(days) < count:
+        if is_trading_day(day):
+            days.append(day)
+        day -= timedelta(days=1)
+    return days
+
+
+def latest_trading_day(until: Optional[date] = None) -> date:
+    """기준일(포함) 이전의 가장 최근 영업일을 반환합니다."""
+    return recent_trading_days(1, until)[0]
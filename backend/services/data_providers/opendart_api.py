@@ -3,20 +3,66 @@ OpenDART (금융감독원 전자공시시스템) 데이터 제공자
 - 기업 재무제표, 사업보고서 등 공시 정보
 - ESG 관련 정보, 지배구조 데이터
 """
+import asyncio
 import httpx
 import logging
+import os
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 import random
 from core.config import settings
 from services.logger import LoggerService
+from services.singleflight import SingleFlight
+from .corp_code_index import CorpCodeIndex
+from .statement_store import StatementStore
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# 보고서 코드 → 분기 (1분기, 반기, 3분기, 사업보고서)
+REPORT_QUARTERS = {"11013": 1, "11012": 2, "11014": 3, "11011": 4}
+
+# 재무제표 항목 → OpenDART 계정 ID (fnlttSinglAcntAll) / 계정명 (fnlttSinglAcnt, 공백 제거)
+ACCOUNT_IDS = {
+    "revenue": ("ifrs-full_Revenue", "ifrs_Revenue"),
+    "operating_income": ("dart_OperatingIncomeLoss",),
+    "net_income": ("ifrs-full_ProfitLoss", "ifrs_ProfitLoss"),
+    "total_assets": ("ifrs-full_Assets", "ifrs_Assets"),
+    "total_liabilities": ("ifrs-full_Liabilities", "ifrs_Liabilities"),
+    "total_equity": ("ifrs-full_Equity", "ifrs_Equity"),
+    "cash_flow_from_operations": ("ifrs-full_CashFlowsFromUsedInOperatingActivities",),
+    "capex": ("ifrs-full_PurchaseOfPropertyPlantAndEquipment",),
+}
+ACCOUNT_NAMES = {
+    "revenue": ("매출액", "수익(매출액)", "영업수익", "매출"),
+    "operating_income": ("영업이익", "영업이익(손실)"),
+    "net_income": ("당기순이익", "당기순이익(손실)"),
+    "total_assets": ("자산총계",),
+    "total_liabilities": ("부채총계",),
+    "total_equity": ("자본총계",),
+    "cash_flow_from_operations": ("영업활동현금흐름", "영업활동으로인한현금흐름"),
+    "capex": ("유형자산의취득",),
+}
+REQUIRED_ACCOUNTS = ("revenue", "net_income", "total_assets", "total_equity")
+STATEMENT_DIVISIONS = ("BS", "IS", "CIS", "CF")  # 자본변동표(SCE)는 제외
+
+def parse_amount(value: Any) -> Optional[float]:
+    """공시 금액 문자열("1,234", "(1,234)", "-")을 숫자로 변환합니다."""
+    if value is None:
+        return None
+    text = str(value).strip().replace(",", "")
+    if text in ("", "-"):
+        return None
+    negative = text.startswith("(") and text.endswith(")")
+    try:
+        amount = float(text.strip("()"))
+    except ValueError:
+        return None
+    return -amount if negative else amount
+
+@dataclass(frozen=True, slots=True)
 class FinancialStatement:
-    """재무제표 정보"""
+    """재무제표 정보 (공시 후 변경되지 않음)"""
     symbol: str
     year: int
     quarter: int
@@ -47,11 +93,86 @@ class OpenDARTProvider:
         self.logger = LoggerService()
         self.base_url = "https://opendart.fss.or.kr/api"
         
+        # 공유 HTTP 클라이언트 (startup에서 열고 shutdown에서 닫음)
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # 팬아웃 호출 동시성 제한
+        self._semaphore = asyncio.Semaphore(settings.OPENDART_MAX_CONCURRENCY)
+        
+        # 종목코드 → 고유번호 인덱스
+        data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'opendart')
+        self.corp_code_index = CorpCodeIndex(
+            db_path=os.path.join(data_dir, 'corp_code.db'),
+            refresh_interval=settings.OPENDART_CORP_CODE_REFRESH_HOURS * 3600,
+            archive_path=settings.OPENDART_CORP_CODE_ARCHIVE
+        )
+        
+        # 공시된 재무제표 영구 저장소 (같은 보고서는 한 번만 조회)
+        self.statement_store = StatementStore(os.path.join(data_dir, 'statements.db'))
+        self._statement_flight = SingleFlight()
+        
         # Mock 데이터 사용 여부
         self.use_mock_data = not self.api_key or len(self.api_key) < 20
         if self.use_mock_data:
             self.logger.warning("OpenDART API 키가 설정되지 않아 Mock 데이터를 사용합니다.")
     
+    async def __aenter__(self) -> "OpenDARTProvider":
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        """keep-alive 커넥션 풀을 사용하는 HTTP 클라이언트를 생성합니다."""
+        http2 = settings.OPENDART_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                self.logger.warning("h2 패키지가 없어 OpenDART 클라이언트를 HTTP/1.1로 실행합니다.")
+                http2 = False
+        
+        limits = httpx.Limits(
+            max_connections=settings.OPENDART_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENDART_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENDART_KEEPALIVE_EXPIRY
+        )
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            limits=limits,
+            timeout=httpx.Timeout(settings.OPENDART_TIMEOUT)
+        )
+    
+    async def start(self) -> None:
+        """공유 HTTP 클라이언트를 엽니다."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+            self.logger.info("OpenDART HTTP 클라이언트 시작")
+    
+    async def close(self) -> None:
+        """공유 HTTP 클라이언트를 닫습니다."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            self.logger.info("OpenDART HTTP 클라이언트 종료")
+        self._client = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """공유 HTTP 클라이언트 (startup 이전 호출 시 지연 생성)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+    
+    async def _bounded_get(self, url: str, params: Dict[str, Any]) -> httpx.Response:
+        """동시성 제한과 요청별 타임아웃을 적용해 GET 요청을 보냅니다."""
+        async with self._semaphore:
+            return await asyncio.wait_for(
+                self.client.get(url, params=params),
+                timeout=settings.OPENDART_REQUEST_TIMEOUT
+            )
+    
     async def get_company_info(self, corp_code: str) -> Dict[str, Any]:
         """
         기업 기본 정보를 조회합니다.
@@ -66,10 +187,9 @@ class OpenDARTProvider:
                 "corp_code": corp_code
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
+            response = await self.client.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
             self.logger.error(f"Error getting company info: {str(e)}")
             return self._get_mock_company_info(corp_code)
@@ -79,7 +199,7 @@ class OpenDARTProvider:
         재무제표 정보를 조회합니다.
         """
         if self.use_mock_data:
-            return self._get_mock_financial_statements(corp_code, 1)[0].__dict__
+            return asdict(self._get_mock_financial_statements(corp_code, 1)[0])
             
         try:
             if year is None:
@@ -93,13 +213,12 @@ class OpenDARTProvider:
                 "reprt_code": "11011"  # 1분기보고서
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
+            response = await self.client.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
             self.logger.error(f"Error getting financial statement: {str(e)}")
-            return self._get_mock_financial_statements(corp_code, 1)[0].__dict__
+            return asdict(self._get_mock_financial_statements(corp_code, 1)[0])
     
     async def get_corp_code(self, stock_code: str) -> Optional[str]:
         """
@@ -109,20 +228,25 @@ class OpenDARTProvider:
             return stock_code
             
         try:
-            url = f"{self.base_url}/corpCode.xml"
-            params = {
-                "crtfc_key": self.api_key
-            }
-
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                # XML 파싱 로직 구현 필요
-                return stock_code
+            corp_code = await self.corp_code_index.lookup(stock_code, self._download_corp_code_archive)
+            if corp_code is None:
+                self.logger.warning(f"고유번호를 찾을 수 없는 종목코드: {stock_code}")
+            return corp_code
         except Exception as e:
             self.logger.error(f"Error getting corp code: {str(e)}")
             return stock_code
     
+    async def _download_corp_code_archive(self) -> bytes:
+        """corpCode.xml 압축 파일을 내려받습니다."""
+        url = f"{self.base_url}/corpCode.xml"
+        params = {
+            "crtfc_key": self.api_key
+        }
+        
+        response = await self.client.get(url, params=params, timeout=60.0)
+        response.raise_for_status()
+        return response.content
+    
     async def get_major_shareholders(self, corp_code: str) -> Dict[str, Any]:
         """
         주요 주주 정보를 조회합니다.
@@ -137,10 +261,9 @@ class OpenDARTProvider:
                 "corp_code": corp_code
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
+            response = await self.client.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
             self.logger.error(f"Error getting major shareholders: {str(e)}")
             return self._get_mock_governance_info(corp_code)
@@ -159,44 +282,86 @@ class OpenDARTProvider:
                 "corp_code": corp_code
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
+            response = await self.client.get(url, params=params)
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
             self.logger.error(f"Error getting executive info: {str(e)}")
             return self._get_mock_governance_info(corp_code)
     
-    async def get_financial_statements(self, symbol: str, years: int = 3) -> List[FinancialStatement]:
-        """재무제표 조회 (최근 N년)"""
+    async def get_financial_statements(self, symbol: str, years: int = 3,
+                                       mock_fallback: bool = True) -> List[FinancialStatement]:
+        """
+        재무제표 조회 (최근 N년)
+        API 키가 없거나 조회에 실패하면 Mock 데이터를 반환합니다. (mock_fallback=False면 빈 목록)
+        """
+        def fallback() -> List[FinancialStatement]:
+            return self._get_mock_financial_statements(symbol, years) if mock_fallback else []
+        
         if self.use_mock_data:
-            return self._get_mock_financial_statements(symbol, years)
+            return fallback()
         
         try:
             corp_code = await self.get_corp_code(symbol)
+            if not corp_code:
+                return fallback()
+            target_years = list(range(datetime.now().year - years, datetime.now().year))
+            
+            # 연도별 조회를 동시에 실행하고, 실패한 연도는 건너뜀
+            results = await asyncio.gather(
+                *(self._fetch_annual_statement(corp_code, symbol, year) for year in target_years),
+                return_exceptions=True
+            )
+            
             statements = []
+            for year, result in zip(target_years, results):
+                if isinstance(result, BaseException):
+                    self.logger.warning(f"{year}년 재무제표 조회 실패 ({symbol}): {result!r}")
+                    continue
+                if result:
+                    statements.append(result)
             
-            for year in range(datetime.now().year - years, datetime.now().year):
+            return statements if statements else fallback()
+        
+        except Exception as e:
+            self.logger.error(f"재무제표 조회 오류 ({symbol}): {e}")
+            return fallback()
+    
+    async def _fetch_annual_statement(self, corp_code: str, symbol: str, year: int,
+                                      reprt_code: str = "11011") -> Optional[FinancialStatement]:
+        """
+        특정 연도의 재무제표를 조회합니다. (기본: 사업보고서)
+        저장소에 있으면 API를 호출하지 않고, 동시에 들어온 같은 보고서 조회는 하나로 합칩니다.
+        """
+        key = (corp_code, year, reprt_code)
+        stored = await asyncio.to_thread(self.statement_store.get, key)
+        if stored is not None:
+            stored_symbol, quarter, amounts = stored
+            return FinancialStatement(symbol=stored_symbol, year=year, quarter=quarter, **amounts)
+        
+        async def fetch() -> Optional[FinancialStatement]:
+            # 연결재무제표를 우선 조회하고, 없으면 별도재무제표 조회
+            for fs_div in ("CFS", "OFS"):
                 params = {
                     "crtfc_key": self.api_key,
                     "corp_code": corp_code,
                     "bsns_year": str(year),
-                    "reprt_code": "11011"  # 사업보고서
+                    "reprt_code": reprt_code,
+                    "fs_div": fs_div
                 }
-                
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(f"{self.base_url}/fnlttSinglAcnt.json", params=params)
-                    if response.status_code == 200:
-                        data = response.json()
-                        statement = self._parse_financial_statement(data, symbol, year)
-                        if statement:
-                            statements.append(statement)
-            
-            return statements if statements else self._get_mock_financial_statements(symbol, years)
+                response = await self._bounded_get(f"{self.base_url}/fnlttSinglAcntAll.json", params)
+                if response.status_code != 200:
+                    return None
+                statement = self._parse_financial_statement(response.json(), symbol, year)
+                if statement is not None:
+                    amounts = asdict(statement)
+                    for name in ("symbol", "year", "quarter"):
+                        del amounts[name]
+                    await asyncio.to_thread(self.statement_store.put, key, symbol, statement.quarter, amounts)
+                    return statement
+            return None
         
-        except Exception as e:
-            self.logger.error(f"재무제표 조회 오류 ({symbol}): {e}")
-            return self._get_mock_financial_statements(symbol, years)
+        return await self._statement_flight.do(f"{corp_code}:{year}:{reprt_code}", fetch)
     
     async def get_esg_info(self, symbol: str) -> Optional[ESGInfo]:
         """ESG 정보 조회"""
@@ -205,6 +370,8 @@ class OpenDARTProvider:
         
         try:
             corp_code = await self.get_corp_code(symbol)
+            if not corp_code:
+                return self._get_mock_esg_info(symbol)
             params = {
                 "crtfc_key": self.api_key,
                 "corp_code": corp_code,
@@ -214,13 +381,12 @@ class OpenDARTProvider:
                 "page_count": "100"
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/list.json", params=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    return self._analyze_esg_from_disclosures(data, symbol)
-                else:
-                    return self._get_mock_esg_info(symbol)
+            response = await self.client.get(f"{self.base_url}/list.json", params=params)
+            if response.status_code == 200:
+                data = response.json()
+                return self._analyze_esg_from_disclosures(data, symbol)
+            else:
+                return self._get_mock_esg_info(symbol)
         
         except Exception as e:
             self.logger.error(f"ESG 정보 조회 오류 ({symbol}): {e}")
@@ -233,19 +399,20 @@ class OpenDARTProvider:
         
         try:
             corp_code = await self.get_corp_code(symbol)
+            if not corp_code:
+                return self._get_mock_governance_info(symbol)
             params = {
                 "crtfc_key": self.api_key,
                 "corp_code": corp_code,
                 "bsns_year": str(datetime.now().year - 1)
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/empSttus.json", params=params)
-                if response.status_code == 200:
-                    emp_data = response.json()
-                    return self._parse_governance_info(emp_data)
-                else:
-                    return self._get_mock_governance_info(symbol)
+            response = await self.client.get(f"{self.base_url}/empSttus.json", params=params)
+            if response.status_code == 200:
+                emp_data = response.json()
+                return self._parse_governance_info(emp_data)
+            else:
+                return self._get_mock_governance_info(symbol)
         
         except Exception as e:
             self.logger.error(f"지배구조 정보 조회 오류 ({symbol}): {e}")
@@ -369,9 +536,51 @@ class OpenDARTProvider:
         }
     
     def _parse_financial_statement(self, data: Dict, symbol: str, year: int) -> Optional[FinancialStatement]:
-        """재무제표 데이터 파싱"""
-        # 실제 API 응답 파싱 로직
-        return None
+        """
+        fnlttSinglAcnt/fnlttSinglAcntAll 응답을 재무제표로 변환합니다.
+        계정 ID(전체 재무제표)를 우선 사용하고 없으면 계정명(주요 계정)으로 찾으며,
+        연결(CFS)과 별도(OFS) 행이 함께 있으면 연결 재무제표를 사용합니다.
+        매출액/당기순이익/자산총계/자본총계가 없으면 None을 반환합니다.
+        """
+        if not data or data.get("status") != "000":
+            return None
+        rows = [row for row in data.get("list") or [] if row.get("sj_div", "BS") in STATEMENT_DIVISIONS]
+        divisions = {row.get("fs_div") for row in rows}
+        if "CFS" in divisions:
+            rows = [row for row in rows if row.get("fs_div") == "CFS"]
+        if not rows:
+            return None
+        
+        id_to_account = {account_id: name for name, ids in ACCOUNT_IDS.items() for account_id in ids}
+        name_to_account = {account_nm: name for name, names in ACCOUNT_NAMES.items() for account_nm in names}
+        values: Dict[str, float] = {}
+        for row in rows:
+            account = id_to_account.get(row.get("account_id"))
+            if account is None:
+                account = name_to_account.get((row.get("account_nm") or "").replace(" ", ""))
+            if account is None or account in values:
+                continue
+            amount = parse_amount(row.get("thstrm_amount"))
+            if amount is not None:
+                values[account] = amount
+        if any(name not in values for name in REQUIRED_ACCOUNTS):
+            return None
+        
+        # 주요 계정 응답에는 현금흐름표가 없으므로 영업활동현금흐름/잉여현금흐름은 NaN
+        cash_flow = values.get("cash_flow_from_operations", float("nan"))
+        return FinancialStatement(
+            symbol=symbol,
+            year=year,
+            quarter=REPORT_QUARTERS.get(str(rows[0].get("reprt_code", "11011")), 4),
+            revenue=values["revenue"],
+            operating_income=values.get("operating_income", float("nan")),
+            net_income=values["net_income"],
+            total_assets=values["total_assets"],
+            total_equity=values["total_equity"],
+            debt=values.get("total_liabilities", values["total_assets"] - values["total_equity"]),
+            cash_flow_from_operations=cash_flow,
+            free_cash_flow=cash_flow - abs(values.get("capex", 0.0))
+        )
     
     def _analyze_esg_from_disclosures(self, data: Dict, symbol: str) -> ESGInfo:
         """공시 내용에서 ESG 정보 추출"""
@@ -391,21 +600,20 @@ class OpenDARTProvider:
             return self._get_mock_financial_data(stock_code)
 
         try:
-            async with httpx.AsyncClient() as client:
-                # 1. 기업 기본 정보 조회
-                company_info = await self.get_company_info(stock_code)
-                
-                # 2. 재무제표 데이터 조회
-                financial_data = await self.get_financial_statement(stock_code)
-                
-                # 3. 배당 정보 조회
-                dividend_data = await self._get_dividend_info(client, stock_code)
-                
-                return {
-                    "company_info": company_info,
-                    "financial_data": financial_data,
-                    "dividend_data": dividend_data
-                }
+            # 1. 기업 기본 정보 조회
+            company_info = await self.get_company_info(stock_code)
+            
+            # 2. 재무제표 데이터 조회
+            financial_data = await self.get_financial_statement(stock_code)
+            
+            # 3. 배당 정보 조회
+            dividend_data = await self._get_dividend_info(self.client, stock_code)
+            
+            return {
+                "company_info": company_info,
+                "financial_data": financial_data,
+                "dividend_data": dividend_data
+            }
         except Exception as e:
             self.logger.error(f"OpenDART API 호출 중 오류 발생: {str(e)}")
             return self._get_mock_financial_data(stock_code)
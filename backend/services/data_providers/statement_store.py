@@ -0,0 +1,96 @@
+"""
+OpenDART 재무제표 영구 저장소
+- 공시된 재무제표는 바뀌지 않으므로 (고유번호, 사업연도, 보고서 코드)별로 한 번만 조회해 영구 보관합니다.
+- 금액 필드는 float64 배열 하나로 묶어(BLOB) 저장하고, 읽은 값은 메모리에 보관합니다.
+"""
+from array import array
+from typing import Dict, Optional, Tuple
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+StatementKey = Tuple[str, int, str]  # (corp_code, year, reprt_code)
+
+# 금액 필드 저장 순서 (FinancialStatement의 금액 필드와 같은 순서)
+AMOUNT_FIELDS = (
+    "revenue",
+    "operating_income",
+    "net_income",
+    "total_assets",
+    "total_equity",
+    "debt",
+    "cash_flow_from_operations",
+    "free_cash_flow",
+)
+
+
+def pack_amounts(values: Dict[str, float]) -> bytes:
+    return array("d", (values[name] for name in AMOUNT_FIELDS)).tobytes()
+
+
+def unpack_amounts(blob: bytes) -> Dict[str, float]:
+    return dict(zip(AMOUNT_FIELDS, array("d", blob)))
+
+
+class StatementStore:
+    """(고유번호, 사업연도, 보고서 코드) → 재무제표 금액 영구 저장소"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._memory: Dict[StatementKey, Tuple[str, int, Dict[str, float]]] = {}
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """SQLite 연결 (첫 사용 시 생성, 잠금 안에서 사용)"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS statements ("
+                "corp_code TEXT NOT NULL, year INTEGER NOT NULL, reprt_code TEXT NOT NULL, "
+                "symbol TEXT NOT NULL, quarter INTEGER NOT NULL, amounts BLOB NOT NULL, "
+                "PRIMARY KEY (corp_code, year, reprt_code)"
+                ") WITHOUT ROWID"
+            )
+        return self._conn
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM statements").fetchone()[0]
+
+    def get(self, key: StatementKey) -> Optional[Tuple[str, int, Dict[str, float]]]:
+        """저장된 (종목코드, 분기, 금액)을 반환합니다. 없으면 None."""
+        cached = self._memory.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT symbol, quarter, amounts FROM statements WHERE corp_code = ? AND year = ? AND reprt_code = ?",
+                key
+            ).fetchone()
+        if row is None:
+            return None
+        symbol, quarter, blob = row
+        cached = self._memory[key] = (symbol, quarter, unpack_amounts(blob))
+        return cached
+
+    def put(self, key: StatementKey, symbol: str, quarter: int, amounts: Dict[str, float]) -> None:
+        with self._lock:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO statements VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, symbol, quarter, pack_amounts(amounts))
+                )
+        self._memory[key] = (symbol, quarter, dict(amounts))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
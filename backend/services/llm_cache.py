@@ -0,0 +1,290 @@
+"""
+LLM 응답 영구 캐시 (SQLite)
+- 키: 배포 설정(llm_string) + 정규화한 프롬프트 + 데이터 버전(최신 시장 스냅샷 거래일)
+- 에이전트 실행 중 LLM 호출 프롬프트에는 이전 도구 결과가 포함되므로, 도구 결과가 바뀌면 키도 바뀝니다.
+- 최신 시장 스냅샷의 거래일이 바뀌면 이전 거래일 항목은 조회되지 않으며 다음 저장 시 정리됩니다.
+- LLM_CACHE_SIMILARITY_THRESHOLD 지정 시 문자 n-gram 해시 임베딩(로컬 계산)의 코사인 유사도로
+  거의 같은 자유 입력 질문의 응답도 재사용합니다. 유사도는 범위(scope)가 정확히 같은 항목끼리만 비교하므로
+  시장/최소 점수 같은 구조화된 조건이 다르면 재사용하지 않습니다.
+  유사도 비교는 호출자가 자유 입력 질문을 지정하는 결과 캐시(get_result/put_result)에서만 하며,
+  템플릿에 대화/도구 결과가 채워지는 LLM 호출 단위 캐시는 정확히 같은 프롬프트만 재사용합니다.
+"""
+from typing import Any, Callable, Dict, Optional
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+NGRAM_SIZE = 3
+# 실행마다 달라지는 메시지 필드 (키에서 제외)
+VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+# 캐시에서 꺼낸 응답 메시지의 response_metadata 표시 (Azure 호출 없이 응답했으므로 사용량 0으로 기록)
+CACHE_HIT_METADATA_KEY = "llm_cache_hit"
+
+
+def normalize_prompt(text: str) -> str:
+    """공백 차이만 있는 프롬프트가 같은 키가 되도록 연속 공백을 하나로 줄입니다."""
+    return " ".join(text.split())
+
+
+def _normalize_strings(value: Any) -> Any:
+    if isinstance(value, str):
+        return normalize_prompt(value)
+    if isinstance(value, list):
+        return [_normalize_strings(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize_strings(item) for key, item in value.items()}
+    return value
+
+
+def _message_key(message: Any) -> Any:
+    if not isinstance(message, dict) or not isinstance(message.get("kwargs"), dict):
+        return _normalize_strings(message)
+    kwargs = {key: value for key, value in message["kwargs"].items() if key not in VOLATILE_MESSAGE_FIELDS}
+    return _normalize_strings({**message, "kwargs": kwargs})
+
+
+def serialized_prompt_key(prompt: str) -> str:
+    """
+    LangChain이 넘기는 직렬화된 메시지 목록을 키 문자열로 바꿉니다.
+    실행마다 달라지는 필드(메시지 ID, 사용량 등)를 빼고 문자열을 정규화한 JSON이며,
+    JSON이 아니면 프롬프트를 그대로 사용합니다.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    if not isinstance(messages, list):
+        return prompt
+    return json.dumps([_message_key(message) for message in messages], ensure_ascii=False, sort_keys=True)
+
+
+def embed(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """공백을 뺀 문자 n-gram을 고정 차원으로 해싱한 단위 벡터 (외부 모델 없이 로컬 계산)"""
+    text = "".join(text.split()).lower()
+    vector = np.zeros(dim, dtype=np.float32)
+    for i in range(max(len(text) - NGRAM_SIZE + 1, 1)):
+        vector[zlib.crc32(text[i:i + NGRAM_SIZE].encode("utf-8")) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def market_data_version() -> str:
+    """최신 시장 스냅샷 거래일 (스냅샷이 없으면 가장 최근 영업일)"""
+    from services.stock_analysis import stock_analysis
+    from services.data_providers import krx_calendar
+
+    latest = stock_analysis.hot_snapshot.latest or stock_analysis.market_store.latest_snapshot()
+    if latest is not None:
+        return latest[0]
+    return krx_calendar.latest_trading_day().strftime("%Y%m%d")
+
+
+class LLMResponseStore:
+    """(네임스페이스, 데이터 버전, 정규화한 프롬프트) → 직렬화된 응답 저장소"""
+
+    def __init__(self, db_path: str, similarity_threshold: Optional[float] = None,
+                 max_candidates: int = 256):
+        self.db_path = db_path
+        self.similarity_threshold = similarity_threshold
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._version: Optional[str] = None
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """SQLite 연결 (첫 사용 시 생성, 잠금 안에서 사용)"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(llm_responses)")]
+            if columns and "scope" not in columns:
+                # 이전 형식 테이블 (캐시이므로 비우고 다시 만듦)
+                self._conn.execute("DROP TABLE llm_responses")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, data_version TEXT NOT NULL, scope TEXT NOT NULL, "
+                "embedding BLOB, response BLOB NOT NULL, created_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_responses_scope "
+                "ON llm_responses (namespace, data_version, scope, created_at)"
+            )
+        return self._conn
+
+    @staticmethod
+    def _digest(*parts: str) -> str:
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, prompt: str, data_version: str, text: Optional[str] = None,
+            scope: str = "") -> Optional[bytes]:
+        """
+        저장된 응답을 반환합니다. 같은 프롬프트가 없으면 범위(scope)가 같은 항목 중
+        본문(text)의 유사도가 기준을 넘는 가장 가까운 응답, 없으면 None.
+        text를 지정하지 않으면 정확히 같은 프롬프트만 찾습니다.
+        """
+        namespace = self._digest(namespace)
+        key = self._digest(namespace, data_version, normalize_prompt(prompt))
+        with self._lock:
+            row = self.conn.execute("SELECT response FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+                return row[0]
+            rows = []
+            if self.similarity_threshold is not None and text is not None:
+                # 최근 항목부터 max_candidates건만 비교 (인덱스 범위 조회)
+                rows = self.conn.execute(
+                    "SELECT embedding, response FROM llm_responses "
+                    "WHERE namespace = ? AND data_version = ? AND scope = ? AND embedding IS NOT NULL "
+                    "ORDER BY created_at DESC LIMIT ?",
+                    (namespace, data_version, self._digest(normalize_prompt(scope)), self.max_candidates)
+                ).fetchall()
+        if rows:
+            matrix = np.frombuffer(b"".join(r[0] for r in rows), dtype=np.float32).reshape(len(rows), -1)
+            similarity = matrix @ embed(text)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self.similarity_threshold:
+                self.similar_hits += 1
+                return rows[best][1]
+        self.misses += 1
+        return None
+
+    def put(self, namespace: str, prompt: str, data_version: str, response: bytes,
+            text: Optional[str] = None, scope: str = "") -> None:
+        """응답을 저장합니다. text를 지정하면 같은 scope의 유사도 조회 대상이 됩니다."""
+        namespace = self._digest(namespace)
+        key = self._digest(namespace, data_version, normalize_prompt(prompt))
+        embedding = embed(text).tobytes() if text is not None else None
+        with self._lock:
+            with self.conn:
+                # 데이터 버전이 바뀌면 이전 버전 항목 정리
+                if self._version != data_version:
+                    purged = self.conn.execute(
+                        "DELETE FROM llm_responses WHERE data_version != ?", (data_version,)
+                    ).rowcount
+                    if purged:
+                        logger.info(f"LLM 응답 캐시: 이전 데이터 버전 항목 {purged}건 정리")
+                    self._version = data_version
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, namespace, data_version, self._digest(normalize_prompt(scope)), embedding, response, time.time())
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM llm_responses")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "similarity_threshold": self.similarity_threshold,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class LLMResponseCache(BaseCache):
+    """
+    LangChain LLM 캐시 어댑터 (AzureChatOpenAI(cache=...)로 지정)
+    프롬프트는 직렬화된 메시지 목록이므로 에이전트 중간 단계의 도구 결과도 키에 포함됩니다.
+    요약처럼 템플릿에 내용이 채워지는 프롬프트는 몇 글자 차이로 의미가 바뀌므로 정확히 같을 때만 재사용합니다.
+    """
+
+    def __init__(self, store: LLMResponseStore, version_fn: Callable[[], str] = market_data_version):
+        self.store = store
+        self.version_fn = version_fn
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        try:
+            data = self.store.get(llm_string, serialized_prompt_key(prompt), self.version_fn())
+            if data is None:
+                return None
+            generations = pickle.loads(data)
+            # 저장된 usage_metadata는 원래 호출의 사용량이므로 캐시 응답임을 표시
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if message is not None:
+                    message.response_metadata = {**message.response_metadata, CACHE_HIT_METADATA_KEY: True}
+            return generations
+        except Exception as e:
+            logger.error(f"LLM 응답 캐시 조회 중 오류 발생: {str(e)}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        try:
+            self.store.put(
+                llm_string, serialized_prompt_key(prompt), self.version_fn(),
+                pickle.dumps(list(return_val), protocol=pickle.HIGHEST_PROTOCOL)
+            )
+        except Exception as e:
+            logger.error(f"LLM 응답 캐시 저장 중 오류 발생: {str(e)}")
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+    @staticmethod
+    def _result_scope(prompt: str, text: Optional[str]) -> str:
+        # 질문 본문을 뺀 나머지(구조화된 조건)가 정확히 같아야 유사도 비교 대상
+        return prompt.replace(text, "") if text else prompt
+
+    def get_result(self, namespace: str, prompt: str, text: Optional[str] = None) -> Optional[Any]:
+        """
+        LLM 호출 단위가 아닌 결과 전체(예: 에이전트 분석 결과)를 조회합니다.
+        text는 prompt에 포함된 자유 입력 질문이며, 지정하면 나머지 조건이 같은 결과 중 질문이 유사한 것도 반환합니다.
+        """
+        try:
+            data = self.store.get(namespace, prompt, self.version_fn(), text, self._result_scope(prompt, text))
+            return pickle.loads(data) if data is not None else None
+        except Exception as e:
+            logger.error(f"LLM 결과 캐시 조회 중 오류 발생: {str(e)}")
+            return None
+
+    def put_result(self, namespace: str, prompt: str, result: Any, text: Optional[str] = None) -> None:
+        try:
+            self.store.put(
+                namespace, prompt, self.version_fn(), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL),
+                text, self._result_scope(prompt, text)
+            )
+        except Exception as e:
+            logger.error(f"LLM 결과 캐시 저장 중 오류 발생: {str(e)}")
+
+def create_llm_cache() -> Optional[LLMResponseCache]:
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    return LLMResponseCache(LLMResponseStore(
+        settings.LLM_CACHE_DB_PATH or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'llm_cache', 'responses.db'),
+        similarity_threshold=settings.LLM_CACHE_SIMILARITY_THRESHOLD,
+        max_candidates=settings.LLM_CACHE_SIMILARITY_MAX_CANDIDATES
+    ))
+
+
+llm_response_cache = create_llm_cache()
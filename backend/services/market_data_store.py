@@ -0,0 +1,527 @@
+"""
+시장 데이터 스냅샷 저장소 (Arrow IPC)
+- 경로: {root}/date=YYYYMMDD/market={시장구분}/{스냅샷ID}.arrow
+- 스냅샷 ID는 수집 시각(YYYYMMDD_HHMMSS)이며, 한 번의 수집에서 저장한 시장별 파일은 같은 ID를 공유합니다.
+- 비압축 IPC 파일을 memory map으로 열어 필요한 컬럼만 선택하므로 읽기 시 복사가 발생하지 않습니다.
+- 이전 CSV 스냅샷(market_data_YYYYMMDD_HHMMSS.csv) 가져오기를 지원합니다.
+- {root}/manifest.json 카탈로그에 거래일/스냅샷/시장별 행 수와 크기, 최신 스냅샷을 기록하므로
+  조회 시 디렉토리를 훑지 않으며, HotSnapshot이 이 파일의 변경을 감시해 메모리 사본을 갱신합니다.
+- apply_retention으로 장중 스냅샷 보존 개수와 거래일 보존 기간을 제한합니다.
+- open_snapshot으로 수집 페이지를 도착하는 대로 기록하고 모두 받은 뒤 한 번에 등록할 수 있습니다.
+"""
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows에서는 프로세스 간 잠금 없이 동작
+    fcntl = None
+
+import pandas as pd
+import pyarrow as pa
+
+from services.data_providers import krx_calendar
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = pa.schema([
+    ("종목코드", pa.string()),
+    ("종목명", pa.string()),
+    ("시장구분", pa.string()),
+    ("현재가", pa.float64()),
+    ("등락률", pa.float64()),
+    ("거래량", pa.float64()),
+    ("시가총액", pa.float64()),
+])
+
+NUMERIC_COLUMNS = ("현재가", "등락률", "거래량", "시가총액")
+UNKNOWN_MARKET = "UNKNOWN"
+SNAPSHOT_SUFFIX = ".arrow"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_LOCK_FILE = ".manifest.lock"
+
+_LEGACY_CSV_PATTERN = re.compile(r"^market_data_(\d{8}_\d{6})\.csv$")
+
+
+def snapshot_id_for(collected_at: datetime) -> str:
+    """수집 시각으로 스냅샷 ID를 만듭니다."""
+    return collected_at.strftime("%Y%m%d_%H%M%S")
+
+
+def to_table(frame: pd.DataFrame) -> pa.Table:
+    """DataFrame을 저장 스키마의 Arrow 테이블로 변환합니다. 없는 컬럼은 null로 채웁니다."""
+    columns = {}
+    for field in SCHEMA:
+        if field.name in frame.columns:
+            series = frame[field.name]
+        else:
+            series = pd.Series([None] * len(frame), index=frame.index, dtype=object)
+        if field.name in NUMERIC_COLUMNS:
+            values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64")
+        else:
+            values = [None if pd.isna(value) else str(value) for value in series]
+        columns[field.name] = pa.array(values, type=field.type, from_pandas=True)
+    return pa.Table.from_pydict(columns, schema=SCHEMA)
+
+
+class MarketDataStore:
+    """거래일/시장 단위로 파티션된 Arrow IPC 스냅샷 저장소"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _partition_dir(self, trade_date: str, market: str) -> str:
+        return os.path.join(self.root, f"date={trade_date}", f"market={market}")
+
+    def _snapshot_path(self, trade_date: str, market: str, snapshot_id: str) -> str:
+        return os.path.join(self._partition_dir(trade_date, market), f"{snapshot_id}{SNAPSHOT_SUFFIX}")
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    @contextmanager
+    def _manifest_lock(self):
+        """같은 프로세스의 스레드와 다른 워커 프로세스 사이에서 매니페스트 갱신을 직렬화합니다."""
+        with self._lock:
+            with open(os.path.join(self.root, MANIFEST_LOCK_FILE), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.error(f"스냅샷 매니페스트를 읽을 수 없습니다: {str(e)}")
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _latest_of(snapshots: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, str]]:
+        for trade_date in sorted(snapshots, reverse=True):
+            if snapshots[trade_date]:
+                return {"trade_date": trade_date, "snapshot_id": max(snapshots[trade_date])}
+        return None
+
+    def _scan_snapshots(self) -> Dict[str, Dict[str, Any]]:
+        """디렉토리를 훑어 매니페스트의 snapshots 항목을 만듭니다. 매니페스트가 없을 때만 사용합니다."""
+        snapshots: Dict[str, Dict[str, Any]] = {}
+        for date_dir in sorted(os.listdir(self.root)):
+            date_path = os.path.join(self.root, date_dir)
+            if not date_dir.startswith("date=") or not os.path.isdir(date_path):
+                continue
+            trade_date = date_dir[len("date="):]
+            for market_dir in sorted(os.listdir(date_path)):
+                market_path = os.path.join(date_path, market_dir)
+                if not market_dir.startswith("market=") or not os.path.isdir(market_path):
+                    continue
+                market = market_dir[len("market="):]
+                for name in os.listdir(market_path):
+                    if not name.endswith(SNAPSHOT_SUFFIX):
+                        continue
+                    path = os.path.join(market_path, name)
+                    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+                    rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+                    entry = snapshots.setdefault(trade_date, {}).setdefault(name[:-len(SNAPSHOT_SUFFIX)], {})
+                    entry[market] = {"rows": rows, "bytes": os.path.getsize(path)}
+        return snapshots
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        manifest = self._read_manifest()
+        if manifest is None:
+            snapshots = self._scan_snapshots()
+            manifest = {"latest": self._latest_of(snapshots), "snapshots": snapshots}
+            if snapshots:
+                self._write_manifest(manifest)
+        return manifest
+
+    def manifest(self) -> Dict[str, Any]:
+        """스냅샷 카탈로그 {latest, snapshots: {거래일: {스냅샷 ID: {시장: {rows, bytes}}}}}를 반환합니다."""
+        manifest = self._read_manifest()
+        if manifest is None:
+            with self._manifest_lock():
+                manifest = self._load_manifest()
+        return manifest
+
+    def trade_dates(self) -> List[str]:
+        """저장된 거래일 목록(오름차순)을 반환합니다."""
+        return sorted(self.manifest()["snapshots"])
+
+    def snapshot_ids(self, trade_date: str) -> List[str]:
+        """거래일에 저장된 스냅샷 ID 목록(오름차순)을 반환합니다."""
+        return sorted(self.manifest()["snapshots"].get(trade_date, {}))
+
+    def markets(self, trade_date: str, snapshot_id: Optional[str] = None) -> List[str]:
+        """거래일(또는 특정 스냅샷)에 저장된 시장 목록을 반환합니다."""
+        by_id = self.manifest()["snapshots"].get(trade_date, {})
+        ids = [snapshot_id] if snapshot_id is not None else list(by_id)
+        return sorted({market for sid in ids for market in by_id.get(sid, {})})
+
+    def has_snapshot(self, trade_date: str, snapshot_id: str) -> bool:
+        return snapshot_id in self.manifest()["snapshots"].get(trade_date, {})
+
+    def latest_snapshot(self) -> Optional[Tuple[str, str]]:
+        """가장 최근 (거래일, 스냅샷 ID)를 반환합니다. 저장된 스냅샷이 없으면 None."""
+        latest = self.manifest()["latest"]
+        if latest is None:
+            return None
+        return latest["trade_date"], latest["snapshot_id"]
+
+    def version(self) -> Optional[Tuple[int, int]]:
+        """매니페스트의 변경 여부를 판단하는 값 (inode, mtime)을 반환합니다."""
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def stats(self) -> Dict[str, int]:
+        """저장된 거래일/스냅샷 수와 전체 크기를 반환합니다."""
+        snapshots = self.manifest()["snapshots"]
+        return {
+            "trade_dates": len(snapshots),
+            "snapshots": sum(len(by_id) for by_id in snapshots.values()),
+            "bytes": sum(
+                market["bytes"] for by_id in snapshots.values()
+                for markets in by_id.values() for market in markets.values()
+            )
+        }
+
+    def open_snapshot(self, trade_date: str, snapshot_id: Optional[str] = None) -> "SnapshotWriter":
+        """페이지 단위로 나눠 쓸 스냅샷을 엽니다. commit() 전까지는 매니페스트에 등록되지 않습니다."""
+        return SnapshotWriter(self, trade_date, snapshot_id or snapshot_id_for(datetime.now()))
+
+    def _register_snapshot(self, trade_date: str, snapshot_id: str, entry: Dict[str, Any]) -> None:
+        with self._manifest_lock():
+            manifest = self._load_manifest()
+            manifest["snapshots"].setdefault(trade_date, {})[snapshot_id] = entry
+            # 더 오래된 스냅샷(CSV 가져오기 등)은 latest를 되돌리지 않음
+            manifest["latest"] = self._latest_of(manifest["snapshots"])
+            self._write_manifest(manifest)
+
+    def write_snapshot(self, frame: pd.DataFrame, trade_date: str, snapshot_id: Optional[str] = None) -> str:
+        """
+        시장 데이터를 시장구분별 파티션에 저장하고 스냅샷 ID를 반환합니다.
+        임시 파일에 쓴 뒤 교체하므로 읽는 쪽에서 쓰다 만 파일을 보지 않습니다.
+        """
+        with self.open_snapshot(trade_date, snapshot_id) as writer:
+            writer.write(frame)
+            return writer.commit()
+
+    def read_snapshot(self, trade_date: str, snapshot_id: str,
+                      columns: Optional[Sequence[str]] = None,
+                      markets: Optional[Iterable[str]] = None) -> Optional[pa.Table]:
+        """
+        스냅샷을 Arrow 테이블로 읽습니다.
+        markets로 파티션을, columns로 컬럼을 선택하며 선택되지 않은 데이터는 읽지 않습니다.
+        """
+        selected = self.markets(trade_date, snapshot_id) if markets is None else [m for m in markets if m]
+        tables = []
+        for market in selected:
+            path = self._snapshot_path(trade_date, market, snapshot_id)
+            if not os.path.exists(path):
+                continue
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+            tables.append(table.select(list(columns)) if columns else table)
+        if not tables:
+            return None
+        return pa.concat_tables(tables)
+
+    def read_latest(self, columns: Optional[Sequence[str]] = None,
+                    markets: Optional[Iterable[str]] = None) -> Optional[pd.DataFrame]:
+        """가장 최근 스냅샷을 DataFrame으로 읽습니다. 없으면 None."""
+        latest = self.latest_snapshot()
+        if latest is None:
+            return None
+        table = self.read_snapshot(*latest, columns=columns, markets=markets)
+        if table is None:
+            return None
+        frame = table.to_pandas()
+        frame.attrs["trade_date"], frame.attrs["snapshot_id"] = latest
+        return frame
+
+    def apply_retention(self, keep_intraday: int, keep_days: int) -> int:
+        """
+        보존 정책을 적용하고 삭제한 스냅샷 수를 반환합니다.
+        - 최신 거래일: 최근 keep_intraday개 스냅샷 유지
+        - 그 이전 거래일: 장 마감 기준 마지막 스냅샷 1개만 남기고 압축 (최근 keep_days개 거래일까지)
+        - 그보다 오래된 거래일: 삭제
+        """
+        with self._manifest_lock():
+            manifest = self._load_manifest()
+            snapshots = manifest["snapshots"]
+            removed = []
+            for rank, trade_date in enumerate(sorted(snapshots, reverse=True)):
+                ids = sorted(snapshots[trade_date])
+                if rank == 0:
+                    keep = ids[-max(1, keep_intraday):]
+                elif rank < keep_days:
+                    keep = ids[-1:]
+                else:
+                    keep = []
+                for snapshot_id in ids:
+                    if snapshot_id not in keep:
+                        removed.append((trade_date, snapshot_id, list(snapshots[trade_date].pop(snapshot_id))))
+                if not snapshots[trade_date]:
+                    del snapshots[trade_date]
+            if not removed:
+                return 0
+            manifest["latest"] = self._latest_of(snapshots)
+            # 매니페스트를 먼저 갱신해 읽는 쪽이 삭제될 파일을 고르지 않도록 함
+            self._write_manifest(manifest)
+
+        for trade_date, snapshot_id, markets in removed:
+            for market in markets:
+                path = self._snapshot_path(trade_date, market, snapshot_id)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._remove_empty_dirs(os.path.dirname(path))
+        logger.info(f"스냅샷 보존 정책 적용: {len(removed)}개 삭제")
+        return len(removed)
+
+    def _remove_empty_dirs(self, directory: str) -> None:
+        while os.path.abspath(directory) != os.path.abspath(self.root):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
+
+    def import_csv(self, path: str, trade_date: Optional[str] = None) -> Optional[str]:
+        """
+        이전 CSV 스냅샷을 가져옵니다. 이미 가져온 파일이면 건너뜁니다.
+        거래일을 지정하지 않으면 파일명의 수집 시각 기준 가장 최근 KRX 영업일로 간주합니다.
+        """
+        match = _LEGACY_CSV_PATTERN.match(os.path.basename(path))
+        if match is None:
+            logger.warning(f"CSV 파일명 형식이 올바르지 않아 건너뜁니다: {path}")
+            return None
+        snapshot_id = match.group(1)
+        collected_at = datetime.strptime(snapshot_id, "%Y%m%d_%H%M%S")
+        trade_date = trade_date or krx_calendar.latest_trading_day(collected_at.date()).strftime("%Y%m%d")
+        if self.has_snapshot(trade_date, snapshot_id):
+            return None
+        frame = pd.read_csv(path, encoding="utf-8-sig", dtype={"종목코드": str})
+        return self.write_snapshot(frame, trade_date, snapshot_id)
+
+    def import_legacy_csvs(self, directory: str) -> int:
+        """디렉토리의 CSV 스냅샷을 모두 가져오고 새로 가져온 개수를 반환합니다."""
+        if not os.path.isdir(directory):
+            return 0
+        imported = 0
+        for name in sorted(os.listdir(directory)):
+            if not _LEGACY_CSV_PATTERN.match(name):
+                continue
+            try:
+                if self.import_csv(os.path.join(directory, name)):
+                    imported += 1
+            except Exception as e:
+                logger.error(f"CSV 스냅샷 가져오기 실패 ({name}): {str(e)}")
+        return imported
+
+
+class SnapshotWriter:
+    """
+    스냅샷을 여러 번에 나눠 씁니다. (수집한 페이지를 모두 모으지 않고 도착하는 대로 기록)
+    시장별 임시 파일에 레코드 배치를 이어 쓰고, commit()에서 파일을 교체한 뒤 매니페스트에 등록합니다.
+    with 블록에서 예외가 발생하거나 commit() 없이 끝나면 임시 파일을 지웁니다.
+    """
+
+    def __init__(self, store: MarketDataStore, trade_date: str, snapshot_id: str):
+        self.store = store
+        self.trade_date = trade_date
+        self.snapshot_id = snapshot_id
+        self._writers: Dict[str, Tuple[Any, Any]] = {}
+        self._rows: Dict[str, int] = {}
+        self._committed = False
+
+    @property
+    def rows(self) -> int:
+        return sum(self._rows.values())
+
+    def _tmp_path(self, market: str) -> str:
+        return f"{self.store._snapshot_path(self.trade_date, market, self.snapshot_id)}.tmp"
+
+    def _writer_for(self, market: str):
+        if market not in self._writers:
+            tmp_path = self._tmp_path(market)
+            os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+            sink = pa.OSFile(tmp_path, "wb")
+            self._writers[market] = (sink, pa.ipc.new_file(sink, SCHEMA))
+            self._rows[market] = 0
+        return self._writers[market][1]
+
+    def write(self, frame: pd.DataFrame) -> int:
+        """DataFrame을 시장구분별 임시 파일에 추가하고 추가한 행 수를 반환합니다."""
+        if frame.empty:
+            return 0
+        table = to_table(frame)
+        market_column = table.column("시장구분").to_pandas().fillna(UNKNOWN_MARKET)
+        for market, positions in market_column.groupby(market_column).indices.items():
+            self._writer_for(market).write_table(table.take(pa.array(positions)))
+            self._rows[market] += len(positions)
+        return table.num_rows
+
+    def _close(self) -> None:
+        for sink, writer in self._writers.values():
+            writer.close()
+            sink.close()
+
+    def commit(self) -> str:
+        """임시 파일을 스냅샷 파일로 교체하고 매니페스트에 등록한 뒤 스냅샷 ID를 반환합니다."""
+        self._close()
+        entry = {}
+        for market in self._writers:
+            path = self.store._snapshot_path(self.trade_date, market, self.snapshot_id)
+            os.replace(self._tmp_path(market), path)
+            entry[market] = {"rows": self._rows[market], "bytes": os.path.getsize(path)}
+        self.store._register_snapshot(self.trade_date, self.snapshot_id, entry)
+        self._committed = True
+        logger.info(f"시장 데이터 스냅샷 저장: date={self.trade_date}, id={self.snapshot_id}, {self.rows}개 종목")
+        return self.snapshot_id
+
+    def abort(self) -> None:
+        """기록 중인 임시 파일을 삭제합니다."""
+        if self._committed:
+            return
+        try:
+            self._close()
+        except Exception as e:
+            logger.error(f"스냅샷 임시 파일 닫기 실패: {str(e)}")
+        for market in self._writers:
+            try:
+                os.remove(self._tmp_path(market))
+            except FileNotFoundError:
+                pass
+            self.store._remove_empty_dirs(os.path.dirname(self._tmp_path(market)))
+        self._writers.clear()
+        self._rows.clear()
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.abort()
+
+
+class HotSnapshot:
+    """
+    워커 메모리에 유지하는 최신 시장 데이터 스냅샷
+    - 감시 작업이 manifest.json의 변경을 주기적으로 확인해 최신 스냅샷이 바뀌었을 때만 다시 읽습니다.
+    - 감시 작업이 실행 중이면 get()은 디스크에 접근하지 않습니다.
+    - 반환된 DataFrame은 공유 사본이므로 호출자가 값을 수정하면 안 됩니다.
+    """
+
+    def __init__(self, store: MarketDataStore, watch_interval: float = 5.0):
+        self.store = store
+        self.watch_interval = watch_interval
+        self._version: Optional[Tuple[int, int]] = None
+        self._latest: Optional[Tuple[str, str]] = None
+        self._by_market: Dict[str, pd.DataFrame] = {}
+        self._watcher_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def latest(self) -> Optional[Tuple[str, str]]:
+        """메모리에 올라온 (거래일, 스냅샷 ID)"""
+        return self._latest
+
+    def _load(self) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[str, str]], Dict[str, pd.DataFrame]]:
+        # 매니페스트 버전을 먼저 읽어야 읽는 도중 새 스냅샷이 기록되어도 다음 확인에서 다시 읽음
+        self.store.manifest()  # 매니페스트가 없는 저장소면 생성
+        version = self.store.version()
+        frame = self.store.read_latest()
+        if frame is None:
+            return version, None, {}
+        latest = (frame.attrs["trade_date"], frame.attrs["snapshot_id"])
+        by_market = {market: part.reset_index(drop=True) for market, part in frame.groupby("시장구분", sort=False)}
+        return version, latest, by_market
+
+    async def refresh(self, force: bool = False) -> bool:
+        """최신 스냅샷이 바뀌었으면 다시 읽습니다. 다시 읽었으면 True."""
+        async with self._lock:
+            if not force and self._latest is not None:
+                version = self.store.version()
+                if version == self._version:
+                    return False
+                # 보존 정책 적용 등으로 매니페스트만 바뀐 경우에는 다시 읽지 않음
+                if await asyncio.to_thread(self.store.latest_snapshot) == self._latest:
+                    self._version = version
+                    return False
+            version, latest, by_market = await asyncio.to_thread(self._load)
+            self._version, self._latest, self._by_market = version, latest, by_market
+            if latest is not None:
+                logger.info(f"최신 시장 데이터 메모리 적재: date={latest[0]}, id={latest[1]}")
+            return True
+
+    async def get(self, columns: Optional[Sequence[str]] = None,
+                  markets: Optional[Iterable[str]] = None) -> Optional[pd.DataFrame]:
+        """메모리의 최신 스냅샷에서 시장/컬럼을 선택해 반환합니다. 스냅샷이 없으면 None."""
+        if self._latest is None or not self.watching:
+            # 감시 작업이 없으면 호출 시점에 매니페스트 변경만 확인
+            await self.refresh()
+        if self._latest is None:
+            return None
+        selected = list(self._by_market) if markets is None else [m for m in markets if m in self._by_market]
+        parts = [self._by_market[market] for market in selected]
+        if not parts:
+            frame = pd.DataFrame(columns=[field.name for field in SCHEMA])
+        elif len(parts) == 1:
+            frame = parts[0].copy(deep=False)
+        else:
+            frame = pd.concat(parts, ignore_index=True)
+        if columns:
+            frame = frame[list(columns)]
+        frame.attrs["trade_date"], frame.attrs["snapshot_id"] = self._latest
+        return frame
+
+    @property
+    def watching(self) -> bool:
+        return self._watcher_task is not None and not self._watcher_task.done()
+
+    async def _watch_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"시장 데이터 스냅샷 갱신 오류: {str(e)}")
+            await asyncio.sleep(self.watch_interval)
+
+    def start_watcher(self) -> None:
+        """매니페스트 변경 감시 백그라운드 작업을 시작합니다."""
+        if not self.watching:
+            self._watcher_task = asyncio.create_task(self._watch_loop())
+
+    async def stop_watcher(self) -> None:
+        """매니페스트 변경 감시 백그라운드 작업을 중지합니다."""
+        if self._watcher_task is not None:
+            self._watcher_task.cancel()
+            try:
+                await self._watcher_task
+            except asyncio.CancelledError:
+                pass
+            self._watcher_task = None
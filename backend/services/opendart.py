@@ -1,5 +1,6 @@
+import asyncio
 import aiohttp
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from core.config import settings
 
@@ -52,31 +53,50 @@ class OpenDartService:
     async def _get_financial_statements(self, session: aiohttp.ClientSession, corp_code: str) -> Dict[str, Any]:
         """재무제표 데이터 조회"""
         current_year = datetime.now().year
-        financial_data = {}
+        semaphore = asyncio.Semaphore(settings.OPENDART_MAX_CONCURRENCY)
         
-        # 최근 3년간의 재무제표 데이터 조회
-        for year in range(current_year - 2, current_year + 1):
-            for quarter in range(1, 5):
-                url = f"{self.base_url}/fnlttSinglAcnt.json"
-                params = {
-                    "crtfc_key": self.api_key,
-                    "corp_code": corp_code,
-                    "bsns_year": str(year),
-                    "reprt_code": f"1{quarter:03d}"  # 11011: 1분기, 11012: 반기, 11013: 3분기, 11014: 사업보고서
-                }
-                
-                try:
-                    async with session.get(url, params=params) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            if data.get("status") == "000":
-                                financial_data[f"{year}_Q{quarter}"] = data.get("list", [])
-                except Exception as e:
-                    print(f"{year}년 {quarter}분기 재무제표 조회 실패: {str(e)}")
-                    continue
+        # 최근 3년간의 재무제표 데이터 조회 (연도×분기 동시 조회)
+        periods = [
+            (year, quarter)
+            for year in range(current_year - 2, current_year + 1)
+            for quarter in range(1, 5)
+        ]
+        results = await asyncio.gather(
+            *(self._get_quarter_statement(session, semaphore, corp_code, year, quarter) for year, quarter in periods),
+            return_exceptions=True
+        )
+        
+        financial_data = {}
+        for (year, quarter), result in zip(periods, results):
+            if isinstance(result, BaseException):
+                print(f"{year}년 {quarter}분기 재무제표 조회 실패: {result!r}")
+                continue
+            if result is not None:
+                financial_data[f"{year}_Q{quarter}"] = result
         
         return financial_data
 
+    async def _get_quarter_statement(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                                     corp_code: str, year: int, quarter: int) -> Optional[List[Dict[str, Any]]]:
+        """특정 연도/분기의 재무제표 조회"""
+        url = f"{self.base_url}/fnlttSinglAcnt.json"
+        params = {
+            "crtfc_key": self.api_key,
+            "corp_code": corp_code,
+            "bsns_year": str(year),
+            "reprt_code": f"1{quarter:03d}"  # 11011: 1분기, 11012: 반기, 11013: 3분기, 11014: 사업보고서
+        }
+        timeout = aiohttp.ClientTimeout(total=settings.OPENDART_REQUEST_TIMEOUT)
+        
+        async with semaphore:
+            async with session.get(url, params=params, timeout=timeout) as response:
+                if response.status != 200:
+                    return None
+                data = await response.json()
+                if data.get("status") != "000":
+                    return None
+                return data.get("list", [])
+
     async def _get_dividend_info(self, session: aiohttp.ClientSession, corp_code: str) -> Dict[str, Any]:
         """배당 정보 조회"""
         url = f"{self.base_url}/alotMatter.json"
@@ -0,0 +1,275 @@
+"""
+종목별 일별 시세(OHLCV) 이력 저장소
+- 경로: {root}/symbol={종목코드}/{시작일}_{종료일}.arrow (YYYYMMDD, Arrow IPC)
+- 추가 전용: 이미 저장된 기간의 행은 다시 쓰지 않고, 새 구간만 청크 파일로 추가합니다.
+- 청크가 PRICE_HISTORY_MAX_CHUNKS개를 넘으면 하나로 합칩니다.
+- 읽기는 파일명의 기간으로 청크를 고른 뒤 memory map으로 읽습니다.
+PriceHistoryService는 금융위원회 getStockPriceInfo로 기간 백필과 일별 추가를 수행합니다.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from core.config import settings
+from services.data_providers import krx_calendar
+from services.data_providers.financial_services_stock import FinancialServicesStockProvider, fss_provider
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("open", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("close", pa.float64()),
+    ("volume", pa.float64()),
+])
+
+CHUNK_SUFFIX = ".arrow"
+DATE_FORMAT = "%Y%m%d"
+
+
+class PriceHistoryStore:
+    """종목별 Arrow 청크로 저장하는 추가 전용 OHLCV 이력 저장소"""
+
+    def __init__(self, root: str, max_chunks: int = 16):
+        self.root = root
+        self.max_chunks = max_chunks
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _symbol_dir(self, symbol: str) -> str:
+        return os.path.join(self.root, f"symbol={symbol}")
+
+    def _symbol_lock(self, symbol: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _chunks(self, symbol: str) -> List[Tuple[date, date, str]]:
+        """(시작일, 종료일, 경로) 목록을 시작일 순으로 반환합니다."""
+        directory = self._symbol_dir(symbol)
+        if not os.path.isdir(directory):
+            return []
+        chunks = []
+        for name in os.listdir(directory):
+            if not name.endswith(CHUNK_SUFFIX):
+                continue
+            try:
+                first, last = name[:-len(CHUNK_SUFFIX)].split("_")
+                chunks.append((
+                    datetime.strptime(first, DATE_FORMAT).date(),
+                    datetime.strptime(last, DATE_FORMAT).date(),
+                    os.path.join(directory, name)
+                ))
+            except ValueError:
+                continue
+        return sorted(chunks)
+
+    def symbols(self) -> List[str]:
+        """이력이 저장된 종목코드 목록을 반환합니다."""
+        return sorted(
+            name[len("symbol="):] for name in os.listdir(self.root)
+            if name.startswith("symbol=")
+        )
+
+    def date_range(self, symbol: str) -> Optional[Tuple[date, date]]:
+        """저장된 (첫 거래일, 마지막 거래일)을 반환합니다. 이력이 없으면 None."""
+        chunks = self._chunks(symbol)
+        if not chunks:
+            return None
+        return min(chunk[0] for chunk in chunks), max(chunk[1] for chunk in chunks)
+
+    @staticmethod
+    def _to_table(frame: pd.DataFrame) -> pa.Table:
+        frame = frame.assign(date=pd.to_datetime(frame["date"]).dt.date)
+        frame = frame.sort_values("date").drop_duplicates(subset=["date"], keep="last")
+        return pa.Table.from_pandas(frame[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+    def _write_chunk(self, symbol: str, table: pa.Table) -> str:
+        dates = table.column("date").to_pylist()
+        name = f"{dates[0].strftime(DATE_FORMAT)}_{dates[-1].strftime(DATE_FORMAT)}{CHUNK_SUFFIX}"
+        path = os.path.join(self._symbol_dir(symbol), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, SCHEMA) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        return path
+
+    def append(self, symbol: str, frame: pd.DataFrame) -> int:
+        """
+        저장된 기간 밖의 행만 새 청크로 추가하고 추가한 행 수를 반환합니다.
+        frame에는 date, open, high, low, close, volume 컬럼이 필요합니다.
+        """
+        if frame is None or frame.empty:
+            return 0
+        with self._symbol_lock(symbol):
+            table = self._to_table(frame)
+            stored = self.date_range(symbol)
+            if stored is None:
+                parts = [table]
+            else:
+                # 기존 이력보다 과거(백필)와 이후(신규 거래일)는 각각 별도 청크로 기록
+                dates = table.column("date")
+                parts = [
+                    table.filter(pc.less(dates, pa.scalar(stored[0], pa.date32()))),
+                    table.filter(pc.greater(dates, pa.scalar(stored[1], pa.date32())))
+                ]
+            parts = [part for part in parts if part.num_rows]
+            for part in parts:
+                self._write_chunk(symbol, part)
+            if len(self._chunks(symbol)) > self.max_chunks:
+                self._compact_locked(symbol)
+        return sum(part.num_rows for part in parts)
+
+    def compact(self, symbol: str) -> None:
+        """종목의 청크를 하나의 파일로 합칩니다."""
+        with self._symbol_lock(symbol):
+            self._compact_locked(symbol)
+
+    def _compact_locked(self, symbol: str) -> None:
+        chunks = self._chunks(symbol)
+        if len(chunks) <= 1:
+            return
+        table = pa.concat_tables([self._read_chunk(path) for _, _, path in chunks])
+        merged = self._write_chunk(symbol, self._to_table(table.to_pandas()))
+        # 합친 파일을 먼저 기록한 뒤 이전 청크를 삭제 (읽기 중 중복은 load에서 제거)
+        for _, _, path in chunks:
+            if path != merged:
+                os.remove(path)
+        logger.info(f"종목 {symbol} 시세 이력 청크 {len(chunks)}개 병합")
+
+    @staticmethod
+    def _read_chunk(path: str, columns: Optional[Sequence[str]] = None) -> pa.Table:
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        return table.select(list(columns)) if columns else table
+
+    def load(self, symbol: str, start: Optional[date] = None, end: Optional[date] = None,
+             columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        기간 내 일별 시세를 날짜 오름차순 DataFrame으로 반환합니다.
+        기간이 겹치지 않는 청크는 열지 않습니다.
+        """
+        selected = [
+            path for first, last, path in self._chunks(symbol)
+            if (start is None or last >= start) and (end is None or first <= end)
+        ]
+        names = ["date"] + [c for c in (columns or SCHEMA.names) if c != "date"]
+        if not selected:
+            return pd.DataFrame(columns=names)
+        frame = pa.concat_tables([self._read_chunk(path, names) for path in selected]).to_pandas()
+        frame = frame.drop_duplicates(subset=["date"], keep="last").sort_values("date")
+        if start is not None:
+            frame = frame[frame["date"] >= start]
+        if end is not None:
+            frame = frame[frame["date"] <= end]
+        return frame.reset_index(drop=True)
+
+
+class PriceHistoryService:
+    """금융위원회 일별 시세로 이력 저장소를 채우고 읽습니다."""
+
+    def __init__(self, store: PriceHistoryStore, provider: FinancialServicesStockProvider,
+                 retry_cooldown: float = 3600.0):
+        self.store = store
+        self.provider = provider
+        self.retry_cooldown = retry_cooldown
+        # 이력이 부족하거나 백필에 실패한 종목 → 다시 백필/계산할 수 있는 시각(monotonic)
+        self._backfill_retry_at: Dict[str, float] = {}
+
+    async def backfill(self, symbol: str, days: Optional[int] = None) -> int:
+        """최근 days개 영업일 중 저장되지 않은 기간을 조회해 추가하고, 추가한 행 수를 반환합니다."""
+        days = days or settings.PRICE_HISTORY_BACKFILL_DAYS
+        trading_days = krx_calendar.recent_trading_days(days)
+        begin, end = trading_days[-1], trading_days[0]
+        stored = await asyncio.to_thread(self.store.date_range, symbol)
+
+        ranges = []
+        if stored is None:
+            ranges.append((begin, end))
+        else:
+            if begin < stored[0]:
+                ranges.append((begin, stored[0] - timedelta(days=1)))
+            if stored[1] < end:
+                ranges.append((stored[1] + timedelta(days=1), end))
+
+        appended = 0
+        for range_begin, range_end in ranges:
+            frame = await self.provider.get_price_history(
+                symbol, range_begin.strftime(DATE_FORMAT), range_end.strftime(DATE_FORMAT)
+            )
+            appended += await asyncio.to_thread(self.store.append, symbol, frame)
+        if appended:
+            logger.info(f"종목 {symbol} 시세 이력 {appended}건 백필")
+        return appended
+
+    async def append_trading_day(self, date_str: Optional[str] = None) -> int:
+        """
+        하루치 전체 종목 일별 시세를 각 종목 이력에 추가하고 추가한 행 수를 반환합니다.
+        날짜를 지정하지 않으면 가장 최근 영업일을 사용합니다.
+        """
+        date_str = date_str or krx_calendar.latest_trading_day().strftime(DATE_FORMAT)
+        frame = await self.provider.get_daily_ohlcv(date_str)
+        if frame.empty:
+            logger.warning(f"날짜 {date_str}의 일별 시세가 없습니다.")
+            return 0
+
+        def append_all() -> int:
+            return sum(self.store.append(symbol, rows) for symbol, rows in frame.groupby("symbol"))
+
+        appended = await asyncio.to_thread(append_all)
+        logger.info(f"날짜 {date_str} 일별 시세 {appended}건 추가")
+        return appended
+
+    async def load_history(self, symbol: str, min_days: int = 1) -> pd.DataFrame:
+        """
+        종목의 저장된 일별 시세를 반환합니다.
+        저장된 이력이 min_days보다 짧으면 먼저 백필합니다.
+        백필에 실패했거나 백필 후에도 짧은 종목은 retry_cooldown 동안 다시 백필하지 않습니다. (is_cooling_down)
+        """
+        frame = await asyncio.to_thread(self.store.load, symbol)
+        if len(frame) >= min_days or self.is_cooling_down(symbol):
+            return frame
+        if self.provider.api_key:
+            try:
+                await self.backfill(symbol, max(min_days, settings.PRICE_HISTORY_BACKFILL_DAYS))
+            except Exception:
+                self.cool_down(symbol)
+                raise
+            frame = await asyncio.to_thread(self.store.load, symbol)
+        if len(frame) < min_days:
+            # 신규 상장 등으로 이력이 짧은 종목은 대기 시간 동안 다시 조회하지 않음
+            self.cool_down(symbol)
+        return frame
+
+    def is_cooling_down(self, symbol: str) -> bool:
+        """종목이 재시도 대기 중인지 확인합니다. (대기 시간이 지난 기록은 삭제)"""
+        retry_at = self._backfill_retry_at.get(symbol)
+        if retry_at is None:
+            return False
+        if time.monotonic() < retry_at:
+            return True
+        del self._backfill_retry_at[symbol]
+        return False
+
+    def cool_down(self, symbol: str) -> None:
+        """종목을 retry_cooldown 동안 재시도 대기로 기록하고, 대기 시간이 지난 기록은 정리합니다."""
+        now = time.monotonic()
+        self._backfill_retry_at = {s: t for s, t in self._backfill_retry_at.items() if t > now}
+        self._backfill_retry_at[symbol] = now + self.retry_cooldown
+
+price_history_store = PriceHistoryStore(
+    settings.PRICE_HISTORY_DIR or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'price_history'),
+    max_chunks=settings.PRICE_HISTORY_MAX_CHUNKS
+)
+price_history = PriceHistoryService(price_history_store, fss_provider, settings.PRICE_HISTORY_RETRY_COOLDOWN)
@@ -0,0 +1,47 @@
+"""
+요청 병합(single-flight)
+- 같은 키로 동시에 들어온 호출은 하나의 실행 결과를 함께 기다립니다.
+- 실행은 별도 Task로 수행되므로 먼저 호출한 요청이 취소되어도 나머지 호출자는 결과를 받습니다.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """키 단위로 진행 중인 비동기 호출을 공유합니다."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            "executions": 0,
+            "coalesced": 0
+        }
+
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 모든 호출자가 취소된 경우에도 예외가 기록되지 않은 채 남지 않도록 처리
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"single-flight 호출 실패 ({key}): {task.exception()!r}")
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """진행 중인 같은 키의 호출이 있으면 그 결과를, 없으면 fn()을 실행한 결과를 반환합니다."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._on_done(key, t))
+            self._stats["executions"] += 1
+        else:
+            self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "in_flight": len(self._inflight)}
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, TYPE_CHECKING, Optional
+from typing import List, Dict, Any, TYPE_CHECKING, Optional, Tuple
 from datetime import datetime
 if TYPE_CHECKING:
     from core.agent import StockAnalysisAgent
@@ -6,6 +6,11 @@ from schemas.analysis import StockRecommendation, StockAnalysis
 from services.data_providers.opendart_api import OpenDARTProvider, opendart_provider
 from services.data_providers.financial_services_stock import FinancialServicesStockProvider, fss_provider
 from services.logger import LoggerService
+from services.singleflight import SingleFlight
+from services.market_data_store import MarketDataStore, HotSnapshot, snapshot_id_for
+from core.config import settings
+import asyncio
+import numpy as np
 import pandas as pd
 import os
 import logging
@@ -27,6 +32,43 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logger.info(f"로그 디렉토리 생성/확인: {log_dir}")
 
+def _numeric_column(frame: pd.DataFrame, column: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    컬럼을 float 배열로 변환합니다.
+    컬럼이 없으면 0으로 간주하고, float()로 변환할 수 없는 값의 위치를 함께 반환합니다.
+    """
+    size = len(frame)
+    if column not in frame.columns:
+        return np.zeros(size), np.zeros(size, dtype=bool)
+    series = frame[column]
+    invalid = np.zeros(size, dtype=bool)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=float, na_value=np.nan), invalid
+    values = np.array(pd.to_numeric(series, errors='coerce'), dtype=float)
+    # 숫자 변환에 실패한 값만 float()로 다시 확인 ('nan' 문자열은 유효, None/잘못된 문자열은 무효)
+    for i in np.flatnonzero(np.isnan(values)):
+        try:
+            values[i] = float(series.iat[i])
+        except (TypeError, ValueError):
+            invalid[i] = True
+    return values, invalid
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    점수 상위 k개의 위치를 점수 내림차순으로 반환합니다.
+    전체 정렬 대신 부분 선택 후 k개만 정렬하며, 동점은 원래 순서를 유지합니다.
+    """
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(scores):
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
 class StockAnalysisService:
     _instance = None
     
@@ -50,6 +92,12 @@ class StockAnalysisService:
             self.logger = LoggerService()
             self.data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'market_data')
             os.makedirs(self.data_dir, exist_ok=True)
+            self.market_store = MarketDataStore(settings.MARKET_DATA_STORE_DIR or os.path.join(
+                os.path.dirname(os.path.dirname(__file__)), 'data', 'market_store'
+            ))
+            self.hot_snapshot = HotSnapshot(self.market_store, settings.MARKET_DATA_WATCH_INTERVAL)
+            self._retention_task: Optional[asyncio.Task] = None
+            self.inflight = SingleFlight()
             logger.info(f"StockAnalysisService 초기화 완료")
             self.initialized = True
 
@@ -104,29 +152,16 @@ class StockAnalysisService:
             
             self.logger.info(f"수집된 시장 데이터: {len(market_data)}개 종목")
             
-            # 2. 기본 점수 계산 (재무 데이터 없이)
-            initial_scores = []
-            for stock_data in market_data:
-                try:
-                    # 기본 점수 계산 (시장 데이터만으로)
-                    basic_score = self._calculate_basic_score(stock_data)
-                    initial_scores.append({
-                        'stock_data': stock_data,
-                        'basic_score': basic_score
-                    })
-                except Exception as e:
-                    self.logger.error(f"기본 점수 계산 중 오류 발생 (종목 {stock_data['srtnCd']}): {str(e)}")
-                    continue
+            # 2. 기본 점수 계산 (재무 데이터 없이, 전체 종목을 한 번에 계산)
+            basic_scores = self._calculate_basic_scores(pd.DataFrame(list(market_data)))
             
             # 3. 기본 점수로 상위 20개 종목 선별
-            initial_scores.sort(key=lambda x: x['basic_score'], reverse=True)
-            top_20_stocks = initial_scores[:20]
+            top_20_stocks = [market_data[i] for i in _top_k_indices(basic_scores, 20)]
             
             # 4. 선별된 종목에 대해서만 재무 데이터 조회 및 상세 분석
             recommendations = []
-            for stock in top_20_stocks:
+            for stock_data in top_20_stocks:
                 try:
-                    stock_data = stock['stock_data']
                     self.logger.info(f"종목 {stock_data['srtnCd']} 상세 분석 시작")
                     
                     # 재무 데이터 조회
@@ -170,42 +205,44 @@ class StockAnalysisService:
             self.logger.error(f"주식 추천 목록 생성 중 오류 발생: {str(e)}")
             raise
 
-    def _calculate_basic_score(self, stock_data: Dict[str, Any]) -> float:
-        """기본 점수를 계산합니다 (재무 데이터 없이)."""
-        try:
-            score = 0.0
-            
-            # 1. 가격 점수 (1,000원 ~ 1,000,000원 범위 내)
-            price = float(stock_data.get('현재가', 0))
-            if 1000 <= price <= 1000000:
-                price_score = 100 - (abs(price - 50000) / 50000 * 100)  # 5만원에 가까울수록 높은 점수
-                score += price_score * 0.3
-                logger.debug(f"가격 점수: {price_score:.2f}")
-            
-            # 2. 등락률 점수 (-5% ~ +15% 범위 내)
-            change_rate = float(stock_data.get('등락률', 0))
-            if -5 <= change_rate <= 15:
-                change_score = 100 - (abs(change_rate - 5) / 20 * 100)  # +5%에 가까울수록 높은 점수
-                score += change_score * 0.3
-                logger.debug(f"등락률 점수: {change_score:.2f}")
-            
-            # 3. 거래량 점수
-            volume = float(stock_data.get('거래량', 0))
-            if volume > 0:
-                volume_score = min(100, volume / 1000000 * 100)  # 100만주 기준
-                score += volume_score * 0.4
-                logger.debug(f"거래량 점수: {volume_score:.2f}")
-            
-            logger.debug(f"종목 {stock_data.get('종목명', 'Unknown')} 최종 점수: {score:.2f}")
-            return score
-            
-        except Exception as e:
-            logger.error(f"기본 점수 계산 중 오류 발생: {str(e)}")
-            return 0.0
+    def _calculate_basic_scores(self, market_data: pd.DataFrame) -> np.ndarray:
+        """
+        기본 점수를 계산합니다 (재무 데이터 없이, 컬럼 단위 벡터 연산).
+        숫자로 변환할 수 없는 값이 있는 종목은 0점입니다.
+        """
+        price, invalid_price = _numeric_column(market_data, '현재가')
+        change_rate, invalid_change = _numeric_column(market_data, '등락률')
+        volume, invalid_volume = _numeric_column(market_data, '거래량')
+        
+        score = np.zeros(len(market_data))
+        with np.errstate(invalid='ignore'):
+            # 1. 가격 점수 (1,000원 ~ 1,000,000원 범위 내, 5만원에 가까울수록 높은 점수)
+            in_range = (price >= 1000) & (price <= 1000000)
+            price_score = 100 - (np.abs(price - 50000) / 50000 * 100)
+            score += np.where(in_range, price_score * 0.3, 0.0)
+            
+            # 2. 등락률 점수 (-5% ~ +15% 범위 내, +5%에 가까울수록 높은 점수)
+            in_range = (change_rate >= -5) & (change_rate <= 15)
+            change_score = 100 - (np.abs(change_rate - 5) / 20 * 100)
+            score += np.where(in_range, change_score * 0.3, 0.0)
+            
+            # 3. 거래량 점수 (100만주 기준)
+            volume_score = np.minimum(100, volume / 1000000 * 100)
+            score += np.where(volume > 0, volume_score * 0.4, 0.0)
+        
+        score[invalid_price | invalid_change | invalid_volume] = 0.0
+        return score
 
     async def get_detailed_analysis(self, stock_code: str) -> StockAnalysis:
         """
         특정 종목에 대한 상세 분석을 반환합니다.
+        같은 종목에 대한 동시 요청은 하나의 분석 결과를 공유합니다.
+        """
+        return await self.inflight.do(f"analysis:{stock_code}", lambda: self._build_detailed_analysis(stock_code))
+
+    async def _build_detailed_analysis(self, stock_code: str) -> StockAnalysis:
+        """
+        특정 종목에 대한 상세 분석을 수행합니다.
         """
         try:
             self.logger.info(f"종목 {stock_code} 상세 분석 시작")
@@ -313,28 +350,34 @@ class StockAnalysisService:
         try:
             logger.info("=== 시장 데이터 수집 시작 ===")
             
-            # 시장 데이터 수집
+            # 시장 데이터 수집 (페이지가 도착하는 대로 거래일/시장구분별 Arrow 스냅샷에 기록)
             logger.info("금융위원회 API를 통해 시장 데이터 수집 중...")
-            market_data = await self.fss.get_market_data()
-            
-            if market_data is None or market_data.empty:
-                logger.error("시장 데이터를 가져오는데 실패했습니다.")
-                raise Exception("시장 데이터를 가져오는데 실패했습니다.")
-            
-            logger.info(f"수집된 데이터: {len(market_data)}개 종목")
-            
-            # 데이터 저장
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"market_data_{timestamp}.csv"
-            filepath = os.path.join(self.data_dir, filename)
-            
-            logger.info(f"데이터 저장 시작: {filepath}")
-            market_data.to_csv(filepath, index=False, encoding='utf-8-sig')
+            writer = None
+            sample_data = None
+            try:
+                async for page in self.fss.iter_market_data():
+                    if writer is None:
+                        trade_date = page.attrs["trade_date"]
+                        logger.info(f"데이터 저장 시작: {self.market_store.root} (거래일 {trade_date})")
+                        writer = self.market_store.open_snapshot(trade_date, snapshot_id_for(datetime.now()))
+                        sample_data = page.head(3)
+                    await asyncio.to_thread(writer.write, page)
+                
+                if writer is None or writer.rows == 0:
+                    logger.error("시장 데이터를 가져오는데 실패했습니다.")
+                    raise Exception("시장 데이터를 가져오는데 실패했습니다.")
+                
+                logger.info(f"수집된 데이터: {writer.rows}개 종목")
+                snapshot_id = await asyncio.to_thread(writer.commit)
+            finally:
+                if writer is not None:
+                    writer.abort()
+            await self.hot_snapshot.refresh()
+            self.schedule_market_data_retention()
             logger.info("데이터 저장 완료")
             
             # 데이터 샘플 로깅
             logger.info("\n=== 수집된 데이터 샘플 ===")
-            sample_data = market_data.head(3)
             for _, row in sample_data.iterrows():
                 logger.info(f"종목: {row['종목명']} ({row['종목코드']})")
                 logger.info(f"현재가: {row['현재가']}원")
@@ -345,14 +388,33 @@ class StockAnalysisService:
             return {
                 "success": True,
                 "message": "시장 데이터 수집 완료",
-                "filename": filename,
-                "data_count": len(market_data)
+                "filename": snapshot_id,
+                "trade_date": trade_date,
+                "data_count": writer.rows
             }
             
         except Exception as e:
             logger.error(f"데이터 수집 중 오류 발생: {str(e)}")
             raise Exception(f"데이터 수집 중 오류 발생: {str(e)}")
 
+    def schedule_market_data_retention(self) -> None:
+        """스냅샷 보존 정책(장중 스냅샷 압축, 오래된 거래일 삭제)을 백그라운드에서 적용합니다."""
+        if self._retention_task is not None and not self._retention_task.done():
+            return
+        
+        async def apply_retention() -> None:
+            try:
+                await asyncio.to_thread(
+                    self.market_store.apply_retention,
+                    settings.MARKET_DATA_KEEP_INTRADAY,
+                    settings.MARKET_DATA_KEEP_DAYS
+                )
+                logger.info(f"시장 데이터 저장소 현황: {self.market_store.stats()}")
+            except Exception as e:
+                logger.error(f"스냅샷 보존 정책 적용 중 오류 발생: {str(e)}")
+        
+        self._retention_task = asyncio.create_task(apply_retention())
+
     async def get_recommendations_from_latest(self, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """최신 데이터를 기반으로 주식 추천을 생성합니다."""
         try:
@@ -360,14 +422,6 @@ class StockAnalysisService:
             
             # 최신 데이터 읽기
             logger.info("최신 시장 데이터 읽기 시작")
-            market_data = await self.get_latest_market_data()
-            
-            if market_data is None or market_data.empty:
-                logger.error("수집된 시장 데이터가 없습니다.")
-                raise Exception("수집된 시장 데이터가 없습니다.")
-            
-            logger.info(f"읽어온 데이터: {len(market_data)}개 종목")
-            
             # 기본 파라미터 설정
             if params is None:
                 params = {}
@@ -378,6 +432,15 @@ class StockAnalysisService:
             
             logger.info(f"분석 파라미터: 시장={market_segment}, 최소점수={min_score}, 최대결과={max_results}")
             
+            # 해당 시장 파티션만 읽음
+            market_data = await self.get_latest_market_data(markets=[market_segment] if market_segment else None)
+            
+            if market_data is None or market_data.empty:
+                logger.error("수집된 시장 데이터가 없습니다.")
+                raise Exception("수집된 시장 데이터가 없습니다.")
+            
+            logger.info(f"읽어온 데이터: {len(market_data)}개 종목")
+            
             # 시장 구분 필터링
             if market_segment:
                 market_data = market_data[market_data['시장구분'] == market_segment]
@@ -389,14 +452,13 @@ class StockAnalysisService:
             
             # 점수 계산
             logger.info("종목별 점수 계산 시작")
-            market_data['score'] = market_data.apply(self._calculate_basic_score, axis=1)
-            
-            # 점수 기준 필터링 및 정렬
-            recommendations = market_data[market_data['score'] >= min_score].sort_values('score', ascending=False)
-            logger.info(f"점수 {min_score} 이상 종목: {len(recommendations)}개")
+            scores = self._calculate_basic_scores(market_data)
+            market_data = market_data.assign(score=scores)
             
-            # 결과 제한
-            recommendations = recommendations.head(max_results)
+            # 점수 기준 필터링 후 상위 종목만 부분 선택
+            eligible = np.flatnonzero(scores >= min_score)
+            logger.info(f"점수 {min_score} 이상 종목: {len(eligible)}개")
+            recommendations = market_data.iloc[eligible[_top_k_indices(scores[eligible], max_results)]]
             
             # 결과 포맷팅 (추천 이유 포함)
             result = []
@@ -429,33 +491,31 @@ class StockAnalysisService:
             logger.error(f"추천 생성 중 오류 발생: {str(e)}")
             raise Exception(f"추천 생성 중 오류 발생: {str(e)}")
 
-    async def get_latest_market_data(self) -> Optional[pd.DataFrame]:
-        """가장 최근의 시장 데이터를 읽습니다."""
+    async def get_latest_market_data(self, columns: Optional[List[str]] = None,
+                                     markets: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """
+        가장 최근의 시장 데이터 스냅샷을 반환합니다.
+        columns/markets를 지정하면 해당 컬럼과 시장만 선택합니다.
+        """
         try:
             logger.info("=== 최신 시장 데이터 읽기 시작 ===")
             
-            # 데이터 디렉토리의 모든 CSV 파일 목록
-            csv_files = [f for f in os.listdir(self.data_dir) if f.endswith('.csv')]
-            logger.info(f"발견된 CSV 파일 수: {len(csv_files)}")
+            # 메모리의 최신 스냅샷 사용 (새 스냅샷이 기록된 경우에만 다시 읽음)
+            df = await self.hot_snapshot.get(columns, markets)
+            
+            if df is None:
+                # 저장소가 비어 있으면 이전 CSV 스냅샷을 가져옴
+                imported = await asyncio.to_thread(self.market_store.import_legacy_csvs, self.data_dir)
+                logger.info(f"CSV 스냅샷 가져오기: {imported}개")
+                if imported:
+                    await self.hot_snapshot.refresh(force=True)
+                    df = await self.hot_snapshot.get(columns, markets)
             
-            if not csv_files:
+            if df is None or df.empty:
                 logger.error("수집된 시장 데이터가 없습니다.")
                 raise Exception("수집된 시장 데이터가 없습니다.")
             
-            # 파일명으로 정렬하여 가장 최근 파일 선택
-            latest_file = sorted(csv_files)[-1]
-            filepath = os.path.join(self.data_dir, latest_file)
-            logger.info(f"최신 데이터 파일: {latest_file}")
-            
-            # CSV 파일 읽기
-            logger.info("CSV 파일 읽기 시작")
-            df = pd.read_csv(filepath, encoding='utf-8-sig')
-            
-            if df.empty:
-                logger.error("데이터 파일이 비어있습니다.")
-                raise Exception("데이터 파일이 비어있습니다.")
-            
-            logger.info(f"데이터 읽기 완료: {len(df)}개 종목")
+            logger.info(f"데이터 읽기 완료: {len(df)}개 종목 (거래일 {df.attrs['trade_date']}, 스냅샷 {df.attrs['snapshot_id']})")
             logger.info("=== 최신 시장 데이터 읽기 완료 ===")
             
             return df
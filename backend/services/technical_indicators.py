@@ -0,0 +1,237 @@
+"""
+기술적 지표 엔진
+- 전체 종목의 최근 일별 시세를 (거래일 × 종목) 2차원 배열로 쌓은 뒤 이동평균, RSI, ATR,
+  실현 변동성, 거래량 z-score를 종목 축 전체에 대해 한 번에 계산합니다.
+- 결과는 종목별 지표 행렬(IndicatorMatrix)로 보관되며, 요청 시 기술적 분석은 행 조회입니다.
+- 일별 시세 추가/백필 후 refresh()로 다시 계산합니다.
+"""
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import logging
+
+import numpy as np
+import pandas as pd
+
+from services.price_history import PriceHistoryStore, price_history_store
+
+logger = logging.getLogger(__name__)
+
+# 기술적 분석에 필요한 최소 일별 시세 수 / 지표 산출 구간(거래일)
+TECHNICAL_MIN_DAYS = 20
+TECHNICAL_LOOKBACK_DAYS = 60
+MA_SHORT = 20
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+VOLUME_RECENT_DAYS = 5
+TRADING_DAYS_PER_YEAR = 252
+
+TREND_LABELS = np.array(["상승", "하락", "횡보"])
+NUMERIC_FIELDS = (
+    "support_level", "resistance_level", "momentum_score", "volatility_score", "volume_score",
+    "rsi", "atr"
+)
+
+
+def _nanmean(values: np.ndarray, axis: int = 0) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        count = np.sum(~np.isnan(values), axis=axis)
+        total = np.nansum(values, axis=axis)
+        return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def compute_indicators(close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                       volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    (거래일 × 종목) 배열로 종목별 기술적 지표를 계산합니다.
+    종목별 시세는 마지막 행에 맞춰 정렬되어 있고, 이력이 없는 앞 구간은 NaN입니다.
+    반환값은 필드명 → (종목,) 배열입니다.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        window = close[-TECHNICAL_LOOKBACK_DAYS:]
+        days = np.sum(~np.isnan(window), axis=0)
+        last = window[-1]
+
+        # 추세: 종가와 20일/60일 이동평균의 배열
+        ma_short = _nanmean(window[-MA_SHORT:])
+        ma_long = _nanmean(window)
+        trend = np.select(
+            [(last > ma_short) & (ma_short > ma_long), (last < ma_short) & (ma_short < ma_long)],
+            [0, 1], default=2
+        )
+
+        # 모멘텀: 20일 수익률(±20% → 0~100점)과 RSI의 평균
+        base = window[-MA_SHORT] if len(window) >= MA_SHORT else window[0]
+        momentum = np.where(base > 0, last / base - 1, 0.0)
+        change = np.diff(close[-(RSI_PERIOD + 1):], axis=0)
+        gain = _nanmean(np.where(change > 0, change, 0.0))
+        loss = _nanmean(np.where(change < 0, -change, 0.0))
+        rsi = np.where(
+            loss > 0,
+            100 - 100 / (1 + gain / np.where(loss > 0, loss, 1)),
+            np.where(gain > 0, 100.0, 50.0)
+        )
+        momentum_score = (np.clip(50 + momentum * 250, 0, 100) + rsi) / 2
+
+        # 변동성: 연환산 실현 변동성이 낮을수록 높은 점수 (80% 이상이면 0점)
+        log_close = np.log(np.where(window > 0, window, np.nan))
+        returns = np.diff(log_close, axis=0)
+        return_count = np.sum(~np.isnan(returns), axis=0)
+        realized = np.sqrt(_nanmean((returns - _nanmean(returns)) ** 2)) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        realized = np.where(return_count > 1, realized, 0.0)
+        volatility_score = np.clip(100 - realized * 125, 0, 100)
+
+        # 지지선/저항선: 구간 최저가/최고가
+        low_window = low[-TECHNICAL_LOOKBACK_DAYS:]
+        high_window = high[-TECHNICAL_LOOKBACK_DAYS:]
+
+        # ATR: 최근 14일 true range 평균
+        previous_close = close[-(ATR_PERIOD + 1):-1]
+        true_range = np.fmax(
+            high[-ATR_PERIOD:] - low[-ATR_PERIOD:],
+            np.fmax(np.abs(high[-ATR_PERIOD:] - previous_close), np.abs(low[-ATR_PERIOD:] - previous_close))
+        )
+        atr = _nanmean(true_range)
+
+        # 거래량: 최근 5일 평균의 구간 내 z-score (평균 수준이면 50점, ±2σ → 0/100점)
+        volume_window = volume[-TECHNICAL_LOOKBACK_DAYS:]
+        volume_mean = _nanmean(volume_window)
+        volume_std = np.sqrt(_nanmean((volume_window - volume_mean) ** 2))
+        volume_z = np.where(
+            volume_std > 0,
+            (_nanmean(volume_window[-VOLUME_RECENT_DAYS:]) - volume_mean) / np.where(volume_std > 0, volume_std, 1),
+            0.0
+        )
+        volume_score = np.clip(50 + volume_z * 25, 0, 100)
+
+        return {
+            "days": days,
+            "trend": trend,
+            "support_level": np.min(np.where(np.isnan(low_window), np.inf, low_window), axis=0),
+            "resistance_level": np.max(np.where(np.isnan(high_window), -np.inf, high_window), axis=0),
+            "momentum_score": momentum_score,
+            "volatility_score": volatility_score,
+            "volume_score": volume_score,
+            "rsi": rsi,
+            "atr": atr,
+        }
+
+
+def align_histories(histories: Dict[str, pd.DataFrame],
+                    depth: int = TECHNICAL_LOOKBACK_DAYS) -> Dict[str, np.ndarray]:
+    """
+    종목별 최근 depth개 일별 시세를 (거래일 × 종목) 배열로 쌓습니다.
+    각 종목의 마지막 거래일이 배열의 마지막 행에 오도록 오른쪽 정렬하며,
+    이력이 depth보다 짧은 종목의 앞부분은 NaN입니다. (한 종목만 계산해도 같은 값이 나오도록)
+    """
+    symbols = [symbol for symbol, frame in histories.items() if not frame.empty]
+    if not symbols:
+        return {}
+    aligned = {}
+    for field in ("close", "high", "low", "volume"):
+        panel = np.full((depth, len(symbols)), np.nan)
+        for j, symbol in enumerate(symbols):
+            values = histories[symbol][field].to_numpy(dtype=float)[-depth:]
+            panel[depth - len(values):, j] = values
+        aligned[field] = panel
+    aligned["symbols"] = np.asarray(symbols)
+    return aligned
+
+
+class IndicatorMatrix:
+    """종목별 기술적 지표 행렬 (종목 축 배열 + 종목코드 색인)"""
+
+    def __init__(self, symbols: Iterable[str], fields: Dict[str, np.ndarray]):
+        self.symbols: List[str] = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.fields = fields
+
+    @classmethod
+    def empty(cls) -> "IndicatorMatrix":
+        return cls([], {})
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.index
+
+    def row(self, symbol: str) -> Optional[Dict[str, object]]:
+        """종목의 TechnicalAnalysis 필드 값을 반환합니다. 없거나 이력이 부족하면 None."""
+        i = self.index.get(symbol)
+        if i is None or self.fields["days"][i] < TECHNICAL_MIN_DAYS:
+            return None
+        row = {"trend": str(TREND_LABELS[self.fields["trend"][i]])}
+        row.update({name: float(self.fields[name][i]) for name in NUMERIC_FIELDS})
+        return row
+
+    def merge(self, other: "IndicatorMatrix") -> "IndicatorMatrix":
+        """other의 종목 값으로 덮어쓴 새 행렬을 반환합니다."""
+        if not len(self):
+            return other
+        if not len(other):
+            return self
+        keep = np.array([symbol not in other.index for symbol in self.symbols], dtype=bool)
+        symbols = [s for s, k in zip(self.symbols, keep) if k] + other.symbols
+        fields = {name: np.concatenate([values[keep], other.fields[name]]) for name, values in self.fields.items()}
+        return IndicatorMatrix(symbols, fields)
+
+
+class TechnicalIndicatorEngine:
+    """일별 시세 이력 저장소로 지표 행렬을 만들고 보관합니다."""
+
+    def __init__(self, store: PriceHistoryStore):
+        self.store = store
+        self.matrix = IndicatorMatrix.empty()
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def build(self, symbols: Optional[Iterable[str]] = None) -> IndicatorMatrix:
+        """저장소의 최근 구간 시세로 지표 행렬을 계산합니다. symbols 미지정 시 전체 종목."""
+        symbols = list(symbols) if symbols is not None else self.store.symbols()
+        histories = {}
+        for symbol in symbols:
+            date_range = self.store.date_range(symbol)
+            if date_range is None:
+                continue
+            # 휴장일을 감안해 지표 구간보다 넉넉한 달력 기간만 읽음
+            start = date_range[1] - timedelta(days=TECHNICAL_LOOKBACK_DAYS * 2)
+            histories[symbol] = self.store.load(symbol, start=start, columns=["close", "high", "low", "volume"])
+        aligned = align_histories(histories)
+        if not aligned:
+            return IndicatorMatrix.empty()
+        return IndicatorMatrix(
+            aligned["symbols"],
+            compute_indicators(aligned["close"], aligned["high"], aligned["low"], aligned["volume"])
+        )
+
+    async def refresh(self, symbols: Optional[Iterable[str]] = None) -> int:
+        """
+        지표 행렬을 다시 계산합니다. symbols를 지정하면 해당 종목만 계산해 기존 행렬에 반영합니다.
+        계산한 종목 수를 반환합니다.
+        """
+        async with self._lock:
+            matrix = await asyncio.to_thread(self.build, symbols)
+            self.matrix = matrix if symbols is None else self.matrix.merge(matrix)
+            logger.info(f"기술적 지표 행렬 갱신: {len(matrix)}개 종목 (전체 {len(self.matrix)}개)")
+            return len(matrix)
+
+    def schedule_refresh(self) -> None:
+        """전체 종목 지표 행렬 계산을 백그라운드에서 시작합니다."""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+
+        async def refresh_all() -> None:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"기술적 지표 행렬 계산 중 오류 발생: {str(e)}")
+
+        self._refresh_task = asyncio.create_task(refresh_all())
+
+    def lookup(self, symbol: str) -> Optional[Dict[str, object]]:
+        """미리 계산된 종목 지표를 반환합니다. 행렬에 없거나 이력이 부족하면 None."""
+        return self.matrix.row(symbol)
+
+
+technical_indicators = TechnicalIndicatorEngine(price_history_store)
@@ -0,0 +1,54 @@
+import asyncio
+from services.agent_runtime import AdmissionLimiter, AdmissionRejected
+
+async def hold(limiter: AdmissionLimiter, release: asyncio.Event, started: list):
+    async with limiter.slot():
+        started.append(True)
+        await release.wait()
+
+async def test_admission_limiter():
+    print("=== 에이전트 실행 대기열 테스트 ===")
+    limiter = AdmissionLimiter(max_concurrent=2, max_queued=1, queue_timeout=0.1)
+    release = asyncio.Event()
+    started = []
+
+    # 동시 실행 상한까지는 바로 실행
+    running = [asyncio.create_task(hold(limiter, release, started)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    assert len(started) == 2 and limiter.get_stats()["running"] == 2
+
+    # 상한을 넘으면 대기열에서 기다림
+    queued = asyncio.create_task(hold(limiter, release, started))
+    await asyncio.sleep(0.01)
+    assert len(started) == 2 and limiter.get_stats()["waiting"] == 1
+
+    # 대기열이 가득 차면 즉시 거절
+    try:
+        async with limiter.slot():
+            raise AssertionError("대기열이 가득 찼는데 실행됨")
+    except AdmissionRejected as e:
+        assert e.retry_after == 0.1
+    assert limiter.get_stats()["rejected"] == 1
+    print("- 실행/대기/거절 확인")
+
+    # 대기 시간이 지나면 거절되고 대기열에서 빠짐
+    try:
+        await queued
+        raise AssertionError("대기 시간이 초과됐는데 실행됨")
+    except AdmissionRejected:
+        pass
+    stats = limiter.get_stats()
+    assert stats["timed_out"] == 1 and stats["waiting"] == 0 and stats["running"] == 2
+    print("- 대기 시간 초과 확인")
+
+    # 실행이 끝나면 슬롯이 반환되어 다음 요청이 실행됨
+    release.set()
+    await asyncio.gather(*running)
+    assert limiter.get_stats()["running"] == 0
+    await hold(limiter, release, started)
+    assert len(started) == 3 and limiter.get_stats()["admitted"] == 3
+    print(f"- 통계: {limiter.get_stats()}")
+
+if __name__ == "__main__":
+    asyncio.run(test_admission_limiter())
+    print("=== 에이전트 실행 대기열 테스트 완료 ===")
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import tempfile
+import pandas as pd
+from services.buffett_filter_tool_simple import BuffettFilter
+from services import buffett_score_table as score_table_module
+from services.buffett_score_table import BuffettScoreTable, BuffettScoreService
+from services.data_providers.opendart_api import FinancialStatement
+from services.price_history import PriceHistoryStore
+
+SNAPSHOT = pd.DataFrame([
+    {"종목코드": "005930", "종목명": "삼성전자", "시장구분": "KOSPI", "시가총액": 3.36e14},
+    {"종목코드": "000660", "종목명": "SK하이닉스", "시장구분": "KOSPI", "시가총액": 1.38e14},
+    {"종목코드": "035720", "종목명": "카카오", "시장구분": "KOSDAQ", "시가총액": 1.9e13},
+    {"종목코드": "293490", "종목명": "카카오게임즈", "시장구분": "KOSDAQ", "시가총액": 1.5e12},  # 적자 기업
+    {"종목코드": "373220", "종목명": "LG에너지솔루션", "시장구분": "KOSPI", "시가총액": 7.0e13},  # 재무제표 조회 실패
+])
+SNAPSHOT.attrs.update(trade_date="20250604", snapshot_id="20250604_160000")
+
+# 종목코드 → (업종코드, 기준 매출, 순이익률)
+FILINGS = {
+    "005930": ("26410", 2.6e14, 0.12),
+    "000660": ("26110", 4.4e13, 0.20),
+    "035720": ("63120", 7.5e12, 0.05),
+    "293490": ("58211", 1.0e12, -0.10),
+}
+
+class StubProvider:
+    """실제 공시 형태의 재무제표를 반환하고, 공시가 없는 종목은 Mock 대신 빈 목록을 반환"""
+
+    def __init__(self):
+        self.mock_fallback = []
+
+    async def get_financial_statements(self, symbol: str, years: int = 3, mock_fallback: bool = True):
+        self.mock_fallback.append(mock_fallback)
+        if symbol not in FILINGS:
+            return []
+        _, revenue, margin = FILINGS[symbol]
+        statements = []
+        for i in range(years):
+            sales = revenue * 1.08 ** i
+            equity = sales * 1.2
+            statements.append(FinancialStatement(
+                symbol=symbol, year=2022 + i, quarter=4, revenue=sales, operating_income=sales * margin * 1.3,
+                net_income=sales * margin, total_assets=equity * 1.5, total_equity=equity, debt=equity * 0.5,
+                cash_flow_from_operations=sales * margin * 1.2, free_cash_flow=sales * margin * 0.9
+            ))
+        return statements
+
+    async def get_corp_code(self, symbol: str):
+        return symbol
+
+    async def get_company_info(self, corp_code: str):
+        return {"induty_code": FILINGS[corp_code][0]}
+
+async def test_incremental_refresh(service: BuffettScoreService):
+    print("=== 점수 테이블 증분 갱신 테스트 ===")
+    table = service.table
+    assert await service.refresh_fundamentals(SNAPSHOT) == 4
+    # 재무제표가 없는 종목은 Mock 데이터로 채우지 않고 제외
+    assert not any(service.provider.mock_fallback)
+    assert "373220" not in set(table.fundamentals()["symbol"])
+    assert await service.refresh_fundamentals(SNAPSHOT) == 0  # 새 공시가 없으면 재계산하지 않음
+    assert await service.refresh_prices(SNAPSHOT) == 4
+    assert table.latest_as_of() == "20250604"
+
+    total, kospi = table.screen("KOSPI", 0)
+    assert total == 2 and set(kospi["symbol"]) == {"005930", "000660"}
+    assert kospi["base_score"].is_monotonic_decreasing
+
+    # 한 종목의 공시가 바뀌면 해당 종목(과 같은 섹터)만 다시 계산해 최신 거래일 점수에 반영
+    before = table.screen("ALL", 0)[1].set_index("symbol")
+    table._execute("UPDATE fundamentals SET filing_key = 'old', roe_score = 0 WHERE symbol = '005930'")
+    table._execute("UPDATE buffett_scores SET roe_score = 0, base_score = 0 WHERE symbol = '005930'")
+    assert await service.refresh_fundamentals(SNAPSHOT) >= 1
+    after = table.screen("ALL", 0)[1].set_index("symbol")
+    assert after.loc["005930", "base_score"] == before.loc["005930", "base_score"]
+    print("- 공시 변경 종목만 재계산 확인")
+
+def test_loss_making_screen(table: BuffettScoreTable):
+    print("=== 적자 기업 포함 스크리닝 테스트 ===")
+    # 순이익이 음수인 종목은 PER/PBR이 NULL로 저장됨
+    loss = table.screen("KOSDAQ", 0)[1].set_index("symbol").loc["293490"]
+    assert loss["per"] is None or pd.isna(loss["per"])
+
+    score_table_module.buffett_score_table = table
+    result = json.loads(BuffettFilter._run("KOSDAQ", min_score=0, include_risk_analysis=False))
+    metrics = {stock["symbol"]: stock["key_metrics"] for stock in result["top_recommendations"]}
+    assert metrics["293490"]["per"] == "0.0" and metrics["293490"]["pbr"] != "nan"
+    assert metrics["035720"]["per"] != "0.0"
+    # 적자 기업만 있는 구간 (PER 컬럼 전체가 NULL)
+    result = json.loads(BuffettFilter._run("KOSDAQ", min_score=0, include_risk_analysis=False, sectors=["58211"]))
+    assert result["top_recommendations"][0]["key_metrics"]["per"] == "0.0"
+    print("- PER/PBR이 없는 종목 결과 포맷 확인")
+
+def test_non_finite_market_cap():
+    print("=== 시가총액 결측 종목 채점 테스트 ===")
+    base = {
+        "sector": "IT", "roe_3y_avg": 15.0, "net_profit_margin": 10.0, "market_cap_growth_3y": 10.0,
+        "equity_growth_3y": 5.0, "fcf_projection_5y_sum": 1e6, "per": 12.0, "pbr": 1.2
+    }
+    stocks = [
+        {**base, "symbol": "000001", "market_cap": 1e6},
+        {**base, "symbol": "000002", "market_cap": 0.0},
+        {**base, "symbol": "000003", "market_cap": float("nan")},
+        {**base, "symbol": "000004", "market_cap": 5e5},
+    ]
+    scored = {s["symbol"]: s for s in BuffettFilter._score_batch(stocks, include_esg=False, include_risk_analysis=False)}
+    # 비율이 inf/NaN이 되는 종목은 최고 구간이 아니라 0점
+    for symbol in ("000002", "000003"):
+        assert scored[symbol]["fcf_projection_score"] == 0 and scored[symbol]["market_cap_score"] == 0
+    assert scored["000004"]["fcf_projection_score"] == 100 and scored["000001"]["fcf_projection_score"] == 80
+    # 결측 종목이 정상 종목의 시가총액 순위를 밀어내지 않음
+    assert scored["000001"]["market_cap_score"] == 100 and scored["000004"]["market_cap_score"] == 80
+    assert scored["000002"]["total_score"] < scored["000004"]["total_score"]
+    print("- 0/결측 시가총액 0점 처리 확인")
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        table = BuffettScoreTable(os.path.join(tmp_dir, "scores.db"))
+        # 점수를 계산하기 전의 조회는 DB 파일을 만들지 않음
+        assert table.screen("ALL", 0)[0] == 0 and not os.path.exists(table.path)
+        service = BuffettScoreService(
+            table, BuffettFilter, StubProvider(), PriceHistoryStore(os.path.join(tmp_dir, "history"))
+        )
+        asyncio.run(test_incremental_refresh(service))
+        test_loss_making_screen(table)
+        test_non_finite_market_cap()
+        table.close()
+    print("=== 점수 테이블 테스트 완료 ===")
+
+if __name__ == "__main__":
+    main()
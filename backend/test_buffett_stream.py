@@ -0,0 +1,96 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api import deps
+from api.routers import ai_service
+from services.agent_runtime import AdmissionLimiter
+
+class FakeBuffettAgent:
+    """도구 호출 → 토큰 → 결과 순서로 이벤트를 내보내는 에이전트"""
+
+    async def stream_analysis(self, question: str, user_question=None):
+        yield {"event": "tool_start", "tool": "enhanced_buffett_stock_screener", "input": {"market_segment": "KOSPI"}}
+        await asyncio.sleep(0)
+        yield {"event": "tool_end", "tool": "enhanced_buffett_stock_screener", "output": "[]"}
+        for text in ("삼성전자", "를 추천합니다."):
+            yield {"event": "token", "text": text}
+        yield {"event": "result", "data": {
+            "recommendations": ["삼성전자를 추천합니다."],
+            "raw_output": "삼성전자를 추천합니다.",
+            "tools_used": ["enhanced_buffett_stock_screener"],
+            "success": True
+        }}
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+query_logs = []
+
+async def fake_create_query_log(db, **kwargs):
+    query_logs.append(kwargs)
+
+async def fake_get_buffett_agent():
+    return FakeBuffettAgent()
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_event_sequence(client: TestClient):
+    print("=== 버핏 분석 SSE 이벤트 순서 테스트 ===")
+    response = client.post("/ai/warren-buffett-analysis/stream", json={"question": "KOSPI 추천"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert [name for name, _ in events] == ["tool_start", "tool_end", "token", "token", "result"]
+    assert events[0][1]["tool"] == "enhanced_buffett_stock_screener"
+    assert "".join(data["text"] for name, data in events if name == "token") == "삼성전자를 추천합니다."
+    result = events[-1][1]
+    assert result["success"] and result["analysis_metadata"]["market_segment"] == "KOSPI"
+    assert query_logs and query_logs[-1]["user_id"] == 1
+    assert ai_service.analysis_admission.get_stats()["running"] == 0  # 스트림 종료 후 슬롯 반환
+    print("- 도구 → 토큰 → 결과 순서 확인")
+
+def test_admission(client: TestClient):
+    print("=== 실행 슬롯 확보/반환 테스트 ===")
+    limiter = ai_service.analysis_admission
+
+    # 본문을 보내지 않고 버린 응답은 슬롯을 잡지 않음
+    request = ai_service.BuffettAnalysisRequest(question="KOSPI 추천")
+    response = asyncio.run(ai_service.stream_warren_buffett_analysis(request, SimpleNamespace(id=1)))
+    del response
+    assert limiter.get_stats()["running"] == 0 and limiter.get_stats()["admitted"] == 1
+
+    # 대기열이 가득 차면 스트림을 열기 전에 503
+    async def saturated():
+        async with limiter.slot():
+            return client.post("/ai/warren-buffett-analysis/stream", json={"question": "KOSPI 추천"})
+    response = asyncio.run(saturated())
+    assert response.status_code == 503 and response.headers["retry-after"] == "0"
+    assert limiter.get_stats()["running"] == 0
+    print(f"- 통계: {limiter.get_stats()}")
+
+def main():
+    ai_service.get_buffett_agent = fake_get_buffett_agent
+    ai_service.AsyncSessionLocal = FakeSession
+    ai_service.crud_query_history.create_query_log = fake_create_query_log
+    ai_service.analysis_admission = AdmissionLimiter(max_concurrent=1, max_queued=0, queue_timeout=0.5)
+    app = FastAPI()
+    app.include_router(ai_service.router, prefix="/ai")
+    app.dependency_overrides[deps.get_current_active_user] = lambda: SimpleNamespace(id=1)
+    client = TestClient(app)
+    test_event_sequence(client)
+    test_admission(client)
+    print("=== 버핏 분석 SSE 테스트 완료 ===")
+
+if __name__ == "__main__":
+    main()
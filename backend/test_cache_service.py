@@ -0,0 +1,103 @@
+import asyncio
+import os
+import tempfile
+from services.cache import CacheService
+from services.cache_backends import SQLiteCacheBackend
+
+async def test_lru_ttl():
+    print("=== L1 LRU/TTL 테스트 ===")
+    cache = CacheService(max_entries=2, max_bytes=1024 * 1024)
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    assert await cache.get("a") == 1  # a를 최근 사용으로 갱신
+    await cache.set("c", 3)  # 가장 오래 사용되지 않은 b 제거
+    assert await cache.get("b") is None
+    assert await cache.get("a") == 1 and await cache.get("c") == 3
+
+    await cache.set("short", "x", ttl=0.05)
+    await asyncio.sleep(0.1)
+    assert cache.sweep_expired() == 1
+    assert not await cache.exists("short")
+
+    stats = cache.get_stats()
+    print(f"- 통계: {stats}")
+    assert stats["evictions"] >= 1 and stats["expirations"] == 1
+
+async def test_shared_sqlite_backend():
+    print("=== SQLite L2 공유 테스트 ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "cache.db")
+        # 워커 두 개가 같은 파일을 공유하는 상황
+        worker_a = CacheService(backend=SQLiteCacheBackend(path))
+        worker_b = CacheService(backend=SQLiteCacheBackend(path))
+
+        await worker_a.set("recommendations:KOSPI:60", {"items": [1, 2, 3]}, ttl=60)
+        assert await worker_b.get("recommendations:KOSPI:60") == {"items": [1, 2, 3]}
+        assert worker_b.get_stats()["l2_hits"] == 1
+        assert 0 < await worker_b.ttl("recommendations:KOSPI:60") <= 60
+
+        # 삭제는 L2에 반영되어 새로 뜬 워커에서도 보이지 않음
+        await worker_a.delete("recommendations:KOSPI:60")
+        worker_c = CacheService(backend=SQLiteCacheBackend(path))
+        assert await worker_c.get("recommendations:KOSPI:60") is None
+
+        for worker in (worker_a, worker_b, worker_c):
+            await worker.close()
+    print("- 워커 간 캐시 공유 확인")
+
+async def test_stale_while_revalidate():
+    print("=== stale-while-revalidate 테스트 ===")
+    cache = CacheService()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    # 최초 동시 요청은 한 번만 계산
+    results = await asyncio.gather(*[cache.get_or_refresh("k", loader, soft_ttl=0.1, hard_ttl=10) for _ in range(5)])
+    assert results == [1] * 5 and calls == 1
+
+    # soft TTL 경과 후에는 이전 값을 즉시 반환하고 백그라운드에서 갱신
+    await asyncio.sleep(0.15)
+    assert await cache.get_or_refresh("k", loader, soft_ttl=0.1, hard_ttl=10) == 1
+    await asyncio.sleep(0.1)
+    assert calls == 2
+    assert await cache.get_or_refresh("k", loader, soft_ttl=0.1, hard_ttl=10) == 2
+
+    # 백그라운드 갱신 중 값이 사라지면 포그라운드 요청은 갱신에 합류해 새 값을 받음
+    await asyncio.sleep(0.15)
+    assert await cache.get_or_refresh("k", loader, soft_ttl=0.1, hard_ttl=10) == 2
+    await asyncio.sleep(0.01)  # 백그라운드 갱신 시작
+    await cache.delete("k")
+    assert await cache.get_or_refresh("k", loader, soft_ttl=0.1, hard_ttl=10) == 3 and calls == 3
+
+    # 합류한 갱신이 실패하면 None 대신 예외를 받음
+    async def failing_loader():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("갱신 실패")
+
+    await asyncio.sleep(0.15)
+    assert await cache.get_or_refresh("k", failing_loader, soft_ttl=0.1, hard_ttl=10) == 3
+    await asyncio.sleep(0.01)
+    await cache.delete("k")
+    try:
+        await cache.get_or_refresh("k", failing_loader, soft_ttl=0.1, hard_ttl=10)
+        raise AssertionError("예외가 전달되지 않음")
+    except RuntimeError:
+        pass
+    await asyncio.sleep(0.01)
+    assert cache.get_stats()["refresh_errors"] == 1
+    print(f"- 통계: {cache.get_stats()}")
+    await cache.close()
+
+async def main():
+    await test_lru_ttl()
+    await test_shared_sqlite_backend()
+    await test_stale_while_revalidate()
+    print("=== 캐시 테스트 완료 ===")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from db.base_class import Base
+from db.models import QueryHistory, QueryHistorySummary, QueryHistorySummaryFailure, TokenUsageLog
+from core.config import settings
+from services import chat_summary
+from services.chat_summary import ChatSummaryService
+
+calls = []
+
+async def fake_summarize(query_text: str, response_text: str):
+    calls.append(query_text)
+    await asyncio.sleep(0.01)
+    if query_text == "실패":
+        raise RuntimeError("Azure 호출 실패")
+    if query_text == "캐시된 질문":
+        return f"요약: {query_text}", 0, 0  # LLM 응답 캐시 적중
+    return f"요약: {query_text}", 100, 20
+
+async def count(session_factory, model) -> int:
+    async with session_factory() as db:
+        return (await db.execute(select(func.count()).select_from(model))).scalar()
+
+async def test_chat_summary():
+    print("=== 대화 요약 저장 테스트 ===")
+    chat_summary.azure_openai_service.generate_summary = fake_summarize
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'test.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with session_factory() as db:
+            db.add_all([
+                QueryHistory(user_id=1, query_text=text, response_text="응답", ai_model_name="gpt-4o")
+                for text in ("삼성전자 분석", "SK하이닉스 분석", "실패", "카카오 분석")
+            ])
+            await db.commit()
+
+        service = ChatSummaryService(session_factory, ai_model_name="gpt-4o")
+        async with session_factory() as db:
+            history = (await db.execute(select(QueryHistory).where(QueryHistory.id == 1))).scalar_one()
+
+            # 동시에 두 번 눌러도 한 번만 생성
+            first, second = await asyncio.gather(service.get_summary(db, history), service.get_summary(db, history))
+            assert first.summary_text == second.summary_text == "요약: 삼성전자 분석"
+            assert calls == ["삼성전자 분석"]
+
+            # 이후 요청은 DB에서 반환
+            assert (await service.get_summary(db, history)).summary_text == "요약: 삼성전자 분석"
+            assert calls == ["삼성전자 분석"]
+        assert await count(session_factory, QueryHistorySummary) == 1
+        assert await count(session_factory, TokenUsageLog) == 1
+        print("- 요약 1회 생성 및 재사용 확인")
+
+        # 일괄 생성: 요약 없는 히스토리만, 실패한 요약은 저장하지 않고 실패로 기록
+        assert await service.summarize_pending(limit=2) == 1
+        assert calls[1:] == ["SK하이닉스 분석", "실패"]
+        # 실패한 히스토리는 재시도 시각 전까지 건너뛰므로 다음 히스토리를 막지 않음
+        assert await service.summarize_pending(limit=2) == 1
+        assert calls[3:] == ["카카오 분석"]
+        assert await service.summarize_pending(limit=10) == 0 and len(calls) == 4
+        assert await count(session_factory, QueryHistorySummary) == 3
+        assert await count(session_factory, TokenUsageLog) == 3
+
+        # 재시도 시각이 지나면 다시 시도하고, 최대 실패 횟수에 도달하면 더 이상 시도하지 않음
+        async def expire_backoff():
+            async with session_factory() as db:
+                await db.execute(update(QueryHistorySummaryFailure).values(next_attempt_at=datetime.utcnow()))
+                await db.commit()
+        for _ in range(settings.CHAT_SUMMARY_MAX_ATTEMPTS - 1):
+            await expire_backoff()
+            assert await service.summarize_pending(limit=10) == 0
+        assert calls.count("실패") == settings.CHAT_SUMMARY_MAX_ATTEMPTS
+        await expire_backoff()
+        assert await service.summarize_pending(limit=10) == 0
+        assert calls.count("실패") == settings.CHAT_SUMMARY_MAX_ATTEMPTS
+        async with session_factory() as db:
+            failure = (await db.execute(select(QueryHistorySummaryFailure))).scalar_one()
+            assert failure.history_id == 3 and failure.attempts == settings.CHAT_SUMMARY_MAX_ATTEMPTS
+        print("- 실패 기록 및 재시도 지연 확인")
+
+        # 다른 워커와 동시에 생성해 저장 경합에서 지면 토큰 사용량을 중복 기록하지 않음
+        async with session_factory() as db:
+            db.add(QueryHistory(user_id=1, query_text="네이버 분석", response_text="응답", ai_model_name="gpt-4o"))
+            await db.commit()
+            history = (await db.execute(select(QueryHistory).where(QueryHistory.id == 5))).scalar_one()
+        other_worker = ChatSummaryService(session_factory, ai_model_name="gpt-4o")
+        first, second = await asyncio.gather(
+            service.get_summary(db, history), other_worker.get_summary(db, history)
+        )
+        assert first.id == second.id and calls.count("네이버 분석") == 2
+        assert await count(session_factory, QueryHistorySummary) == 4
+        assert await count(session_factory, TokenUsageLog) == 4
+
+        # LLM 응답 캐시에서 꺼낸 요약(토큰 0)은 실패가 아니므로 저장하고 사용량 0으로 기록
+        async with session_factory() as db:
+            db.add(QueryHistory(user_id=1, query_text="캐시된 질문", response_text="응답", ai_model_name="gpt-4o"))
+            await db.commit()
+        assert await service.summarize_pending(limit=10) == 1
+        async with session_factory() as db:
+            summary = (await db.execute(select(QueryHistorySummary).where(QueryHistorySummary.history_id == 6))).scalar_one()
+            log = (await db.execute(select(TokenUsageLog).order_by(TokenUsageLog.id.desc()))).scalars().first()
+        assert summary.summary_text == "요약: 캐시된 질문" and log.input_tokens == log.output_tokens == 0
+        await engine.dispose()
+    print("- 일괄 생성 확인")
+    print("=== 대화 요약 저장 테스트 완료 ===")
+
+if __name__ == "__main__":
+    asyncio.run(test_chat_summary())
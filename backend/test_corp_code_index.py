@@ -0,0 +1,71 @@
+import asyncio
+import io
+import os
+import tempfile
+import zipfile
+from services.data_providers.corp_code_index import CorpCodeIndex
+
+CORP_CODE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<result>
+    <list>
+        <corp_code>00126380</corp_code>
+        <corp_name>삼성전자</corp_name>
+        <stock_code>005930</stock_code>
+        <modify_date>20230110</modify_date>
+    </list>
+    <list>
+        <corp_code>00164779</corp_code>
+        <corp_name>에스케이하이닉스</corp_name>
+        <stock_code>000660</stock_code>
+        <modify_date>20230110</modify_date>
+    </list>
+    <list>
+        <corp_code>00999999</corp_code>
+        <corp_name>비상장회사</corp_name>
+        <stock_code> </stock_code>
+        <modify_date>20230110</modify_date>
+    </list>
+</result>
+"""
+
+def build_archive() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("CORPCODE.xml", CORP_CODE_XML)
+    return buffer.getvalue()
+
+async def test_corp_code_index():
+    print("=== 고유번호 인덱스 테스트 시작 ===")
+    downloads = []
+
+    async def fetch_archive() -> bytes:
+        downloads.append(1)
+        return build_archive()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "corp_code.db")
+
+        index = CorpCodeIndex(db_path)
+        assert await index.lookup("005930", fetch_archive) == "00126380"
+        assert await index.lookup("000660", fetch_archive) == "00164779"
+        assert await index.lookup("123456", fetch_archive) is None
+        assert len(index) == 2
+        assert len(downloads) == 1
+        print("- 최초 조회 시 1회 다운로드 후 메모리 조회")
+
+        # 새 인스턴스는 SQLite 테이블에서 로드하고 다운로드하지 않음
+        reloaded = CorpCodeIndex(db_path)
+        assert await reloaded.lookup("005930", fetch_archive) == "00126380"
+        assert len(downloads) == 1
+        print("- 재시작 시 로컬 테이블에서 로드")
+
+        # 갱신 주기가 지난 테이블은 다시 내려받음
+        expired = CorpCodeIndex(db_path, refresh_interval=0)
+        assert await expired.lookup("000660", fetch_archive) == "00164779"
+        assert len(downloads) == 2
+        print("- 갱신 주기 경과 시 재다운로드")
+
+    print("=== 고유번호 인덱스 테스트 완료 ===")
+
+if __name__ == "__main__":
+    asyncio.run(test_corp_code_index())
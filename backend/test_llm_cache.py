@@ -0,0 +1,108 @@
+import asyncio
+import os
+import tempfile
+from langchain_core.language_models.fake_chat_models import FakeListChatModel, FakeMessagesListChatModel
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, HumanMessage
+from services.azure_openai_service import count_usage
+from services.llm_cache import LLMResponseCache, LLMResponseStore, embed, serialized_prompt_key
+
+async def test_llm_cache():
+    print("=== LLM 응답 캐시 테스트 ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "responses.db")
+        version = {"value": "20250110"}
+        cache = LLMResponseCache(LLMResponseStore(db_path), version_fn=lambda: version["value"])
+        llm = FakeListChatModel(responses=["첫 번째 응답", "두 번째 응답", "세 번째 응답"], cache=cache)
+
+        # 공백만 다른 프롬프트는 호출 없이 같은 응답
+        assert (await llm.ainvoke("삼성전자를  분석해주세요")).content == "첫 번째 응답"
+        assert (await llm.ainvoke("삼성전자를 분석해주세요\n")).content == "첫 번째 응답"
+        assert llm.i == 1
+
+        # 다른 프롬프트는 새로 호출
+        assert (await llm.ainvoke("SK하이닉스를 분석해주세요")).content == "두 번째 응답"
+
+        # 재시작 후에도 유지
+        cache = LLMResponseCache(LLMResponseStore(db_path), version_fn=lambda: version["value"])
+        llm.cache = cache
+        assert (await llm.ainvoke("삼성전자를 분석해주세요")).content == "첫 번째 응답"
+        assert llm.i == 2
+        # 에이전트 중간 단계의 메시지 ID는 키에서 제외, 도구 결과는 키에 포함
+        def scratchpad(run_id: str, content: str) -> str:
+            return dumps([HumanMessage(content="질문"), AIMessage(content=content, id=run_id)])
+        assert serialized_prompt_key(scratchpad("run-1", "a")) == serialized_prompt_key(scratchpad("run-2", "a"))
+        assert serialized_prompt_key(scratchpad("run-1", "a")) != serialized_prompt_key(scratchpad("run-1", "b"))
+        print("- 정규화한 프롬프트 키 및 영구 저장 확인")
+
+        # 시장 스냅샷 거래일이 바뀌면 만료
+        version["value"] = "20250113"
+        assert (await llm.ainvoke("삼성전자를 분석해주세요")).content == "세 번째 응답"
+        assert cache.store.get_stats()["entries"] == 1
+        print("- 데이터 버전 변경 시 만료 확인")
+
+        # 캐시 응답은 Azure가 과금하지 않았으므로 원래 사용량 대신 0으로 기록
+        usage_llm = FakeMessagesListChatModel(responses=[
+            AIMessage(content="요약", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150})
+        ], cache=cache)
+        assert await count_usage("대화 요약", await usage_llm.ainvoke("대화 요약")) == (120, 30)
+        assert await count_usage("대화 요약", await usage_llm.ainvoke("대화 요약")) == (0, 0)
+        print("- 캐시 응답 사용량 0 기록 확인")
+
+        # 결과 전체 캐시
+        cache.put_result("agent", "질문", {"success": True, "text": "결과"})
+        assert cache.get_result("agent", "질문")["text"] == "결과"
+        assert cache.get_result("other-agent", "질문") is None
+        cache.store.close()
+
+        # 유사 질문 재사용 (임계값 지정 시, 같은 범위의 본문끼리만 비교)
+        store = LLMResponseStore(os.path.join(tmp_dir, "similar.db"), similarity_threshold=0.9)
+        store.put("ns", "q1", "20250113", b"cached", text="워런 버핏 기준으로 삼성전자를 분석해주세요.")
+        assert store.get("ns", "q2", "20250113", text="워런 버핏 기준으로 삼성전자를 분석해 주세요") == b"cached"
+        assert store.get("ns", "q3", "20250113", text="오늘 날씨 알려줘") is None
+        assert store.get("ns", "q2", "20250113") is None  # 본문 미지정 시 정확히 같은 프롬프트만
+        assert store.get("ns", "q2", "20250113", text="워런 버핏 기준으로 삼성전자를 분석해 주세요", scope="other") is None
+        assert store.get_stats()["similar_hits"] == 1
+        assert abs(float(embed("abc") @ embed("abc")) - 1.0) < 1e-6
+        store.close()
+
+        # 결과 캐시: 질문만 유사하면 재사용하지만 시장/최소 점수 등 조건이 다르면 재사용하지 않음
+        def buffett_query(question: str, market: str = "KOSPI", min_score: int = 60) -> str:
+            return f"요청사항: {question}\n분석 조건:\n- 시장: {market}\n- 최소 점수: {min_score}점 이상"
+        question = "워런 버핏 기준으로 우량주를 추천해주세요."
+        similar_question = "워런 버핏 기준으로 우량주를 추천해 주세요"
+        cache = LLMResponseCache(
+            LLMResponseStore(os.path.join(tmp_dir, "results.db"), similarity_threshold=0.9), version_fn=lambda: "20250113"
+        )
+        cache.put_result("agent", buffett_query(question), {"market": "KOSPI"}, text=question)
+        assert cache.get_result("agent", buffett_query(similar_question), text=similar_question) == {"market": "KOSPI"}
+        assert cache.get_result("agent", buffett_query(similar_question, market="KOSDAQ"), text=similar_question) is None
+        assert cache.get_result("agent", buffett_query(similar_question, min_score=80), text=similar_question) is None
+        assert cache.get_result("agent", buffett_query(question, market="KOSDAQ"), text=question) is None
+
+        cache.store.close()
+
+        # LLM 호출 캐시: 임계값을 지정해도 정확히 같은 프롬프트만 재사용
+        # (요약 템플릿은 의견/목표가만 달라도 유사도가 임계값을 넘으므로 다른 대화의 요약을 돌려주면 안 됨)
+        def summarize_prompt(verdict: str, target_price: str) -> str:
+            return (
+                "다음 대화를 간결하고 핵심적인 내용으로 요약해주세요. 주요 질문과 답변의 핵심 포인트를 포함하여 2-3문장으로 정리해주세요.\n"
+                "사용자 질문: 워런 버핏 기준으로 삼성전자를 분석해주세요.\n"
+                f"AI 응답: 삼성전자는 ROE와 부채비율 기준을 충족합니다. 투자 의견: {verdict}, 목표 주가: {target_price}원\n요약:"
+            )
+        buy, sell = summarize_prompt("매수", "85,000"), summarize_prompt("매도", "55,000")
+        assert float(embed(buy) @ embed(sell)) >= 0.95
+        cache = LLMResponseCache(
+            LLMResponseStore(os.path.join(tmp_dir, "summary.db"), similarity_threshold=0.95), version_fn=lambda: "20250113"
+        )
+        summary_llm = FakeListChatModel(responses=["매수 의견 요약", "매도 의견 요약", "다시 호출됨"], cache=cache)
+        assert (await summary_llm.ainvoke(buy)).content == "매수 의견 요약"
+        assert (await summary_llm.ainvoke(sell)).content == "매도 의견 요약"
+        assert (await summary_llm.ainvoke(buy)).content == "매수 의견 요약" and summary_llm.i == 2
+        assert cache.store.get_stats()["similar_hits"] == 0
+        cache.store.close()
+    print("- 결과 캐시 및 유사 프롬프트 재사용 확인")
+    print("=== LLM 응답 캐시 테스트 완료 ===")
+
+if __name__ == "__main__":
+    asyncio.run(test_llm_cache())
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import tempfile
+import pandas as pd
+from services.market_data_store import MarketDataStore, HotSnapshot
+
+SAMPLE = pd.DataFrame([
+    {"종목코드": "005930", "종목명": "삼성전자", "시장구분": "KOSPI", "현재가": 56800.0, "등락률": 1.07, "거래량": 12870515.0, "시가총액": 3.36e14},
+    {"종목코드": "000660", "종목명": "SK하이닉스", "시장구분": "KOSPI", "현재가": 190000.0, "등락률": -0.5, "거래량": 3000000.0, "시가총액": 1.38e14},
+    {"종목코드": "035720", "종목명": "카카오", "시장구분": "KOSDAQ", "현재가": 43150.0, "등락률": 1.05, "거래량": 2075682.0, "시가총액": 1.9e13},
+])
+
+def test_snapshot_roundtrip(store: MarketDataStore):
+    print("=== 스냅샷 저장/조회 테스트 ===")
+    store.write_snapshot(SAMPLE, "20250603", "20250603_160000")
+    store.write_snapshot(SAMPLE.assign(현재가=SAMPLE["현재가"] + 100), "20250604", "20250604_160000")
+
+    assert store.trade_dates() == ["20250603", "20250604"]
+    assert store.markets("20250604") == ["KOSDAQ", "KOSPI"]
+    assert store.latest_snapshot() == ("20250604", "20250604_160000")
+
+    latest = store.read_latest()
+    assert len(latest) == 3 and latest.attrs["trade_date"] == "20250604"
+    assert latest["현재가"].dtype == "float64"
+
+    # 시장 파티션과 컬럼만 선택해서 읽기
+    kospi = store.read_latest(columns=["종목코드", "현재가"], markets=["KOSPI"])
+    assert list(kospi.columns) == ["종목코드", "현재가"]
+    assert sorted(kospi["종목코드"]) == ["000660", "005930"]
+    assert kospi.loc[kospi["종목코드"] == "005930", "현재가"].iloc[0] == 56900.0
+    print("- 파티션/컬럼 선택 확인")
+
+def test_snapshot_writer(store: MarketDataStore):
+    print("=== 스냅샷 분할 기록 테스트 ===")
+    latest = store.latest_snapshot()
+    # 중간에 실패하면 임시 파일만 지우고 등록하지 않음
+    try:
+        with store.open_snapshot("20250605", "20250605_100000") as writer:
+            writer.write(SAMPLE.iloc[:2])
+            raise RuntimeError("2페이지 조회 실패")
+    except RuntimeError:
+        pass
+    assert store.latest_snapshot() == latest
+    assert not os.path.exists(os.path.join(store.root, "date=20250605", "market=KOSPI", "20250605_100000.arrow.tmp"))
+
+    # 페이지별로 나눠 쓴 뒤 한 번에 등록
+    with store.open_snapshot("20250605", "20250605_160000") as writer:
+        for start in range(len(SAMPLE)):
+            writer.write(SAMPLE.iloc[start:start + 1])
+        assert store.latest_snapshot() == latest  # commit 전에는 보이지 않음
+        writer.commit()
+    assert store.latest_snapshot() == ("20250605", "20250605_160000")
+    assert store.manifest()["snapshots"]["20250605"]["20250605_160000"]["KOSPI"]["rows"] == 2
+    assert sorted(store.read_latest()["종목코드"]) == sorted(SAMPLE["종목코드"])
+    print("- 실패 시 폐기, 커밋 시 등록 확인")
+
+def test_import_csv(store: MarketDataStore, tmp_dir: str):
+    print("=== CSV 스냅샷 가져오기 테스트 ===")
+    csv_dir = os.path.join(tmp_dir, "csv")
+    os.makedirs(csv_dir)
+    # 2025-06-07(토) 수집 → 직전 영업일 2025-06-05로 저장
+    SAMPLE.to_csv(os.path.join(csv_dir, "market_data_20250607_090000.csv"), index=False, encoding="utf-8-sig")
+
+    assert store.import_legacy_csvs(csv_dir) == 1
+    assert store.import_legacy_csvs(csv_dir) == 0  # 이미 가져온 파일은 건너뜀
+    assert store.latest_snapshot() == ("20250605", "20250607_090000")
+    imported = store.read_latest()
+    assert "005930" in set(imported["종목코드"])  # 앞자리 0 유지
+    print("- CSV 가져오기 확인")
+
+async def test_hot_snapshot(store: MarketDataStore):
+    print("=== 메모리 스냅샷 갱신 테스트 ===")
+    hot = HotSnapshot(store, watch_interval=0.05)
+    hot.start_watcher()
+    await asyncio.sleep(0.1)
+    before = await hot.get(markets=["KOSPI"])
+    assert before.attrs["snapshot_id"] == store.latest_snapshot()[1]
+
+    # 다른 워커가 더 최신 스냅샷을 기록하면 감시 작업이 다시 읽음
+    store.write_snapshot(SAMPLE, "20250609", "20250609_160000")
+    await asyncio.sleep(0.2)
+    after = await hot.get(columns=["종목코드"], markets=["KOSDAQ"])
+    assert after.attrs["snapshot_id"] == "20250609_160000"
+    assert list(after["종목코드"]) == ["035720"]
+    await hot.stop_watcher()
+    print("- 새 스냅샷 감지 확인")
+
+def test_retention(store: MarketDataStore):
+    print("=== 보존 정책 테스트 ===")
+    for trade_date in ("20250602", "20250603", "20250604"):
+        for hour in ("10", "13", "16"):
+            store.write_snapshot(SAMPLE, trade_date, f"{trade_date}_{hour}0000")
+
+    # 최신 거래일은 장중 2개, 이전 거래일은 마지막 1개만 남기고 최근 2개 거래일까지 보존
+    assert store.apply_retention(keep_intraday=2, keep_days=2) == 6
+    assert store.trade_dates() == ["20250603", "20250604"]
+    assert store.snapshot_ids("20250603") == ["20250603_160000"]
+    assert store.snapshot_ids("20250604") == ["20250604_130000", "20250604_160000"]
+    assert store.latest_snapshot() == ("20250604", "20250604_160000")
+    assert not os.path.exists(os.path.join(store.root, "date=20250602"))
+    assert store.stats()["snapshots"] == 3
+
+    # 매니페스트가 없어도 디렉토리에서 다시 만들어짐
+    os.remove(store.manifest_path)
+    assert MarketDataStore(store.root).snapshot_ids("20250604") == ["20250604_130000", "20250604_160000"]
+    print("- 보존 정책 및 매니페스트 재생성 확인")
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = MarketDataStore(os.path.join(tmp_dir, "market_store"))
+        test_snapshot_roundtrip(store)
+        test_snapshot_writer(MarketDataStore(os.path.join(tmp_dir, "writer_store")))
+        test_import_csv(store, tmp_dir)
+        asyncio.run(test_hot_snapshot(store))
+        test_retention(MarketDataStore(os.path.join(tmp_dir, "retention_store")))
+    print("=== 시장 데이터 저장소 테스트 완료 ===")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import asyncio
+import math
+import tempfile
+from datetime import date, timedelta
+import pandas as pd
+from services.advanced_analysis_tool import AdvancedAnalysisTool
+from services.price_history import PriceHistoryService, PriceHistoryStore
+from services.technical_indicators import IndicatorMatrix, TechnicalIndicatorEngine
+
+def make_history(start: date, days: int, base: float = 10000.0) -> pd.DataFrame:
+    rows = []
+    for i in range(days):
+        price = base + i * 10
+        rows.append({
+            "date": start + timedelta(days=i),
+            "open": price, "high": price * 1.01, "low": price * 0.99, "close": price, "volume": 1000.0 + i
+        })
+    return pd.DataFrame(rows)
+
+def test_append_only_store():
+    print("=== 일별 시세 이력 저장소 테스트 ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = PriceHistoryStore(tmp_dir, max_chunks=3)
+
+        assert store.append("005930", make_history(date(2025, 1, 10), 10)) == 10
+        # 이미 저장된 기간은 다시 쓰지 않고 새 거래일만 추가
+        assert store.append("005930", make_history(date(2025, 1, 15), 10)) == 5
+        # 과거 백필은 별도 청크로 추가
+        assert store.append("005930", make_history(date(2025, 1, 1), 12)) == 9
+        assert store.date_range("005930") == (date(2025, 1, 1), date(2025, 1, 24))
+
+        history = store.load("005930")
+        assert len(history) == 24 and history["date"].is_monotonic_increasing
+        assert history.loc[history["date"] == date(2025, 1, 15), "close"].iloc[0] == 10050.0  # 기존 값 유지
+
+        # 기간/컬럼 선택
+        window = store.load("005930", start=date(2025, 1, 20), columns=["close"])
+        assert list(window.columns) == ["date", "close"] and len(window) == 5
+
+        # 청크 수가 상한을 넘으면 하나로 병합
+        store.append("005930", make_history(date(2025, 1, 25), 1))
+        assert len(store._chunks("005930")) == 1
+        assert len(store.load("005930")) == 25
+        assert store.symbols() == ["005930"]
+    print("- 추가 전용 저장 및 청크 병합 확인")
+
+def test_indicator_matrix():
+    print("=== 기술적 지표 행렬 테스트 ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = PriceHistoryStore(tmp_dir)
+        store.append("005930", make_history(date(2025, 1, 1), 80))
+        store.append("000660", make_history(date(2025, 2, 1), 40, base=20000.0))
+        store.append("035720", make_history(date(2025, 3, 1), 10))  # 이력 부족
+
+        engine = TechnicalIndicatorEngine(store)
+        assert asyncio.run(engine.refresh()) == 3
+        row = engine.lookup("005930")
+        assert row["trend"] == "상승" and row["rsi"] == 100.0
+        assert row["support_level"] == (10000.0 + 20 * 10) * 0.99  # 최근 60거래일 최저가
+        assert engine.lookup("035720") is None and engine.lookup("999999") is None
+
+        # 한 종목만 다시 계산해 반영해도 전체 계산과 같은 값
+        store.append("000660", make_history(date(2025, 3, 13), 1, base=19000.0))
+        asyncio.run(engine.refresh(["000660"]))
+        expected = engine.build().row("000660")
+        assert len(engine.matrix) == 3
+        assert all(math.isclose(engine.lookup("000660")[k], v) for k, v in expected.items() if k != "trend")
+
+        # 갱신 대상 종목의 이력이 모두 없어도 기존 행렬 유지
+        assert engine.matrix.merge(IndicatorMatrix.empty()) is engine.matrix
+        asyncio.run(engine.refresh(["999999"]))
+        assert len(engine.matrix) == 3 and engine.lookup("005930")["trend"] == "상승"
+    print("- 전 종목 일괄 계산 및 종목별 갱신 확인")
+
+class FakeProvider:
+    api_key = "test"
+
+    def __init__(self):
+        self.calls = []
+
+    async def get_price_history(self, symbol: str, begin: str, end: str) -> pd.DataFrame:
+        self.calls.append(symbol)
+        if symbol == "999999":
+            raise RuntimeError("시세 조회 실패")
+        return make_history(date(2025, 3, 1), 10)  # 신규 상장 등으로 이력 부족
+
+def test_backfill_cooldown():
+    print("=== 시세 이력 백필 재시도 대기 테스트 ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        provider = FakeProvider()
+        service = PriceHistoryService(PriceHistoryStore(tmp_dir), provider, retry_cooldown=60.0)
+
+        # 백필 후에도 이력이 짧은 종목은 대기 시간 동안 다시 조회하지 않음
+        assert len(asyncio.run(service.load_history("035720", 60))) == 10
+        calls = len(provider.calls)
+        assert calls >= 1
+        assert len(asyncio.run(service.load_history("035720", 60))) == 10
+        assert len(provider.calls) == calls
+
+        # 조회에 실패한 종목도 오류를 전달한 뒤 대기 시간 동안 건너뜀
+        try:
+            asyncio.run(service.load_history("999999", 60))
+            assert False, "백필 실패가 전달되어야 함"
+        except RuntimeError:
+            pass
+        assert asyncio.run(service.load_history("999999", 60)).empty
+        assert provider.calls.count("999999") == 1
+
+        # 대기 시간이 지나면 다시 백필하고, 지난 기록은 새 기록을 남길 때 정리
+        service._backfill_retry_at = {symbol: 0.0 for symbol in service._backfill_retry_at}
+        asyncio.run(service.load_history("035720", 60))
+        assert len(provider.calls) > calls + 1
+        assert list(service._backfill_retry_at) == ["035720"]
+    print("- 이력 부족/실패 종목 백필 재시도 대기 확인")
+
+def test_technical_retry_cooldown():
+    print("=== 기술적 분석 재시도 대기 테스트 ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = PriceHistoryStore(tmp_dir)
+        tool = AdvancedAnalysisTool()
+        tool.price_history = PriceHistoryService(store, FakeProvider(), retry_cooldown=60.0)
+        tool.indicators = TechnicalIndicatorEngine(store)
+        refreshed = []
+        refresh = tool.indicators.refresh
+
+        async def counting_refresh(symbols=None):
+            refreshed.append(symbols)
+            return await refresh(symbols)
+        tool.indicators.refresh = counting_refresh
+
+        # 이력이 부족한 종목은 한 번만 백필/계산하고 대기 시간 동안 Mock 데이터로 응답
+        for _ in range(3):
+            assert asyncio.run(tool._analyze_technical("035720")).rsi is None
+        assert refreshed == [["035720"]]
+
+        # 대기 시간이 지나 이력이 충분해지면 다시 계산해 반영
+        store.append("035720", make_history(date(2025, 3, 11), 60))
+        tool.price_history._backfill_retry_at["035720"] = 0.0
+        assert asyncio.run(tool._analyze_technical("035720")).rsi == 100.0
+        assert len(refreshed) == 2 and not tool.price_history.is_cooling_down("035720")
+        assert "035720" not in tool.price_history._backfill_retry_at
+    print("- 이력 부족 종목 백필/계산 재시도 대기 확인")
+
+def main():
+    test_append_only_store()
+    test_indicator_matrix()
+    test_backfill_cooldown()
+    test_technical_retry_cooldown()
+    print("=== 일별 시세 이력 테스트 완료 ===")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import tempfile
+from services.data_providers.opendart_api import OpenDARTProvider
+from services.data_providers.statement_store import StatementStore
+
+# fnlttSinglAcntAll 응답 (반기보고서, 연결재무제표)
+RESPONSE = {"status": "000", "message": "정상", "list": [
+    {"reprt_code": "11012", "sj_div": "BS", "account_id": "ifrs-full_Assets", "account_nm": "자산총계", "thstrm_amount": "1,000"},
+    {"reprt_code": "11012", "sj_div": "BS", "account_id": "ifrs-full_Liabilities", "account_nm": "부채총계", "thstrm_amount": "400"},
+    {"reprt_code": "11012", "sj_div": "BS", "account_id": "ifrs-full_Equity", "account_nm": "자본총계", "thstrm_amount": "600"},
+    {"reprt_code": "11012", "sj_div": "CIS", "account_id": "ifrs-full_Revenue", "account_nm": "매출액", "thstrm_amount": "500"},
+    {"reprt_code": "11012", "sj_div": "CIS", "account_id": "dart_OperatingIncomeLoss", "account_nm": "영업이익", "thstrm_amount": "45"},
+    {"reprt_code": "11012", "sj_div": "CIS", "account_id": "ifrs-full_ProfitLoss", "account_nm": "반기순이익", "thstrm_amount": "(20)"},
+    {"reprt_code": "11012", "sj_div": "SCE", "account_id": "ifrs-full_ProfitLoss", "account_nm": "반기순이익", "thstrm_amount": "999"},
+    {"reprt_code": "11012", "sj_div": "CF", "account_id": "ifrs-full_CashFlowsFromUsedInOperatingActivities", "account_nm": "영업활동현금흐름", "thstrm_amount": "80"},
+    {"reprt_code": "11012", "sj_div": "CF", "account_id": "ifrs-full_PurchaseOfPropertyPlantAndEquipment", "account_nm": "유형자산의 취득", "thstrm_amount": "-30"},
+]}
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+async def test_statement_store():
+    print("=== 재무제표 파싱/영구 저장 테스트 ===")
+    dart = OpenDARTProvider()
+    statement = dart._parse_financial_statement(RESPONSE, "000660", 2024)
+    assert statement.quarter == 2 and statement.net_income == -20.0
+    assert statement.debt == 400.0 and statement.free_cash_flow == 50.0
+    assert dart._parse_financial_statement({"status": "013"}, "000660", 2024) is None
+    print("- 계정 ID 기반 파싱 확인")
+
+    calls = []
+
+    async def fake_get(url, params):
+        calls.append(params["fs_div"])
+        await asyncio.sleep(0.01)
+        # 연결재무제표가 없으면 별도재무제표로 조회
+        return FakeResponse({"status": "013"} if params["fs_div"] == "CFS" else RESPONSE)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "statements.db")
+        dart.statement_store = StatementStore(db_path)
+        dart._bounded_get = fake_get
+
+        # 동시에 들어온 같은 보고서 조회는 한 번만 호출
+        results = await asyncio.gather(*(
+            dart._fetch_annual_statement("00164779", "000660", 2024, "11012") for _ in range(5)
+        ))
+        assert calls == ["CFS", "OFS"] and all(r == statement for r in results)
+
+        # 저장된 보고서는 재시작 후에도 다시 조회하지 않음
+        dart.statement_store = StatementStore(db_path)
+        assert await dart._fetch_annual_statement("00164779", "000660", 2024, "11012") == statement
+        assert calls == ["CFS", "OFS"]
+        dart.statement_store.close()
+    print("- 보고서별 1회 조회 및 영구 저장 확인")
+    print("=== 재무제표 저장소 테스트 완료 ===")
+
+if __name__ == "__main__":
+    asyncio.run(test_statement_store())